@@ -14,42 +14,172 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
+import bisect
+import collections
+import concurrent.futures
 import contextlib
+import functools
+import inspect
 import json
+import math
 import os.path
+import queue
+import sqlite3
 import sys
+import threading
 import time
 
 import obspython as obs
 
-PROP_ID_OWL_SOURCE = 'orly_owl'
-PROP_ID_LABEL_SOURCE = 'orly_label'
-PROP_ID_COUNTER_SOURCE = 'orly_counter'
-PROP_ID_DING1_SOURCE = 'orly_ding1'
-PROP_ID_DING10_SOURCE = 'orly_ding10'
-PROP_ID_DING50_SOURCE = 'orly_ding50'
-PROP_ID_OWL_X_POS = 'orly_owl_x_pos'
-PROP_ID_OWL_Y_POS = 'orly_owl_y_pos'
-PROP_ID_OWL_X_DISTANCE = 'orly_owl_x_distance'
-PROP_ID_OWL_Y_DISTANCE = 'orly_owl_y_distance'
-PROP_ID_HIDE_BUTTON = 'orly_hide_all'
-PROP_ID_RESTORE_BUTTON = 'orly_restore_all'
+# Property IDs are prefixed with the counter ID (e.g. "orly_owl"); see
+# OrlyStateMachine.propId()
+PROP_ID_OWL_SOURCE = 'owl'
+PROP_ID_LABEL_SOURCE = 'label'
+PROP_ID_COUNTER_SOURCE = 'counter'
+PROP_ID_DING1_SOURCE = 'ding1'
+PROP_ID_DING10_SOURCE = 'ding10'
+PROP_ID_DING50_SOURCE = 'ding50'
+PROP_ID_OVERLAY_SOURCE = 'overlay'
+PROP_ID_OWL_X_POS = 'owl_x_pos'
+PROP_ID_OWL_Y_POS = 'owl_y_pos'
+PROP_ID_OWL_X_DISTANCE = 'owl_x_distance'
+PROP_ID_OWL_Y_DISTANCE = 'owl_y_distance'
+PROP_ID_OWL_APPEAR_EASING = 'owl_appear_easing'
+PROP_ID_OWL_DISAPPEAR_EASING = 'owl_disappear_easing'
+PROP_ID_HIDE_BUTTON = 'hide_all'
+PROP_ID_RESTORE_BUTTON = 'restore_all'
+PROP_ID_READ_TEXTBOX_BUTTON = 'read_textbox'
+PROP_ID_GROUP = 'group'
 PROP_NAME_OWL_SOURCE = 'Owl image:'
 PROP_NAME_LABEL_SOURCE = 'Label textbox ("ORLY?! COUNTER:"):'
 PROP_NAME_COUNTER_SOURCE = 'Number textbox ("0"):'
 PROP_NAME_DING1_SOURCE = 'Ding:'
 PROP_NAME_DING10_SOURCE = 'Ding (10):'
 PROP_NAME_DING50_SOURCE = 'Ding (50):'
+PROP_NAME_OVERLAY_SOURCE = 'Group with the label and number (optional):'
 PROP_NAME_OWL_X_POS = 'Owl X position:'
 PROP_NAME_OWL_Y_POS = 'Owl Y position:'
 PROP_NAME_OWL_X_DISTANCE = 'Owl X movement distance:'
 PROP_NAME_OWL_Y_DISTANCE = 'Owl Y movement distance:'
+PROP_NAME_OWL_APPEAR_EASING = 'Owl appear motion:'
+PROP_NAME_OWL_DISAPPEAR_EASING = 'Owl disappear motion:'
 PROP_NAME_HIDE_BUTTON = 'Hide All'
 PROP_NAME_RESTORE_BUTTON = 'Restore All'
+PROP_NAME_READ_TEXTBOX_BUTTON = 'Use Number in Textbox'
+PROP_NAME_GROUP = '%s counter'
+
+# Settings that are applied together (see OrlyStateMachine.applySettings())
+SOURCE_PROP_IDS = [PROP_ID_OWL_SOURCE,
+                   PROP_ID_LABEL_SOURCE,
+                   PROP_ID_COUNTER_SOURCE,
+                   PROP_ID_DING1_SOURCE,
+                   PROP_ID_DING10_SOURCE,
+                   PROP_ID_DING50_SOURCE,
+                   PROP_ID_OVERLAY_SOURCE]
+POSITION_PROP_IDS = [PROP_ID_OWL_X_POS,
+                     PROP_ID_OWL_Y_POS,
+                     PROP_ID_OWL_X_DISTANCE,
+                     PROP_ID_OWL_Y_DISTANCE]
+EASING_PROP_IDS = [PROP_ID_OWL_APPEAR_EASING,
+                   PROP_ID_OWL_DISAPPEAR_EASING]
+
+# The kind of source each source type can be used as, and the kind
+# each source property lists
+SOURCE_KINDS = {
+    'text_gdiplus': 'text',
+    'text_ft2_source': 'text',
+    'image_source': 'image',
+    'ffmpeg_source': 'media',
+    'group': 'group',
+}
+SOURCE_PROP_KINDS = [(PROP_ID_OWL_SOURCE, 'image'),
+                     (PROP_ID_LABEL_SOURCE, 'text'),
+                     (PROP_ID_COUNTER_SOURCE, 'text'),
+                     (PROP_ID_DING1_SOURCE, 'media'),
+                     (PROP_ID_DING10_SOURCE, 'media'),
+                     (PROP_ID_DING50_SOURCE, 'media'),
+                     (PROP_ID_OVERLAY_SOURCE, 'group')]
+
+# These ones aren't specific to a counter, so they're used as-is
+PROP_ID_CURRENT_SCENE_ONLY = 'current_scene_only'
+PROP_ID_STATS_BUTTON = 'session_stats'
+PROP_ID_PROFILE = 'profile'
+PROP_ID_PROFILE_BUTTON = 'profile_report'
+PROP_ID_TRACK_REFERENCES = 'track_references'
+PROP_ID_REMOTE = 'remote_control'
+PROP_ID_REMOTE_PORT = 'remote_control_port'
+PROP_ID_RECORD_INPUT = 'record_input'
+PROP_NAME_CURRENT_SCENE_ONLY = 'Only list sources in the current scene'
+PROP_NAME_STATS_BUTTON = 'Show Session Stats'
+PROP_NAME_PROFILE = 'Profile performance'
+PROP_NAME_PROFILE_BUTTON = 'Show Profiling Results'
+PROP_NAME_TRACK_REFERENCES = 'Track OBS references (for debugging)'
+PROP_NAME_REMOTE = 'Allow remote control from this computer'
+PROP_NAME_REMOTE_PORT = 'Remote control port'
+PROP_NAME_RECORD_INPUT = 'Record hotkey presses (for reproducing bugs)'
+
+# Used if defaults.json doesn't list any counters
+DEFAULT_COUNTERS = [{'id': 'orly', 'name': 'ORLY'}]
 
 OPACITY_FILTER_NAME = 'Opacity'
-
-orlyStateMachine = None
+# How Opacity filters are made when they're missing (like the setup
+# instructions in the readme say)
+OPACITY_FILTER_ID = 'mask_filter'
+OPACITY_FILTER_IMAGE = 'white.png'
+
+# Digit sprite mode (see DigitSprites)
+DIGIT_ATLAS_FILENAME = 'digits.png'
+DIGIT_ATLAS_GLYPHS = '0123456789+-'
+SPRITE_CACHE_DIRNAME = 'orly-sprite-cache'
+
+# Maximum number of compiled timelines to keep around per counter, and
+# the increments to compile timelines for ahead of time
+TIMELINE_CACHE_SIZE = 256
+PRECOMPILED_AMOUNTS = [1, 2, 3, 4, 5, -1, -2, -3, -4, -5]
+
+# Background worker threads, the most tasks that can be waiting for
+# them, and how long (in seconds) to wait for them when unloading
+WORKER_THREADS = 2
+WORKER_QUEUE_SIZE = 256
+WORKER_STOP_TIMEOUT = 2
+
+# How often (in ms) to check for results from the workers while no
+# animation is playing
+POLL_MS = 50
+
+# File (next to this script) that counter values are saved in, and how
+# many values can be appended to it before it's compacted
+JOURNAL_FILENAME = 'orly-journal.jsonl'
+JOURNAL_COMPACT_INTERVAL = 200
+
+# File (next to this script) that the history of counter changes is
+# saved in, and how many unwritten events to buffer
+HISTORY_FILENAME = 'orly-history.sqlite3'
+HISTORY_BUFFER_SIZE = 10000
+
+# Profiling: how many recent frame times to keep for the percentiles,
+# the number of (power-of-two) latency histogram buckets, and the file
+# (next to this script) the results are dumped to
+PROFILE_TICK_SAMPLES = 3600
+PROFILE_HISTOGRAM_BUCKETS = 16
+PROFILE_FILENAME = 'orly-profile.json'
+
+# How many sound effect latencies to keep per source
+SFX_LATENCY_SAMPLES = 100
+
+# How long (in ms) the settings have to stop changing before they're
+# applied
+SETTINGS_DEBOUNCE_MS = 250
+
+# Remote control: the port it listens on unless set otherwise (the same
+# as orlyremote.DEFAULT_PORT, which is only imported once remote control
+# is turned on), and how many command latencies to keep
+REMOTE_DEFAULT_PORT = 4460
+REMOTE_LATENCY_SAMPLES = 100
+INPUT_RECORDING_FILENAME = 'orly-input-%Y%m%d-%H%M%S.jsonl' # (strftime)
+
+# Counter ID -> OrlyStateMachine, for every configured counter
+stateMachines = {}
 
 
 def hexToColor(s):
@@ -83,12 +213,19 @@ def colorToRgba(color):
             (color >> 24) & 0xFF)
 
 
+# Text sources can only have outline colors on Windows; FreeType2
+# textboxes on Linux don't support them
+OUTLINES_SUPPORTED = sys.platform == 'win32'
+
+# Older versions of OBS don't let scripts defer scene item updates
+DEFERRED_UPDATES_SUPPORTED = hasattr(obs, 'obs_sceneitem_defer_update_begin')
+
 # The set of colors that the counter will use whenever it reaches a
-# given value: (fill, outline)
-if sys.platform == 'win32':
+# given value: (fill, outline). These are used if defaults.json doesn't
+# have a "color-brackets" entry.
+if OUTLINES_SUPPORTED:
     color250 = (hexToColor('#000000'), hexToColor('#ffffff'))
 else:
-    # FreeType2 textboxes on Linux don't support outlines
     color250 = (hexToColor('#444444'), None)
 COLORS = {
     0:   (hexToColor('#5fa128'), None),
@@ -100,42 +237,667 @@ COLORS = {
     300: (hexToColor('#ffffff'), None),
 }
 
+# Gamma used for gamma-correct color fades
+FADE_GAMMA = 2.2
+
+
+class ColorBrackets():
+    """
+    Sorted index of the colors the counter uses whenever it reaches a
+    given value.
+    """
+    def __init__(self, colors):
+        """
+        Initialize the index from a {bracket: (fill, outline)} dict.
+        """
+        self.brackets = sorted(colors)
+        self.colors = [colors[bracket] for bracket in self.brackets]
+
+
+    @classmethod
+    def fromJson(cls, brackets, outlinesSupported=OUTLINES_SUPPORTED):
+        """
+        Create the index from the "color-brackets" entry in
+        defaults.json, which maps each bracket to [fill],
+        [fill, outline] or [fill, outline, fill to use instead if
+        outlines aren't supported], with colors as "#RRGGBB" strings.
+        """
+        colors = {}
+        for bracket, entry in brackets.items():
+            fill = hexToColor(entry[0])
+            outline = None
+            if len(entry) >= 2 and entry[1] is not None:
+                if outlinesSupported:
+                    outline = hexToColor(entry[1])
+                elif len(entry) >= 3:
+                    fill = hexToColor(entry[2])
+            colors[int(bracket)] = (fill, outline)
+        return cls(colors)
+
+
+    def colorsFor(self, num):
+        """
+        Return the color and outline that should be used for the given
+        ORLY number.
+        """
+        i = bisect.bisect_right(self.brackets, num) - 1
+        if i < 0:
+            # default to white with no outline
+            return (rgbaToColor(255, 255, 255), None)
+        return self.colors[i]
+
+
+def blendChannel(a, b, pct, gammaCorrect=False):
+    """
+    Blend two 0-255 color channel values. If gammaCorrect is True, the
+    blending happens in linear light instead of directly on the values.
+    """
+    if not gammaCorrect:
+        return int(a + (b - a) * pct)
+
+    a = (a / 255) ** FADE_GAMMA
+    b = (b / 255) ** FADE_GAMMA
+    return int(round((a + (b - a) * pct) ** (1 / FADE_GAMMA) * 255))
+
+
+@functools.lru_cache(maxsize=64)
+def colorFadeTable(oldColors, newColors, steps, gammaCorrect=False):
+    """
+    Return a tuple of `steps` (fill, outline) color pairs that fade from
+    the (fill, outline) pair oldColors to newColors. Outlines of None
+    fade from/to transparent black.
+    """
+    # Blend the old and new colors
+    r1a, g1a, b1a, _ = colorToRgba(oldColors[0])
+    r2a, g2a, b2a, _ = colorToRgba(newColors[0])
+    fadeOutline = (oldColors[1] is not None
+                   or newColors[1] is not None)
+    if fadeOutline:
+        soC = oldColors[1]
+        if soC is None:
+            soC = rgbaToColor(0, 0, 0, 0)
+        outlineC = newColors[1]
+        if outlineC is None:
+            outlineC = rgbaToColor(0, 0, 0, 0)
+        r1b, g1b, b1b, a1b = colorToRgba(soC)
+        r2b, g2b, b2b, a2b = colorToRgba(outlineC)
+
+    table = []
+    for pct in fractionsOfOne(steps):
+        fadeColor = rgbaToColor(blendChannel(r1a, r2a, pct, gammaCorrect),
+                                blendChannel(g1a, g2a, pct, gammaCorrect),
+                                blendChannel(b1a, b2a, pct, gammaCorrect))
+        if fadeOutline:
+            # (alpha is always blended linearly)
+            a3b = int(a1b + (a2b - a1b) * pct)
+            if a3b <= 1:
+                fadeOutlineColor = None
+            else:
+                fadeOutlineColor = rgbaToColor(
+                    blendChannel(r1b, r2b, pct, gammaCorrect),
+                    blendChannel(g1b, g2b, pct, gammaCorrect),
+                    blendChannel(b1b, b2b, pct, gammaCorrect),
+                    a3b)
+        else:
+            fadeOutlineColor = None
+        table.append((fadeColor, fadeOutlineColor))
+
+    return tuple(table)
+
+
+def easeLinear(t):
+    return t
+
+
+def easeIn(t):
+    return t ** 3
+
+
+def easeOut(t):
+    return 1 - (1 - t) ** 3
+
+
+def easeInOut(t):
+    if t < 0.5:
+        return 4 * t ** 3
+    return 1 - (2 - 2 * t) ** 3 / 2
+
+
+def easeBack(t):
+    # Overshoots by about 10%, then settles back
+    overshoot = 1.70158
+    return 1 + (overshoot + 1) * (t - 1) ** 3 + overshoot * (t - 1) ** 2
+
+
+def easeBounce(t):
+    if t < 1 / 2.75:
+        return 7.5625 * t * t
+    elif t < 2 / 2.75:
+        t -= 1.5 / 2.75
+        return 7.5625 * t * t + 0.75
+    elif t < 2.5 / 2.75:
+        t -= 2.25 / 2.75
+        return 7.5625 * t * t + 0.9375
+    t -= 2.625 / 2.75
+    return 7.5625 * t * t + 0.984375
+
+
+def easeSpring(t):
+    # A damped oscillation around the end point
+    return 1 - math.exp(-6 * t) * math.cos(3 * math.pi * t)
+
+
+# Easing curves for the owl's movement, by the names used in the
+# settings. Each maps the fraction of time elapsed (0 to 1) to the
+# fraction of the distance travelled (which can overshoot).
+EASING_CURVES = {
+    'linear': easeLinear,
+    'ease-in': easeIn,
+    'ease-out': easeOut,
+    'ease-in-out': easeInOut,
+    'back': easeBack,
+    'bounce': easeBounce,
+    'spring': easeSpring,
+}
+
 
-def colorsForNum(num):
+@functools.lru_cache(maxsize=None)
+def easingTable(curve, steps):
     """
-    Return the color and outline that should be used for the given ORLY
-    number.
+    Return a tuple of `steps` samples of the named easing curve, like
+    fractionsOfOne() but eased. Unknown names are treated as 'linear'.
     """
-    currentBracket = 0
-    currentColor = (rgbaToColor(255, 255, 255), None) # default to white
-                                                      # with no outline
-    for bracket, col in COLORS.items():
-        if bracket >= currentBracket and bracket <= num:
-            currentBracket = bracket
-            currentColor = col
+    ease = EASING_CURVES.get(curve, easeLinear)
+    table = [ease(pct) for pct in fractionsOfOne(steps)]
+
+    # Make sure the owl ends up exactly where it belongs
+    if len(table) > 1:
+        table[0] = 0.0
+    if table:
+        table[-1] = 1.0
+    return tuple(table)
 
-    return currentColor
+
+def obsVideoFramerate():
+    """
+    Return the framerate OBS is rendering at, rounded to a whole number
+    (30 if it can't be determined).
+    """
+    videoInfo = obs.obs_video_info()
+    if not obs.obs_get_video_info(videoInfo) or not videoInfo.fps_den:
+        return 30
+    return max(int(round(videoInfo.fps_num / videoInfo.fps_den)), 1)
 
 
 def fractionsOfOne(iterations):
     """
     Count from 0 to 1 inclusive using `iterations` iterations.
     For example, fractionsOfOne(5) yields 0, 0.25, 0.5, 0.75, 1.
+    With a single iteration, it just yields 1.
     """
+    if iterations == 1:
+        yield 1.0
+        return
     for i in range(iterations):
         yield i / (iterations - 1)
 
 
+class Profiler():
+    """
+    Optional timing instrumentation for the script's hot paths.
+
+    Code is timed like this:
+
+        start = profiler.start()
+        ...
+        profiler.stop('name', start)
+
+    While profiling is turned off, start() returns None and stop()
+    returns straight away, so the instrumentation costs next to nothing.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+
+    def reset(self):
+        """
+        Throw away everything recorded so far.
+        """
+        self.calls = collections.Counter()
+        self.totals = collections.Counter()
+        self.maxima = collections.Counter()
+        self.histograms = {}
+        self.frameCalls = collections.Counter()
+        self.maxCallsPerFrame = collections.Counter()
+        self.frames = 0
+        self.overruns = 0
+        self.tickTimes = collections.deque(maxlen=PROFILE_TICK_SAMPLES)
+
+
+    def setEnabled(self, enabled):
+        """
+        Turn profiling on or off. Turning it on starts from scratch.
+        """
+        if enabled and not self.enabled:
+            self.reset()
+        self.enabled = enabled
+
+
+    def start(self):
+        """
+        Return the start time for a timed call, or None if profiling is
+        turned off.
+        """
+        if not self.enabled: return None
+        return time.perf_counter()
+
+
+    def stop(self, name, start):
+        """
+        Record a call to `name` that started at `start` (as returned by
+        start()), and return how long it took in seconds.
+        """
+        if start is None: return 0
+        elapsed = time.perf_counter() - start
+
+        self.calls[name] += 1
+        self.frameCalls[name] += 1
+        self.totals[name] += elapsed
+        self.maxima[name] = max(self.maxima[name], elapsed)
+
+        # Bucket i counts calls that took less than 2 ** i microseconds
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = \
+                [0] * PROFILE_HISTOGRAM_BUCKETS
+        bucket = int(elapsed * 1000000).bit_length()
+        histogram[min(bucket, PROFILE_HISTOGRAM_BUCKETS - 1)] += 1
+
+        return elapsed
+
+
+    def startFrame(self):
+        """
+        Like start(), but for a whole animation frame.
+        """
+        if not self.enabled: return None
+        self.frameCalls.clear()
+        return time.perf_counter()
+
+
+    def stopFrame(self, start, frameInterval):
+        """
+        Like stop(), but for a whole animation frame. frameInterval is
+        the time available for each frame, in seconds.
+        """
+        if start is None: return
+        elapsed = self.stop('tick', start)
+
+        self.frames += 1
+        self.tickTimes.append(elapsed)
+        if elapsed > frameInterval:
+            self.overruns += 1
+        for name, count in self.frameCalls.items():
+            if count > self.maxCallsPerFrame[name]:
+                self.maxCallsPerFrame[name] = count
+
+
+    def report(self, frameInterval):
+        """
+        Return everything recorded so far as a JSON-compatible dict.
+        Times are in milliseconds.
+        """
+        tickTimes = sorted(self.tickTimes)
+        def percentile(p):
+            if not tickTimes: return 0
+            return tickTimes[min(int(len(tickTimes) * p),
+                                 len(tickTimes) - 1)] * 1000
+
+        calls = {}
+        for name, count in sorted(self.calls.items()):
+            histogram = {}
+            for i, bucketCount in enumerate(self.histograms[name]):
+                if not bucketCount: continue
+                if i == PROFILE_HISTOGRAM_BUCKETS - 1:
+                    label = '>=%dus' % (2 ** (i - 1))
+                else:
+                    label = '<%dus' % (2 ** i)
+                histogram[label] = bucketCount
+
+            calls[name] = {
+                'count': count,
+                'meanMs': self.totals[name] / count * 1000,
+                'maxMs': self.maxima[name] * 1000,
+                'perFrameMean': count / max(self.frames, 1),
+                'perFrameMax': self.maxCallsPerFrame[name],
+                'histogram': histogram,
+            }
+
+        return {
+            'frames': self.frames,
+            'frameIntervalMs': frameInterval * 1000,
+            'tick': {
+                'p50Ms': percentile(0.5),
+                'p99Ms': percentile(0.99),
+                'maxMs': tickTimes[-1] * 1000 if tickTimes else 0,
+                'overruns': self.overruns,
+            },
+            'calls': calls,
+        }
+
+
+profiler = Profiler()
+
+
+def profiled(name):
+    """
+    Decorator that times every call to the decorated function when
+    profiling is turned on.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.stop(name, start)
+        return wrapper
+    return decorator
+
+
+class Lifecycle():
+    """
+    Bookkeeping for everything the script registers with OBS (hotkeys,
+    timers, signal connections and frontend event callbacks), so that
+    all of it can be removed when the script is unloaded, and so that
+    reloading the script doesn't leave stale callbacks behind.
+
+    OBS finds callbacks to remove by identity, and every access to a
+    bound method (like self.tick) creates a new object, so callbacks
+    are always removed using the exact object they were added with.
+
+    Timers are added and removed from several threads (hotkeys, workers
+    and remote control all wake the animation timer), so the lists are
+    only touched with self.lock held. The calls to OBS are made after
+    letting go of it, since OBS holds its own timer lock while it runs
+    timer callbacks, which take self.lock.
+    """
+    def __init__(self):
+        # [(hotkey ID, name, callback)]
+        self.hotkeys = []
+        self.timers = []
+        self.frontendCallbacks = []
+        # Signal connections, as returned by connectSignals()
+        self.signalConnections = []
+        self.lock = threading.Lock()
+
+
+    def registerHotkey(self, name, description, callback, settings):
+        """
+        Register a frontend hotkey, and restore its bindings from the
+        script settings (see saveHotkeys()).
+        """
+        hotkeyId = obs.obs_hotkey_register_frontend(name, description,
+                                                    callback)
+        bindings = obs.obs_data_get_array(settings, name)
+        if bindings is not None:
+            obs.obs_hotkey_load(hotkeyId, bindings)
+            obs.obs_data_array_release(bindings)
+        self.hotkeys.append((hotkeyId, name, callback))
+        return hotkeyId
+
+
+    def saveHotkeys(self, settings):
+        """
+        Save the bindings of all registered hotkeys to the script
+        settings.
+        """
+        for hotkeyId, name, callback in self.hotkeys:
+            bindings = obs.obs_hotkey_save(hotkeyId)
+            obs.obs_data_set_array(settings, name, bindings)
+            obs.obs_data_array_release(bindings)
+
+
+    def addTimer(self, callback, ms):
+        """
+        Call callback() every `ms` milliseconds.
+        """
+        with self.lock:
+            self.timers.append(callback)
+        obs.timer_add(callback, ms)
+
+
+    def removeTimer(self, callback):
+        """
+        Stop calling a timer callback.
+        """
+        with self.lock:
+            callback = self.forget(self.timers, callback)
+        if callback is not None:
+            obs.timer_remove(callback)
+
+
+    def removeCurrentTimer(self, callback):
+        """
+        Stop calling a timer callback, from inside that callback.
+        """
+        with self.lock:
+            self.forget(self.timers, callback)
+
+        # (even if it wasn't on the list: another thread can remove a
+        # timer between addTimer() listing it and adding it to OBS, and
+        # then it has to remove itself the next time it goes off)
+        obs.remove_current_callback()
+
+
+    def addFrontendCallback(self, callback):
+        """
+        Call callback(event) for every frontend event.
+        """
+        with self.lock:
+            self.frontendCallbacks.append(callback)
+        obs.obs_frontend_add_event_callback(callback)
+
+
+    def removeFrontendCallback(self, callback):
+        """
+        Stop calling a frontend event callback.
+        """
+        with self.lock:
+            callback = self.forget(self.frontendCallbacks, callback)
+        if callback is not None:
+            obs.obs_frontend_remove_event_callback(callback)
+
+
+    def connectSignals(self, handler, callbacks):
+        """
+        Connect a dict of {signal name: callback} to a signal handler.
+        Return an object to pass to disconnectSignals().
+        """
+        connection = (handler, list(callbacks.items()))
+        for signal, callback in connection[1]:
+            obs.signal_handler_connect(handler, signal, callback)
+        with self.lock:
+            self.signalConnections.append(connection)
+        return connection
+
+
+    def disconnectSignals(self, connection):
+        """
+        Disconnect signals connected with connectSignals(). (Only do
+        this while the signal handler's owner is still alive.)
+        """
+        with self.lock:
+            for i, other in enumerate(self.signalConnections):
+                if other is connection:
+                    del self.signalConnections[i]
+                    break
+            else:
+                return
+
+        handler, callbacks = connection
+        for signal, callback in callbacks:
+            obs.signal_handler_disconnect(handler, signal, callback)
+
+
+    @staticmethod
+    def forget(callbacks, callback):
+        """
+        Remove a callback from a list of them, and return the object
+        that was in the list (or None if it wasn't there). Call with the
+        lock held.
+        """
+        for i, other in enumerate(callbacks):
+            if other == callback:
+                return callbacks.pop(i)
+        return None
+
+
+    def releaseAll(self):
+        """
+        Remove everything that's still registered. Return how many
+        timers, signal connections and frontend callbacks were left
+        over (hotkeys are expected to be left over).
+        """
+        with self.lock:
+            leftovers = (len(self.timers) + len(self.signalConnections)
+                         + len(self.frontendCallbacks))
+            timers = list(self.timers)
+            frontendCallbacks = list(self.frontendCallbacks)
+            signalConnections = list(self.signalConnections)
+
+        for hotkeyId, name, callback in self.hotkeys:
+            obs.obs_hotkey_unregister(callback)
+        self.hotkeys.clear()
+        for callback in timers:
+            self.removeTimer(callback)
+        for callback in frontendCallbacks:
+            self.removeFrontendCallback(callback)
+        for connection in signalConnections:
+            self.disconnectSignals(connection)
+
+        return leftovers
+
+
+lifecycle = Lifecycle()
+
+
+class ReferenceTracker():
+    """
+    Optional accounting of the OBS references the script acquires and
+    releases, for tracking down leaks.
+
+    While it's enabled, every acquire is recorded along with its call
+    site (for the context managers below, that's the `with` statement),
+    and every release removes it again, so whatever is left when the
+    script is unloaded has leaked. While it's disabled, acquired() and
+    released() return straight away.
+    """
+    def __init__(self):
+        self.enabled = False
+        # (kind, id(obj)) -> (obj, [call site of each reference])
+        self.outstanding = {}
+
+
+    def setEnabled(self, enabled):
+        """
+        Turn accounting on or off. Turning it on starts from scratch.
+        """
+        if enabled and not self.enabled:
+            self.outstanding.clear()
+        self.enabled = enabled
+
+
+    def acquired(self, kind, obj):
+        """
+        Record that a reference to `obj` (a 'source', 'sceneitem',
+        'data' or 'list') was acquired. Returns its call site, which can
+        be passed back to released().
+        """
+        if not self.enabled or obj is None: return None
+        site = self.callSite()
+        # (keeping obj alive means its id can't be reused in the
+        # meantime)
+        entry = self.outstanding.setdefault((kind, id(obj)), (obj, []))
+        entry[1].append(site)
+        return site
+
+
+    def released(self, kind, obj, site=None):
+        """
+        Record that a reference to `obj` was released. `site` is the
+        value acquired() returned for it, if known.
+        """
+        if not self.enabled or obj is None: return
+        key = (kind, id(obj))
+        entry = self.outstanding.get(key)
+        if entry is None: return
+
+        sites = entry[1]
+        if site in sites:
+            sites.remove(site)
+        else:
+            # Otherwise, assume it's the oldest one (long-lived handles
+            # are normally acquired first)
+            del sites[0]
+        if not sites:
+            del self.outstanding[key]
+
+
+    @staticmethod
+    def callSite():
+        """
+        Return a description of the code that's acquiring a reference.
+        """
+        frame = sys._getframe(2)
+
+        # If it's one of our context managers, report the code using it
+        if frame.f_code.co_flags & inspect.CO_GENERATOR:
+            frame = frame.f_back
+            while frame.f_code.co_filename == contextlib.__file__:
+                frame = frame.f_back
+
+        return '%s:%d (%s)' % (os.path.basename(frame.f_code.co_filename),
+                               frame.f_lineno,
+                               frame.f_code.co_name)
+
+
+    def report(self):
+        """
+        Return a list of (count, kind, call site) for the references
+        that haven't been released, most common first.
+        """
+        counts = collections.Counter(
+            (kind, site)
+            for (kind, _), (obj, sites) in self.outstanding.items()
+            for site in sites)
+        return [(count, kind, site)
+                for (kind, site), count in counts.most_common()]
+
+
+refTracker = ReferenceTracker()
+
+
 @contextlib.contextmanager
 def getSourceByName(name):
     """
     Context manager to call obs_get_source_by_name() and release the
     source when done.
     """
+    start = profiler.start()
     source = obs.obs_get_source_by_name(name)
-    yield source
-    if source is not None:
-        obs.obs_source_release(source)
+    profiler.stop('getSourceByName', start)
+    site = refTracker.acquired('source', source)
+    try:
+        yield source
+    finally:
+        if source is not None:
+            refTracker.released('source', source, site)
+            obs.obs_source_release(source)
 
 
 @contextlib.contextmanager
@@ -145,9 +907,13 @@ def sourceGetFilterByName(source, name):
     the filter when done.
     """
     filter = obs.obs_source_get_filter_by_name(source, name)
-    yield filter
-    if filter is not None:
-        obs.obs_source_release(filter)
+    site = refTracker.acquired('source', filter)
+    try:
+        yield filter
+    finally:
+        if filter is not None:
+            refTracker.released('source', filter, site)
+            obs.obs_source_release(filter)
 
 
 @contextlib.contextmanager
@@ -157,9 +923,32 @@ def frontendGetCurrentScene():
     the source when done.
     """
     source = obs.obs_frontend_get_current_scene()
-    yield source
-    if source is not None:
-        obs.obs_source_release(source)
+    site = refTracker.acquired('source', source)
+    try:
+        yield source
+    finally:
+        if source is not None:
+            refTracker.released('source', source, site)
+            obs.obs_source_release(source)
+
+
+@contextlib.contextmanager
+def frontendGetScenes():
+    """
+    Context manager to call obs_frontend_get_scenes() and release the
+    list when done.
+    """
+    sources = obs.obs_frontend_get_scenes()
+    if sources is None:
+        yield []
+        return
+
+    site = refTracker.acquired('list', sources)
+    try:
+        yield sources
+    finally:
+        refTracker.released('list', sources, site)
+        obs.source_list_release(sources)
 
 
 @contextlib.contextmanager
@@ -168,9 +957,13 @@ def getSourceSettings(source):
     Context manager to get source settings and release them when done.
     """
     settings = obs.obs_source_get_settings(source)
-    yield settings
-    if settings is not None:
-        obs.obs_data_release(settings)
+    site = refTracker.acquired('data', settings)
+    try:
+        yield settings
+    finally:
+        if settings is not None:
+            refTracker.released('data', settings, site)
+            obs.obs_data_release(settings)
 
 
 @contextlib.contextmanager
@@ -180,8 +973,12 @@ def createObsData():
     done.
     """
     data = obs.obs_data_create()
-    yield data
-    obs.obs_data_release(data)
+    site = refTracker.acquired('data', data)
+    try:
+        yield data
+    finally:
+        refTracker.released('data', data, site)
+        obs.obs_data_release(data)
 
 
 @contextlib.contextmanager
@@ -193,8 +990,13 @@ def enumSources():
     sources = obs.obs_enum_sources()
     if sources is None:
         yield []
-    else:
+        return
+
+    site = refTracker.acquired('list', sources)
+    try:
         yield sources
+    finally:
+        refTracker.released('list', sources, site)
         obs.source_list_release(sources)
 
 
@@ -204,18 +1006,2541 @@ def sceneEnumItems(scene):
     Context manager to call obs_scene_enum_items() and release the list
     when done.
     """
+    start = profiler.start()
     items = obs.obs_scene_enum_items(scene)
+    profiler.stop('sceneEnumItems', start)
     if items is None:
         yield []
-    else:
+        return
+
+    site = refTracker.acquired('list', items)
+    try:
+        yield items
+    finally:
+        refTracker.released('list', items, site)
+        obs.sceneitem_list_release(items)
+
+
+@contextlib.contextmanager
+def sceneItemGroupEnumItems(item):
+    """
+    Context manager to call obs_sceneitem_group_enum_items() and release
+    the list when done.
+    """
+    start = profiler.start()
+    items = obs.obs_sceneitem_group_enum_items(item)
+    profiler.stop('sceneItemGroupEnumItems', start)
+    if items is None:
+        yield []
+        return
+
+    site = refTracker.acquired('list', items)
+    try:
         yield items
+    finally:
+        refTracker.released('list', items, site)
         obs.sceneitem_list_release(items)
 
 
+class SceneItemIndex():
+    """
+    Index of the scene items in every scene, keyed by source name.
+
+    Scanning the scenes on every animation frame gets slow for scenes
+    with lots of items, so the index is built the first time it's
+    needed, and then kept up to date as items are added to and removed
+    from scenes and sources are renamed. It's only rebuilt from scratch
+    when the list of scenes itself changes.
+
+    Items in groups are indexed too. Each group has a scene of its own,
+    with its own signals, so we listen to those as well.
+
+    The signals arrive on whichever thread changed the scene, while the
+    index is read on the animation timer (and hotkey) threads, so the
+    index is only changed with self.lock held, and readers get their own
+    reference to each item, so that an item removed on another thread
+    isn't released while it's being written to. As in Lifecycle, the
+    lock isn't held while calling OBS functions that can wait for OBS's
+    own locks (enumerating scenes, connecting signals, releasing).
+    """
+    sceneSources = None
+    groupNames = None
+    items = None
+    globalConnection = None
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+
+    def itemsForSource(self, sourceName):
+        """
+        Return a tuple of the scene items in all scenes that use the
+        source with the given name. The caller gets a reference to each
+        of them, and has to give them back with releaseItems().
+        """
+        if self.items is None:
+            self.rebuild()
+
+        with self.lock:
+            items = self.items.get(sourceName, ()) \
+                if self.items is not None else ()
+            for item in items:
+                obs.obs_sceneitem_addref(item)
+                refTracker.acquired('sceneitem', item)
+        return items
+
+
+    @staticmethod
+    def releaseItems(items):
+        """
+        Release scene items returned by itemsForSource().
+        """
+        for item in items:
+            refTracker.released('sceneitem', item)
+            obs.obs_sceneitem_release(item)
+
+
+    def rebuild(self):
+        """
+        Scan every scene and index its items, unless that's already been
+        done.
+        """
+        with self.lock:
+            if self.items is not None: return
+            self.items = {}
+            self.sceneSources = []
+            self.groupNames = set()
+
+        # (items added on other threads while this is going on are
+        # indexed by the signal handlers, and not twice; see addItem())
+        with frontendGetScenes() as sceneSources:
+            for sceneSource in sceneSources:
+                scene = obs.obs_scene_from_source(sceneSource)
+                if scene is None: continue
+
+                self.watchScene(sceneSource)
+                with sceneEnumItems(scene) as items:
+                    for item in items:
+                        if item is not None:
+                            self.addItem(item)
+
+
+    def watchScene(self, sceneSource):
+        """
+        Listen for items being added to and removed from a scene (or
+        group). We keep a reference to it until the index is
+        invalidated.
+        """
+        obs.obs_source_addref(sceneSource)
+        refTracker.acquired('source', sceneSource)
+        connection = lifecycle.connectSignals(
+            obs.obs_source_get_signal_handler(sceneSource),
+            {'item_add': self.handleItemAdd,
+             'item_remove': self.handleItemRemove})
+
+        with self.lock:
+            if self.sceneSources is not None:
+                self.sceneSources.append((sceneSource, connection))
+                return
+
+        # The index was invalidated in the meantime
+        lifecycle.disconnectSignals(connection)
+        refTracker.released('source', sceneSource)
+        obs.obs_source_release(sceneSource)
+
+
+    def addItem(self, item):
+        """
+        Add a scene item to the index, and if it's a group, the items in
+        it.
+        """
+        itemSource = obs.obs_sceneitem_get_source(item)
+        itemSourceName = obs.obs_source_get_name(itemSource)
+        itemKey = self.itemKey(item)
+
+        with self.lock:
+            if self.items is None: return
+            indexed = self.items.get(itemSourceName, ())
+            if any(self.itemKey(other) == itemKey for other in indexed):
+                return
+
+            # We keep our own reference to the item, since the list or
+            # signal it came from is about to be released
+            obs.obs_sceneitem_addref(item)
+            refTracker.acquired('sceneitem', item)
+            self.items[itemSourceName] = indexed + (item,)
+
+            # (a group can be in more than one scene, but its items are
+            # the same ones in each)
+            newGroup = (obs.obs_sceneitem_is_group(item)
+                        and itemSourceName not in self.groupNames)
+            if newGroup:
+                self.groupNames.add(itemSourceName)
+
+        # The new item won't have what we wrote to the others
+        sourceWriter.forgetItems(itemSourceName)
+
+        if newGroup:
+            self.watchScene(itemSource)
+            with sceneItemGroupEnumItems(item) as items:
+                for child in items:
+                    if child is not None:
+                        self.addItem(child)
+
+
+    def removeItem(self, item):
+        """
+        Remove a scene item from the index.
+        """
+        # Removing a group can take any number of items with it (or
+        # none, if it's in another scene too), so start over
+        if obs.obs_sceneitem_is_group(item):
+            self.invalidate()
+            return
+
+        itemSource = obs.obs_sceneitem_get_source(item)
+        itemSourceName = obs.obs_source_get_name(itemSource)
+        itemKey = self.itemKey(item)
+
+        removed = []
+        with self.lock:
+            if self.items is None: return
+            kept = []
+            for indexed in self.items.get(itemSourceName, ()):
+                if self.itemKey(indexed) == itemKey:
+                    removed.append(indexed)
+                else:
+                    kept.append(indexed)
+
+            if kept:
+                self.items[itemSourceName] = tuple(kept)
+            else:
+                self.items.pop(itemSourceName, None)
+
+        self.releaseItems(removed)
+
+
+    @staticmethod
+    def itemKey(item):
+        """
+        Return something that identifies a scene item. (Item IDs are
+        only unique within a scene.)
+        """
+        scene = obs.obs_sceneitem_get_scene(item)
+        return (obs.obs_source_get_name(obs.obs_scene_get_source(scene)),
+                obs.obs_sceneitem_get_id(item))
+
+
+    def invalidate(self):
+        """
+        Throw away the index and release everything it was holding. It
+        will be rebuilt the next time it's needed.
+        """
+        with self.lock:
+            items, self.items = self.items, None
+            sceneSources, self.sceneSources = self.sceneSources, None
+            self.groupNames = None
+
+        if items is not None:
+            for sourceItems in items.values():
+                self.releaseItems(sourceItems)
+            sourceWriter.forgetItems()
+
+        if sceneSources is not None:
+            for sceneSource, connection in sceneSources:
+                lifecycle.disconnectSignals(connection)
+                refTracker.released('source', sceneSource)
+                obs.obs_source_release(sceneSource)
+
+
+    def handleItemAdd(self, calldata):
+        """
+        Called when an item is added to any scene or group.
+        """
+        if self.items is None: return
+        item = obs.calldata_sceneitem(calldata, 'item')
+        if item is not None:
+            self.addItem(item)
+
+
+    def handleItemRemove(self, calldata):
+        """
+        Called when an item is removed from any scene or group.
+        """
+        if self.items is None: return
+        item = obs.calldata_sceneitem(calldata, 'item')
+        if item is not None:
+            self.removeItem(item)
+
+
+    def handleSourceRename(self, calldata):
+        """
+        Called when any source is renamed.
+        """
+        prevName = obs.calldata_string(calldata, 'prev_name')
+        newName = obs.calldata_string(calldata, 'new_name')
+        with self.lock:
+            if self.items is None: return
+            renamed = prevName in self.items
+            if renamed:
+                self.items[newName] = self.items.pop(prevName)
+            if prevName in self.groupNames:
+                self.groupNames.remove(prevName)
+                self.groupNames.add(newName)
+
+        if renamed:
+            sourceWriter.forgetItems(prevName)
+            sourceWriter.forgetItems(newName)
+
+
+    def handleFrontendEvent(self, event):
+        """
+        Called for frontend events. We only care about the ones that
+        change which scenes exist. (Switching between scenes doesn't
+        matter, since all of them are indexed.)
+        """
+        if event in (obs.OBS_FRONTEND_EVENT_SCENE_LIST_CHANGED,
+                     obs.OBS_FRONTEND_EVENT_SCENE_COLLECTION_CHANGED,
+                     obs.OBS_FRONTEND_EVENT_SCENE_COLLECTION_CLEANUP,
+                     obs.OBS_FRONTEND_EVENT_EXIT):
+            self.invalidate()
+
+
+    def connect(self):
+        """
+        Start listening for the events that change the index.
+        """
+        lifecycle.addFrontendCallback(self.handleFrontendEvent)
+        self.globalConnection = lifecycle.connectSignals(
+            obs.obs_get_signal_handler(),
+            {'source_rename': self.handleSourceRename})
+
+
+    def disconnect(self):
+        """
+        Stop listening for events, and release the index.
+        """
+        lifecycle.removeFrontendCallback(self.handleFrontendEvent)
+        lifecycle.disconnectSignals(self.globalConnection)
+        self.invalidate()
+
+
+sceneItemIndex = SceneItemIndex()
+
+
+class SourceHandleCache():
+    """
+    Cache of source and filter references, keyed by name.
+
+    Looking sources and filters up by name takes a hash lookup and a
+    reference-count round trip each time, which adds up when it happens
+    for several sources on every animation frame. So we hold on to the
+    references instead, and drop them when OBS tells us the source has
+    been renamed or removed (or a filter has been added to or removed
+    from it).
+
+    Handles returned by get() and getFilter() are borrowed: don't
+    release them.
+    """
+    def __init__(self):
+        # name -> source (or None if there's no source by that name)
+        self.sources = {}
+        # (source name, filter name) -> filter (or None)
+        self.filters = {}
+        # owner -> (source names, filter keys) passed to setNames()
+        self.wanted = {}
+        # name -> signal connection (see Lifecycle.connectSignals())
+        self.connections = {}
+        self.globalConnection = None
+
+
+    def get(self, name):
+        """
+        Return the source with the given name, or None.
+        """
+        try:
+            return self.sources[name]
+        except KeyError:
+            pass
+
+        start = profiler.start()
+        source = obs.obs_get_source_by_name(name)
+        profiler.stop('getSourceByName', start)
+        if source is not None:
+            refTracker.acquired('source', source)
+            self.connections[name] = lifecycle.connectSignals(
+                obs.obs_source_get_signal_handler(source),
+                {'filter_add': self.handleFilterSignal,
+                 'filter_remove': self.handleFilterSignal,
+                 'media_started': self.handleMediaStarted})
+        self.sources[name] = source
+        return source
+
+
+    def getFilter(self, sourceName, filterName):
+        """
+        Return the filter with the given name on the source with the
+        given name, or None.
+        """
+        key = (sourceName, filterName)
+        try:
+            return self.filters[key]
+        except KeyError:
+            pass
+
+        source = self.get(sourceName)
+        if source is None:
+            filter = None
+        else:
+            start = profiler.start()
+            filter = obs.obs_source_get_filter_by_name(source, filterName)
+            profiler.stop('sourceGetFilterByName', start)
+            refTracker.acquired('source', filter)
+        self.filters[key] = filter
+        return filter
+
+
+    def setNames(self, owner, names, filters=()):
+        """
+        Set the source names, and the (source name, filter name)
+        filters, that `owner` uses. Handles are kept for exactly the
+        ones some owner uses, and any that aren't cached yet are looked
+        up now.
+        """
+        self.wanted[owner] = (set(names), set(filters))
+        allNames = set()
+        allFilters = set()
+        for ownerNames, ownerFilters in self.wanted.values():
+            allNames |= ownerNames
+            allFilters |= ownerFilters
+
+        for name in list(self.sources):
+            if name not in allNames:
+                self.invalidate(name)
+        for key in list(self.filters):
+            if key not in allFilters:
+                self.invalidateFilter(key)
+
+        for name in names:
+            if name:
+                self.get(name)
+        for sourceName, filterName in filters:
+            if sourceName:
+                self.getFilter(sourceName, filterName)
+
+
+    def invalidate(self, name):
+        """
+        Release and forget the source with the given name, and its
+        filters.
+        """
+        for key in list(self.filters):
+            if key[0] == name:
+                self.invalidateFilter(key)
+
+        source = self.sources.pop(name, None)
+        if source is not None:
+            lifecycle.disconnectSignals(self.connections.pop(name))
+            refTracker.released('source', source)
+            obs.obs_source_release(source)
+
+
+    def invalidateFilter(self, key):
+        """
+        Release and forget the filter with the given (source name,
+        filter name) key.
+        """
+        filter = self.filters.pop(key, None)
+        if filter is not None:
+            refTracker.released('source', filter)
+            obs.obs_source_release(filter)
+
+
+    def releaseAll(self):
+        """
+        Release everything.
+        """
+        for name in list(self.sources):
+            self.invalidate(name)
+        self.wanted.clear()
+
+
+    def handleSourceCreate(self, calldata):
+        """
+        Called when any source is created. If we'd cached the fact that
+        there was no source by its name, forget that.
+        """
+        source = obs.calldata_source(calldata, 'source')
+        if source is None: return
+        name = obs.obs_source_get_name(source)
+        if name in self.sources and self.sources[name] is None:
+            self.invalidate(name)
+
+
+    def handleSourceRemove(self, calldata):
+        """
+        Called when any source is removed.
+        """
+        source = obs.calldata_source(calldata, 'source')
+        if source is None: return
+        self.invalidate(obs.obs_source_get_name(source))
+
+
+    def handleSourceRename(self, calldata):
+        """
+        Called when any source (or filter) is renamed.
+        """
+        prevName = obs.calldata_string(calldata, 'prev_name')
+        newName = obs.calldata_string(calldata, 'new_name')
+        self.invalidate(prevName)
+        self.invalidate(newName)
+
+        # If it was a filter, we can't easily tell which source it's on
+        for key in list(self.filters):
+            if key[1] in (prevName, newName):
+                self.invalidateFilter(key)
+
+
+    def ensureOpacityFilter(self, sourceName):
+        """
+        Add an Opacity filter to the source with the given name, if it
+        doesn't have one already.
+        """
+        source = self.get(sourceName)
+        if source is None: return
+        if self.getFilter(sourceName, OPACITY_FILTER_NAME) is not None: return
+
+        with createObsData() as settings:
+            obs.obs_data_set_string(
+                settings,
+                'image_path',
+                os.path.join(os.path.dirname(__file__), OPACITY_FILTER_IMAGE))
+            obs.obs_data_set_int(settings, 'opacity', 100)
+            filter = obs.obs_source_create_private(OPACITY_FILTER_ID,
+                                                   OPACITY_FILTER_NAME,
+                                                   settings)
+        if filter is None: return
+
+        # (this invalidates the filter we cached as missing)
+        obs.obs_source_filter_add(source, filter)
+        obs.obs_source_release(filter)
+        print('ORLY: Added an %s filter to %s'
+              % (OPACITY_FILTER_NAME, sourceName))
+
+
+    def handleFilterSignal(self, calldata):
+        """
+        Called when a filter is added to or removed from one of the
+        cached sources.
+        """
+        source = obs.calldata_source(calldata, 'source')
+        if source is None: return
+        name = obs.obs_source_get_name(source)
+        for key in list(self.filters):
+            if key[0] == name:
+                self.invalidateFilter(key)
+
+
+    def handleMediaStarted(self, calldata):
+        """
+        Called when one of the cached sources starts playing media.
+        """
+        source = obs.calldata_source(calldata, 'source')
+        if source is None: return
+        soundEffects.handleMediaStarted(obs.obs_source_get_name(source))
+
+
+    def connect(self):
+        """
+        Start listening for the signals that invalidate cached handles.
+        """
+        self.globalConnection = lifecycle.connectSignals(
+            obs.obs_get_signal_handler(),
+            {'source_create': self.handleSourceCreate,
+             'source_remove': self.handleSourceRemove,
+             'source_rename': self.handleSourceRename})
+
+
+    def disconnect(self):
+        """
+        Stop listening for signals, and release all handles.
+        """
+        lifecycle.disconnectSignals(self.globalConnection)
+        self.releaseAll()
+
+
+sourceHandles = SourceHandleCache()
+
+
+class SourceCatalog():
+    """
+    Catalog of the names of the sources that can be used for each part
+    of the overlay ('text', 'image' or 'media'), for the properties
+    dialog.
+
+    Enumerating every source each time the dialog is opened is slow for
+    big scene collections, so the catalog is built the first time it's
+    needed and then kept up to date from the global source signals.
+    """
+    def __init__(self):
+        self.names = None
+        self.currentSceneOnly = False
+        self.connection = None
+
+
+    def sourceNames(self, kind):
+        """
+        Return a list of the names of the sources of the given kind,
+        limited to the sources in the current scene if
+        self.currentSceneOnly is True.
+        """
+        if self.names is None:
+            self.rebuild()
+        names = self.names[kind]
+
+        if self.currentSceneOnly:
+            inScene = set()
+            with frontendGetCurrentScene() as sceneSource:
+                scene = obs.obs_scene_from_source(sceneSource) \
+                    if sceneSource is not None else None
+                if scene is not None:
+                    with sceneEnumItems(scene) as items:
+                        for item in items:
+                            inScene.add(obs.obs_source_get_name(
+                                obs.obs_sceneitem_get_source(item)))
+            return [name for name in names if name in inScene]
+
+        return list(names)
+
+
+    def rebuild(self):
+        """
+        Enumerate all sources and catalog them.
+        """
+        self.names = {kind: {} for kind in set(SOURCE_KINDS.values())}
+        with enumSources() as sources:
+            for source in sources:
+                self.add(source)
+
+
+    def add(self, source):
+        """
+        Add a source to the catalog, if it's of a kind we can use.
+        """
+        kind = SOURCE_KINDS.get(obs.obs_source_get_id(source))
+        if kind is not None:
+            # (dicts are used as ordered sets)
+            self.names[kind][obs.obs_source_get_name(source)] = None
+
+
+    def handleSourceCreate(self, calldata):
+        """
+        Called when any source is created.
+        """
+        if self.names is None: return
+        source = obs.calldata_source(calldata, 'source')
+        if source is not None:
+            self.add(source)
+
+
+    def handleSourceRemove(self, calldata):
+        """
+        Called when any source is removed or destroyed.
+        """
+        if self.names is None: return
+        source = obs.calldata_source(calldata, 'source')
+        if source is None: return
+        name = obs.obs_source_get_name(source)
+        for names in self.names.values():
+            names.pop(name, None)
+
+
+    def handleSourceRename(self, calldata):
+        """
+        Called when any source is renamed.
+        """
+        if self.names is None: return
+        prevName = obs.calldata_string(calldata, 'prev_name')
+        newName = obs.calldata_string(calldata, 'new_name')
+        for kind, names in self.names.items():
+            if prevName in names:
+                # Keep it in the same place in the list
+                self.names[kind] = {newName if name == prevName else name:
+                                    None for name in names}
+
+
+    def connect(self):
+        """
+        Start listening for the signals that change the catalog.
+        """
+        self.connection = lifecycle.connectSignals(
+            obs.obs_get_signal_handler(),
+            {'source_create': self.handleSourceCreate,
+             'source_remove': self.handleSourceRemove,
+             'source_destroy': self.handleSourceRemove,
+             'source_rename': self.handleSourceRename})
+
+
+    def disconnect(self):
+        """
+        Stop listening for signals, and throw the catalog away.
+        """
+        lifecycle.disconnectSignals(self.connection)
+        self.names = None
+
+
+sourceCatalog = SourceCatalog()
+
+
+class SourceWriter():
+    """
+    Shadow copy of the settings we've written to sources and filters.
+
+    Updating a text source makes OBS lay out and render the text again,
+    even if nothing actually changed. So instead of updating sources
+    immediately, writes are collected here until flush() is called
+    (once per animation frame). Writes of values the source already has
+    are dropped, and all of the changes to one source are merged into a
+    single obs_source_update() call.
+
+    Scene item changes (position, visibility and crop, applied to every
+    item of a source) are collected the same way, and the items' updates
+    are deferred while a frame's changes are applied, so that they all
+    land together and each item's transform is only recalculated once.
+    """
+    def __init__(self):
+        # (source name, filter name or None) -> {key: value}
+        self.committed = {}
+        self.pending = {}
+        # source name -> {'pos' / 'visible' / 'crop': value}
+        self.committedItems = {}
+        self.pendingItems = {}
+        # How many transaction() blocks we're in
+        self.depth = 0
+
+        self.writesRequested = 0
+        self.writesCommitted = 0
+        self.itemWritesRequested = 0
+        self.itemWritesCommitted = 0
+
+
+    @staticmethod
+    def queue(committed, pending, target, values):
+        """
+        Add the values that aren't already committed to the pending
+        values for `target`.
+        """
+        committedValues = committed.get(target, {})
+        pendingValues = pending.get(target)
+        for key, value in values.items():
+            if key in committedValues and committedValues[key] == value:
+                # No-op, unless it undoes an earlier write this frame
+                if pendingValues is not None:
+                    pendingValues.pop(key, None)
+            else:
+                if pendingValues is None:
+                    pendingValues = pending[target] = {}
+                pendingValues[key] = value
+
+
+    def update(self, sourceName, filterName, values):
+        """
+        Queue a settings update for the given source (or, if filterName
+        isn't None, that filter on the source).
+        """
+        self.writesRequested += 1
+        self.queue(self.committed, self.pending,
+                   (sourceName, filterName), values)
+
+
+    def setPos(self, sourceName, x=None, y=None):
+        """
+        Queue moving the scene items of the given source. If either
+        coordinate is None, that coordinate isn't changed.
+        """
+        if x is None or y is None:
+            known = (self.pendingItems.get(sourceName, {}).get('pos')
+                     or self.committedItems.get(sourceName, {}).get('pos'))
+            if known is not None:
+                if x is None: x = known[0]
+                if y is None: y = known[1]
+        self.itemWritesRequested += 1
+        self.queue(self.committedItems, self.pendingItems,
+                   sourceName, {'pos': (x, y)})
+
+
+    def setVisible(self, sourceName, visible):
+        """
+        Queue showing or hiding the scene items of the given source.
+        """
+        self.itemWritesRequested += 1
+        self.queue(self.committedItems, self.pendingItems,
+                   sourceName, {'visible': visible})
+
+
+    def setCrop(self, sourceName, left=0, right=0, top=0, bottom=0):
+        """
+        Queue cropping the scene items of the given source.
+        """
+        self.itemWritesRequested += 1
+        self.queue(self.committedItems, self.pendingItems,
+                   sourceName, {'crop': (left, right, top, bottom)})
+
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Context manager for a batch of changes that should land
+        together: everything queued inside it is flushed when the
+        outermost transaction ends.
+        """
+        self.depth += 1
+        try:
+            yield
+        finally:
+            self.depth -= 1
+            if self.depth == 0:
+                self.flush()
+
+
+    def flush(self):
+        """
+        Send all queued updates to OBS (unless we're in a transaction,
+        in which case that happens at the end of it).
+        """
+        if self.depth: return
+        pending, self.pending = self.pending, {}
+        pendingItems, self.pendingItems = self.pendingItems, {}
+
+        # (we hold a reference to each of these items until we're done,
+        # since the index can let go of them on another thread)
+        items = []
+        for sourceName, values in list(pendingItems.items()):
+            sourceItems = sceneItemIndex.itemsForSource(sourceName) \
+                if values else ()
+            if not sourceItems:
+                # (nothing was written, so there's nothing to remember)
+                del pendingItems[sourceName]
+                continue
+            items += [(item, values) for item in sourceItems]
+
+        if DEFERRED_UPDATES_SUPPORTED:
+            for item, values in items:
+                obs.obs_sceneitem_defer_update_begin(item)
+        try:
+            for (sourceName, filterName), values in pending.items():
+                if not values: continue
+
+                if filterName is None:
+                    source = sourceHandles.get(sourceName)
+                else:
+                    source = sourceHandles.getFilter(sourceName, filterName)
+                if source is None: continue
+
+                self.commit(source, values)
+
+                self.committed.setdefault((sourceName, filterName), {}) \
+                    .update(values)
+
+            for item, values in items:
+                self.commitItem(item, values)
+        finally:
+            if DEFERRED_UPDATES_SUPPORTED:
+                for item, values in items:
+                    obs.obs_sceneitem_defer_update_end(item)
+            sceneItemIndex.releaseItems([item for item, values in items])
+
+        for sourceName, values in pendingItems.items():
+            self.itemWritesCommitted += 1
+            committed = self.committedItems.setdefault(sourceName, {})
+            committed.update(values)
+            if None in committed.get('pos', ()):
+                # The items could each have had a different position,
+                # so there's nothing to remember
+                del committed['pos']
+
+
+    def commit(self, source, values):
+        """
+        Write the given settings to a source with a single
+        obs_source_update() call.
+        """
+        with createObsData() as settings:
+            for key, value in values.items():
+                if isinstance(value, bool):
+                    obs.obs_data_set_bool(settings, key, value)
+                elif isinstance(value, int):
+                    obs.obs_data_set_int(settings, key, value)
+                elif isinstance(value, float):
+                    obs.obs_data_set_double(settings, key, value)
+                else:
+                    obs.obs_data_set_string(settings, key, value)
+            start = profiler.start()
+            obs.obs_source_update(source, settings)
+            profiler.stop('obs_source_update', start)
+        self.writesCommitted += 1
+
+
+    def commitItem(self, item, values):
+        """
+        Apply the given changes to a scene item.
+        """
+        if 'pos' in values:
+            x, y = values['pos']
+            pos = obs.vec2()
+            if x is None or y is None:
+                obs.obs_sceneitem_get_pos(item, pos)
+            if x is not None:
+                pos.x = x
+            if y is not None:
+                pos.y = y
+            obs.obs_sceneitem_set_pos(item, pos)
+
+        if 'crop' in values:
+            crop = obs.obs_sceneitem_crop()
+            crop.left, crop.right, crop.top, crop.bottom = values['crop']
+            obs.obs_sceneitem_set_crop(item, crop)
+
+        if 'visible' in values:
+            obs.obs_sceneitem_set_visible(item, values['visible'])
+
+
+    def forget(self, sourceName=None):
+        """
+        Forget what we've written to the given source and its filters
+        and scene items (or to all sources, if sourceName is None), so
+        that the next writes to it will go through even if they look
+        redundant.
+        """
+        for target in list(self.committed):
+            if sourceName is None or target[0] == sourceName:
+                del self.committed[target]
+        self.forgetItems(sourceName)
+
+
+    def forgetItems(self, sourceName=None):
+        """
+        Forget what we've written to the scene items of the given source
+        (or of all sources, if sourceName is None).
+        """
+        if sourceName is None:
+            self.committedItems.clear()
+        else:
+            self.committedItems.pop(sourceName, None)
+
+
+    def describeStats(self):
+        """
+        Return a short summary of how many writes were saved.
+        """
+        saved = self.writesRequested - self.writesCommitted
+        savedItems = self.itemWritesRequested - self.itemWritesCommitted
+        return ('%d of %d source updates and %d of %d scene item updates'
+                ' were skipped or merged'
+                % (max(saved, 0), self.writesRequested,
+                   max(savedItems, 0), self.itemWritesRequested))
+
+
+sourceWriter = SourceWriter()
+
+
+class SoundEffectPlayer():
+    """
+    Plays the sound effects by restarting their media sources.
+
+    The media sources stay visible (and hold their decoders open)
+    between plays, and are restarted through their held handles, which
+    starts playback much sooner than making their scene items visible
+    would. The time between each restart and OBS reporting that
+    playback has started is recorded, per source.
+    """
+    def __init__(self):
+        # source name -> time.perf_counter() time of the last restart
+        self.triggeredAt = {}
+        # source name -> recent latencies, in seconds
+        self.latencies = {}
+
+
+    def play(self, sourceName):
+        """
+        Play the sound effect with the given source name from the start.
+        """
+        source = sourceHandles.get(sourceName)
+        if source is None: return
+        self.triggeredAt[sourceName] = time.perf_counter()
+        obs.obs_source_media_restart(source)
+
+
+    def stop(self, sourceNames):
+        """
+        Stop the sound effects with the given source names.
+        """
+        for sourceName in sourceNames:
+            source = sourceHandles.get(sourceName)
+            if source is not None:
+                obs.obs_source_media_stop(source)
+
+
+    def handleMediaStarted(self, sourceName):
+        """
+        Called (on a media thread) when a held media source starts
+        playing.
+        """
+        triggeredAt = self.triggeredAt.pop(sourceName, None)
+        if triggeredAt is None: return
+        latencies = self.latencies.get(sourceName)
+        if latencies is None:
+            latencies = self.latencies[sourceName] = \
+                collections.deque(maxlen=SFX_LATENCY_SAMPLES)
+        latencies.append(time.perf_counter() - triggeredAt)
+
+
+    def report(self):
+        """
+        Return the recorded latencies as a JSON-compatible dict of
+        {source name: {...}}. Times are in milliseconds.
+        """
+        report = {}
+        for sourceName, latencies in sorted(self.latencies.items()):
+            latencies = list(latencies)
+            report[sourceName] = {
+                'count': len(latencies),
+                'lastMs': latencies[-1] * 1000,
+                'meanMs': sum(latencies) / len(latencies) * 1000,
+                'maxMs': max(latencies) * 1000,
+            }
+        return report
+
+
+    def describeStats(self):
+        """
+        Return a short summary of the latencies, or None if no sound
+        effects have been played.
+        """
+        report = self.report()
+        if not report: return None
+        return 'sound effects started ' + ', '.join(
+            '%s: %.1f ms (max %.1f ms)'
+            % (sourceName, stats['meanMs'], stats['maxMs'])
+            for sourceName, stats in report.items())
+
+
+soundEffects = SoundEffectPlayer()
+
+
+def tintAtlas(pixels, fill, outline=None):
+    """
+    Return a copy of an atlas's RGBA pixels with white replaced by the
+    `fill` color and black by the `outline` color (or by `fill`, if
+    that's None).
+    """
+    if outline is None:
+        outline = fill
+
+    # Every output channel depends only on the input's shade (the red
+    # channel), so each is a single byte translation
+    fillRgba = colorToRgba(fill)
+    outlineRgba = colorToRgba(outline)
+    tables = [bytes(int(o + (f - o) * shade / 255 + 0.5)
+                    for shade in range(256))
+              for f, o in zip(fillRgba[:3], outlineRgba[:3])]
+    alphaTable = bytes(a * fillRgba[3] // 255 for a in range(256))
+
+    shades = bytes(pixels[0::4])
+    tinted = bytearray(len(pixels))
+    for channel, table in enumerate(tables):
+        tinted[channel::4] = shades.translate(table)
+    tinted[3::4] = bytes(pixels[3::4]).translate(alphaTable)
+    return tinted
+
+
+class SpriteAtlasCache():
+    """
+    Colored copies of digit atlases, cached on disk.
+
+    An atlas is an image of the glyphs in DIGIT_ATLAS_GLYPHS, side by
+    side in equally wide cells, drawn in white with a black outline on
+    a transparent background. A colored copy replaces white with the
+    fill color and black with the outline color (blending the shades
+    in between), so any (fill, outline) pair can be shown, on any
+    platform. Copies are made once and kept in SPRITE_CACHE_DIRNAME
+    next to the script.
+
+    Reading and coloring atlases (with orlypng.py) is slow, so it's
+    only done on worker threads, by prepare(); size() and path() only
+    return what's ready, and never touch the disk.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        # atlas path -> (modification time, width, height, pixels)
+        self.atlases = {}
+        # atlas path -> (width, height), for atlases that have been read
+        self.sizes = {}
+        # (atlas path, fill, outline) -> path of the colored copy
+        self.paths = {}
+        self.lock = threading.Lock()
+
+
+    def load(self, atlasPath):
+        """
+        Return (modification time, width, height, pixels) for an atlas,
+        reading it if it changed since last time. Only call this on a
+        worker thread.
+        """
+        import orlypng # (already imported by prepare())
+
+        mtime = os.path.getmtime(atlasPath)
+        with self.lock:
+            atlas = self.atlases.get(atlasPath)
+        if atlas is None or atlas[0] != mtime:
+            atlas = (mtime,) + orlypng.readPng(atlasPath)
+            with self.lock:
+                self.atlases[atlasPath] = atlas
+                self.sizes[atlasPath] = atlas[1:3]
+        return atlas
+
+
+    def size(self, atlasPath):
+        """
+        Return the (width, height) of an atlas, or None if it hasn't
+        been read yet.
+        """
+        with self.lock:
+            return self.sizes.get(atlasPath)
+
+
+    def path(self, atlasPath, fill, outline=None):
+        """
+        Return the path of a copy of the atlas in the given colors, or
+        None if it hasn't been made yet.
+        """
+        with self.lock:
+            return self.paths.get((atlasPath, fill, outline))
+
+
+    def make(self, atlasPath, fill, outline=None):
+        """
+        Return the path of a copy of the atlas in the given colors,
+        making it first if it isn't cached yet. Only call this on a
+        worker thread.
+        """
+        import orlypng # (already imported by prepare())
+
+        mtime, width, height, pixels = self.load(atlasPath)
+
+        name = '%s-%d-%08x-%08x.png' % (
+            os.path.splitext(os.path.basename(atlasPath))[0],
+            int(mtime), fill, fill if outline is None else outline)
+        path = os.path.join(self.directory, name)
+        if not os.path.isfile(path):
+            tinted = tintAtlas(pixels, fill, outline)
+            os.makedirs(self.directory, exist_ok=True)
+            tempPath = path + '.tmp'
+            orlypng.writePng(tempPath, width, height, tinted)
+            os.replace(tempPath, path)
+
+        with self.lock:
+            self.paths[(atlasPath, fill, outline)] = path
+        return path
+
+
+    def prepare(self, atlasPath, colorPairs, callback=None):
+        """
+        Make the colored copies of an atlas for the given (fill,
+        outline) pairs on a worker thread, so that they're ready by the
+        time they're needed, and then call callback(None) on the
+        animation timer thread.
+        """
+        def makeAll():
+            try:
+                import orlypng
+            except ImportError as e:
+                print('ERROR: Couldn\'t color the digit atlas (orlypng.py'
+                      ' should be next to orly.py): %s' % e)
+                return
+
+            for colors in colorPairs:
+                try:
+                    self.make(atlasPath, *colors)
+                except (OSError, ValueError) as e:
+                    print('ERROR: Couldn\'t color the digit atlas: %s' % e)
+                    return
+
+        if not workers.submit(makeAll, callback=callback):
+            # (there are no worker threads, as when replaying, or too
+            # much is queued; this is only called from script settings
+            # changes, so do it here)
+            makeAll()
+            if callback is not None:
+                callback(None)
+
+
+spriteAtlases = SpriteAtlasCache(
+    os.path.join(os.path.dirname(__file__), SPRITE_CACHE_DIRNAME))
+
+
+class DigitSprites():
+    """
+    Shows a counter as a row of image sources (one per character) that
+    all show the same digit atlas, each cropped to one glyph, instead
+    of as a textbox.
+
+    Changing the value only changes the crops, and changing the color
+    only switches the images to another colored copy of the atlas, so
+    OBS never has to lay out or render any text. For color fades, a
+    second row of image sources (the "fade" row, in a group of its own
+    that has an Opacity filter) is shown on top in the new color and
+    faded in.
+
+    Crops and visibility are shadowed like sourceWriter does for
+    settings, so only changes reach OBS.
+    """
+    def __init__(self, config, directory):
+        """
+        Set up from the "digit-sprites" entry in defaults.json.
+        """
+        self.atlasPath = os.path.join(directory,
+                                      config.get('atlas', DIGIT_ATLAS_FILENAME))
+        self.slotNames = list(config.get('slots', []))
+        self.fadeGroupName = config.get('fade-group') or ''
+        self.fadeSlotNames = list(config.get('fade-slots', []))
+
+        # slot name -> glyph index (or None if hidden)
+        self.glyphs = {}
+        # The last text and (fill, outline) colors asked for, to show
+        # again once the atlases are ready; colors are keyed by whether
+        # they're for the fade row
+        self.text = ''
+        self.colors = {}
+
+
+    @property
+    def hasFadeLayer(self):
+        return bool(self.fadeGroupName and self.fadeSlotNames)
+
+
+    def sourceNames(self):
+        """
+        Return the names of all of the sources used.
+        """
+        return self.slotNames + self.fadeSlotNames + [self.fadeGroupName]
+
+
+    def filters(self):
+        """
+        Return the (source name, filter name) filters used.
+        """
+        if not self.hasFadeLayer: return []
+        return [(self.fadeGroupName, OPACITY_FILTER_NAME)]
+
+
+    def prepare(self, colorPairs):
+        """
+        Get the colored atlases for the given (fill, outline) pairs
+        ready ahead of time.
+        """
+        if os.path.isfile(self.atlasPath):
+            spriteAtlases.prepare(self.atlasPath, colorPairs, self.refresh)
+        else:
+            print('ERROR: The digit atlas %s doesn\'t exist!' % self.atlasPath)
+
+
+    def setText(self, text):
+        """
+        Show the given text, in both rows. Characters that aren't in
+        the atlas (or don't fit) aren't shown.
+        """
+        self.text = text
+        for slotNames in (self.slotNames, self.fadeSlotNames):
+            for i, slotName in enumerate(slotNames):
+                glyph = DIGIT_ATLAS_GLYPHS.find(text[i]) if i < len(text) else -1
+                self.setGlyph(slotName, glyph if glyph >= 0 else None)
+
+
+    def setGlyph(self, slotName, glyph):
+        """
+        Crop one slot to the glyph with the given index, or hide it if
+        that's None.
+        """
+        if self.glyphs.get(slotName, -1) == glyph: return
+
+        if glyph is not None:
+            size = spriteAtlases.size(self.atlasPath)
+            if size is None: return # (not read yet, so skip this frame)
+            width, height = size
+            cellWidth = width // len(DIGIT_ATLAS_GLYPHS)
+            sourceWriter.setCrop(slotName,
+                                 glyph * cellWidth,
+                                 width - (glyph + 1) * cellWidth)
+
+        sourceWriter.setVisible(slotName, glyph is not None)
+        self.glyphs[slotName] = glyph
+
+
+    def setColors(self, colors, fade=False):
+        """
+        Show the main row (or the fade row, if `fade` is True) in the
+        given (fill, outline) colors.
+        """
+        if colors[0] is None: return
+        self.colors[fade] = colors
+        path = spriteAtlases.path(self.atlasPath, *colors)
+        if path is None: return # (not made yet, so skip this frame)
+
+        for slotName in (self.fadeSlotNames if fade else self.slotNames):
+            sourceWriter.update(slotName, None, {'file': path})
+
+
+    def refresh(self, result=None):
+        """
+        Show the text and colors that were last asked for again, now
+        that the atlases are ready (see prepare()).
+        """
+        with sourceWriter.transaction():
+            self.setText(self.text)
+            for fade, colors in list(self.colors.items()):
+                self.setColors(colors, fade)
+
+
+    def setFadeOpacity(self, opacity):
+        """
+        Set the opacity of the fade row.
+        """
+        if not self.hasFadeLayer: return
+        sourceWriter.update(self.fadeGroupName,
+                            OPACITY_FILTER_NAME,
+                            {'opacity': int(opacity)})
+
+
+    def forget(self):
+        """
+        Forget which glyphs are showing, so that they're all set again.
+        """
+        self.glyphs.clear()
+
+
+
+# One row of a compiled animation timeline. Every field is None unless
+# something changes on that frame; frames where nothing changes at all
+# are stored as None instead of a Keyframe.
+#  - owlPos: (x, y) position of the owl
+#  - labelOpacity, counterOpacity: opacity percentages
+#  - counterText: format string for the counter text, with the new
+#    counter value available as {value}
+#  - counterColors: (fill, outline) colors to show the counter in
+#  - committedColors: (fill, outline) colors the counter is now
+#    considered to have, for deciding how later increments look
+#  - sfx: name of the sound effect to play ('ding1', 'ding50', or
+#    'ding<N>' for the one for multiples of N; see sfxSourceName())
+#  - fadeColors, fadeOpacity: (fill, outline) colors and opacity of the
+#    fade row in digit sprite mode (see DigitSprites)
+Keyframe = collections.namedtuple('Keyframe', [
+    'owlPos',
+    'labelOpacity',
+    'counterOpacity',
+    'counterText',
+    'counterColors',
+    'committedColors',
+    'sfx',
+    'fadeColors',
+    'fadeOpacity',
+])
+Keyframe.__new__.__defaults__ = (None,) * len(Keyframe._fields)
+
+
+class Timeline():
+    """
+    A precompiled animation, with one row (a Keyframe, or None for
+    frames where nothing changes) per frame, and a dict of named frame
+    indices ("markers") where its phases begin.
+    """
+    def __init__(self, keyframes, markers):
+        self.keyframes = tuple(keyframes)
+        self.markers = dict(markers)
+        # Indices of the frames where something changes
+        self.activeIndices = [i for i, keyframe in enumerate(self.keyframes)
+                              if keyframe is not None]
+
+
+    def __len__(self):
+        return len(self.keyframes)
+
+
+    def __getitem__(self, index):
+        return self.keyframes[index]
+
+
+    def nextKeyframe(self, index):
+        """
+        Return the index of the first frame at or after `index` where
+        something changes (or the length of the timeline, if nothing
+        does).
+        """
+        i = bisect.bisect_left(self.activeIndices, index)
+        if i < len(self.activeIndices):
+            return self.activeIndices[i]
+        return len(self.keyframes)
+
+
+    def countKeyframes(self, start, end):
+        """
+        Return how many of frames start through end - 1 aren't hold
+        frames.
+        """
+        return (bisect.bisect_left(self.activeIndices, end)
+                - bisect.bisect_left(self.activeIndices, start))
+
+
+    def span(self, start, end):
+        """
+        Return a single Keyframe with the combined effect of frames
+        start through end - 1 (or None if nothing changes in them), for
+        catching up after skipping frames.
+        """
+        keyframes = [k for k in self.keyframes[start:end] if k is not None]
+        if len(keyframes) <= 1:
+            return keyframes[0] if keyframes else None
+
+        fields = [None] * len(Keyframe._fields)
+        for keyframe in keyframes:
+            for i, value in enumerate(keyframe):
+                if value is not None:
+                    fields[i] = value
+        return Keyframe(*fields)
+
+
+    def stateAt(self, index):
+        """
+        Return the (owl position, label opacity, counter opacity) state
+        of the overlay after the given frame has been applied. Anything
+        the timeline hasn't set by then is assumed to be fully shown
+        (with the owl position as None).
+        """
+        owlPos = labelOpacity = counterOpacity = None
+        for keyframe in reversed(self.keyframes[:index + 1]):
+            if keyframe is None: continue
+            if owlPos is None:
+                owlPos = keyframe.owlPos
+            if labelOpacity is None:
+                labelOpacity = keyframe.labelOpacity
+            if counterOpacity is None:
+                counterOpacity = keyframe.counterOpacity
+            if None not in (owlPos, labelOpacity, counterOpacity):
+                break
+
+        return (owlPos,
+                100 if labelOpacity is None else labelOpacity,
+                100 if counterOpacity is None else counterOpacity)
+
+
+    def describe(self):
+        """
+        Return a human-readable listing of the frames where something
+        changes, for debugging.
+        """
+        markersAt = {}
+        for name, index in self.markers.items():
+            markersAt.setdefault(index, []).append(name)
+
+        lines = []
+        for i, keyframe in enumerate(self.keyframes):
+            for name in markersAt.get(i, []):
+                lines.append('      <%s>' % name)
+            if keyframe is None: continue
+            fields = ['%s=%r' % (name, value)
+                      for name, value in zip(Keyframe._fields, keyframe)
+                      if value is not None]
+            lines.append('%4d: %s' % (i, ', '.join(fields)))
+        return '\n'.join(lines)
+
+
+class TimelineBuilder():
+    """
+    Helper for compiling a Timeline one frame at a time.
+    """
+    def __init__(self):
+        self.keyframes = []
+        self.markers = {}
+
+
+    def mark(self, name):
+        """
+        Mark the next frame as the start of a phase of the animation.
+        """
+        self.markers[name] = len(self.keyframes)
+
+
+    def frame(self, **fields):
+        """
+        Add a frame where the given Keyframe fields change.
+        """
+        self.keyframes.append(Keyframe(**fields))
+
+
+    def hold(self, frames):
+        """
+        Add `frames` frames where nothing changes.
+        """
+        self.keyframes.extend([None] * max(frames, 0))
+
+
+    def build(self):
+        """
+        Return the finished Timeline.
+        """
+        return Timeline(self.keyframes, self.markers)
+
+
+class WorkerPool():
+    """
+    A few background threads for work that doesn't have to happen in a
+    particular frame (file I/O, database writes, compiling timelines
+    ahead of time), so that it doesn't stall the OBS threads that call
+    into the script.
+
+    Tasks go through a bounded queue, and submit() never blocks: if the
+    queue is full (or the pool isn't running), it returns False and the
+    caller decides what to do instead. A task can have a callback,
+    which is called with its result on the animation timer thread; the
+    results are handed over through a deque, so neither side waits for
+    the other. The workers never touch OBS timers themselves (OBS only
+    allows that on the threads it calls the script on), so while a task
+    with a callback is unfinished, the scheduler's poll timer runs to
+    pick up its result.
+
+    Stopping never waits longer than WORKER_STOP_TIMEOUT. Each run of
+    the pool gets its own queue and stop event, so that threads still
+    stuck in a task from an earlier run can't pick up new tasks.
+    """
+    def __init__(self):
+        self.tasks = queue.Queue(WORKER_QUEUE_SIZE)
+        self.stopping = threading.Event()
+        self.results = collections.deque()
+        self.threads = []
+        # Number of tasks with callbacks that haven't finished yet
+        self.unfinished = 0
+        self.lock = threading.Lock()
+
+
+    def start(self):
+        """
+        Start the worker threads.
+        """
+        if self.threads: return
+        self.tasks = queue.Queue(WORKER_QUEUE_SIZE)
+        self.stopping = threading.Event()
+        for i in range(WORKER_THREADS):
+            thread = threading.Thread(target=self.run,
+                                      args=(self.tasks, self.stopping),
+                                      name='ORLY worker %d' % (i + 1),
+                                      daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+
+    def stop(self):
+        """
+        Finish the tasks that have already been submitted, and stop the
+        worker threads. If that takes too long, the rest of the tasks
+        are dropped and the threads are left to stop by themselves.
+        """
+        if not self.threads: return
+        threads, self.threads = self.threads, []
+        deadline = time.monotonic() + WORKER_STOP_TIMEOUT
+
+        # One stop marker per thread, after all of the queued tasks
+        for thread in threads:
+            try:
+                self.tasks.put(None,
+                               timeout=max(deadline - time.monotonic(), 0))
+            except queue.Full:
+                # The workers are stuck, so don't wait for the queue to
+                # drain; they stop after the tasks they're running
+                self.stopping.set()
+                break
+        for thread in threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+
+        if any(thread.is_alive() for thread in threads):
+            self.stopping.set()
+            print('ERROR: Background tasks didn\'t finish in time, and'
+                  ' some of them were dropped')
+        self.results.clear()
+        with self.lock:
+            self.unfinished = 0
+
+
+    def submit(self, func, *args, callback=None):
+        """
+        Queue func(*args) to be run on a worker thread, and
+        callback(result) to be called on the animation timer thread
+        afterwards. Return False if it couldn't be queued.
+
+        With a callback, this starts the poll timer if it isn't running,
+        so it has to be called on a thread OBS called the script on.
+        """
+        if not self.threads: return False
+        if callback is not None:
+            with self.lock:
+                self.unfinished += 1
+        try:
+            self.tasks.put_nowait((func, args, callback))
+        except queue.Full:
+            if callback is not None:
+                self.taskFinished()
+            return False
+
+        if callback is not None:
+            scheduler.keepPolling()
+        return True
+
+
+    def run(self, tasks, stopping):
+        """
+        Body of each worker thread.
+        """
+        while not stopping.is_set():
+            task = tasks.get()
+            if task is None: return
+
+            func, args, callback = task
+            try:
+                result = func(*args)
+            except Exception as e:
+                print('ERROR: A background task failed: %r' % e)
+                if callback is not None:
+                    self.taskFinished()
+                continue
+
+            if callback is not None:
+                self.callSoon(callback, result)
+                self.taskFinished()
+
+
+    def taskFinished(self):
+        """
+        Count a task with a callback as finished.
+        """
+        with self.lock:
+            # (a task from before the pool was restarted can finish
+            # after the count was reset)
+            self.unfinished = max(self.unfinished - 1, 0)
+
+
+    def busy(self):
+        """
+        Return True if there are tasks with callbacks that haven't
+        finished, or results that haven't been delivered.
+        """
+        return self.unfinished > 0 or bool(self.results)
+
+
+    def callSoon(self, callback, *args):
+        """
+        Call callback(*args) on the animation timer thread, on its next
+        frame or poll. This is safe to call from any thread, but doesn't
+        start the poll timer (which would take an OBS thread), so the
+        caller has to make sure it's running; see
+        AnimationScheduler.keepPolling().
+        """
+        self.results.append((callback, args))
+
+
+    def deliverResults(self):
+        """
+        Call the callbacks of the tasks that have finished. This is
+        called on the animation timer thread.
+        """
+        while True:
+            try:
+                callback, args = self.results.popleft()
+            except IndexError:
+                return
+            callback(*args)
+
+
+workers = WorkerPool()
+
+
+class CounterJournal():
+    """
+    Append-only journal of counter values, so that they survive OBS
+    restarts without having to be read back from the textboxes.
+
+    Each line of the file is a JSON object like {"id": "orly",
+    "value": 42}, and the last line for each counter wins. A line that
+    was only partly written (if OBS crashed at just the wrong moment)
+    is ignored. Every so often (and whenever the journal is opened), it
+    is compacted down to one line per counter by writing a new file and
+    renaming it over the old one, so it never takes long to read.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.values = {}
+        self.file = None
+        self.linesWritten = 0
+        # False if the journal couldn't be read, in which case it's only
+        # appended to, since compacting it would lose the values in it
+        self.complete = True
+        self.lock = threading.Lock()
+
+
+    def open(self):
+        """
+        Read the journal, and get ready to append to it.
+        """
+        self.values = {}
+        self.complete = True
+        try:
+            # (read as bytes, so that a torn line that isn't valid UTF-8
+            # is skipped like any other torn line)
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.values[entry['id']] = int(entry['value'])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print('ERROR: Couldn\'t read the counter journal: %s' % e)
+            self.complete = False
+
+        try:
+            if self.complete:
+                self.compact()
+            self.file = open(self.path, 'a', encoding='utf-8')
+        except OSError as e:
+            print('ERROR: Couldn\'t write the counter journal: %s' % e)
+
+
+    def get(self, counterId):
+        """
+        Return the last recorded value of the given counter, or None.
+        """
+        return self.values.get(counterId)
+
+
+    def record(self, counterId, value):
+        """
+        Record a new value for the given counter. It's written to disk
+        on a worker thread if possible.
+        """
+        self.values[counterId] = value
+        if not workers.submit(self.write, counterId):
+            self.write(counterId)
+
+
+    def write(self, counterId):
+        """
+        Append the latest value of the given counter to the journal.
+        (Writes can happen out of order, but each one writes whatever
+        the latest value is by then, so the last line always wins.)
+        """
+        with self.lock:
+            if self.file is None: return
+
+            # Flushing (without fsync) is enough to survive OBS crashing
+            line = json.dumps({'id': counterId,
+                               'value': self.values[counterId]})
+            self.file.write(line + '\n')
+            self.file.flush()
+
+            self.linesWritten += 1
+            if (self.complete
+                    and self.linesWritten >= JOURNAL_COMPACT_INTERVAL):
+                self.compact()
+
+
+    def compact(self):
+        """
+        Rewrite the journal with just the latest value of each counter.
+        """
+        tempPath = self.path + '.tmp'
+        with open(tempPath, 'w', encoding='utf-8') as f:
+            for counterId, value in list(self.values.items()):
+                f.write(json.dumps({'id': counterId, 'value': value}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+        if self.file is not None:
+            self.file.close()
+            os.replace(tempPath, self.path)
+            self.file = open(self.path, 'a', encoding='utf-8')
+        else:
+            os.replace(tempPath, self.path)
+        self.linesWritten = 0
+
+
+    def close(self):
+        """
+        Compact and close the journal.
+        """
+        with self.lock:
+            if self.file is None: return
+            try:
+                if self.complete:
+                    self.compact()
+            except OSError as e:
+                print('ERROR: Couldn\'t write the counter journal: %s' % e)
+            self.file.close()
+            self.file = None
+
+
+counterJournal = CounterJournal(
+    os.path.join(os.path.dirname(__file__), JOURNAL_FILENAME))
+
+
+class EventHistory():
+    """
+    History of every change to the counters, for reviewing after a
+    stream.
+
+    Events are appended to an in-memory ring buffer, which never blocks
+    (if writing falls more than HISTORY_BUFFER_SIZE events behind, the
+    oldest ones are dropped), and written to a SQLite database in
+    batches on a worker thread. Each time the script is loaded starts a
+    new session, identified by its start time.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.buffer = collections.deque(maxlen=HISTORY_BUFFER_SIZE)
+        self.session = None
+        self.sceneName = ''
+        self.connection = None
+        self.writePending = False
+        self.lock = threading.Lock()
+
+
+    def start(self):
+        """
+        Start a new session.
+        """
+        self.session = time.time()
+        self.updateSceneName()
+
+
+    def record(self, counterId, timestamp, amount, negated, value):
+        """
+        Record a change to a counter: `amount` (negative if `negated`)
+        was added to it at the time.time() time `timestamp`, leaving it
+        at `value`. This is safe to call from any thread.
+        """
+        self.buffer.append((self.session, counterId, timestamp, amount,
+                            int(negated), value, self.sceneName))
+
+        # Anything recorded before the write starts goes in the same
+        # batch. (If the workers are too busy, this batch is written
+        # along with the next one.)
+        with self.lock:
+            if self.writePending: return
+            self.writePending = True
+        if not workers.submit(self.write):
+            with self.lock:
+                self.writePending = False
+
+
+    def write(self):
+        """
+        Write all buffered events to the database.
+        """
+        with self.lock:
+            self.writePending = False
+            batch = []
+            while True:
+                try:
+                    batch.append(self.buffer.popleft())
+                except IndexError:
+                    break
+
+            try:
+                connection = self.openDatabase()
+                if batch:
+                    with connection:
+                        connection.executemany(
+                            'INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?)',
+                            batch)
+            except sqlite3.Error as e:
+                print('ERROR: Couldn\'t write the ORLY history: %s' % e)
+
+
+    def openDatabase(self):
+        """
+        Return the database connection, opening it (and creating the
+        table) if needed. Only call this with self.lock held.
+        """
+        if self.connection is None:
+            # (it's used from whichever thread holds the lock)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS events (session REAL, counter TEXT,'
+                ' time REAL, amount INTEGER, negated INTEGER, value INTEGER,'
+                ' scene TEXT)')
+            connection.execute('CREATE INDEX IF NOT EXISTS events_session'
+                               ' ON events (session)')
+            self.connection = connection
+        return self.connection
+
+
+    def close(self):
+        """
+        Write any buffered events, and close the database.
+        """
+        self.write()
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+
+    def sessionSummary(self, session=None):
+        """
+        Return a JSON-compatible summary of a session (by default, the
+        current one), with the net change, number of changes, average
+        rate and change per hour of the session, by counter.
+        """
+        if session is None:
+            session = self.session
+
+        self.write()
+        summary = {}
+        with self.lock:
+            connection = self.openDatabase()
+            for counterId, events, total, first, last in connection.execute(
+                    'SELECT counter, COUNT(*), SUM(amount), MIN(time),'
+                    ' MAX(time) FROM events WHERE session = ?'
+                    ' GROUP BY counter', (session,)):
+                hours = max(last - session, 60) / 3600
+                summary[counterId] = {
+                    'changes': events,
+                    'total': total,
+                    'perHour': total / hours,
+                    'byHour': {},
+                }
+
+            for counterId, hour, total in connection.execute(
+                    'SELECT counter, CAST((time - session) / 3600 AS INTEGER),'
+                    ' SUM(amount) FROM events WHERE session = ?'
+                    ' GROUP BY 1, 2 ORDER BY 1, 2', (session,)):
+                summary[counterId]['byHour'][hour] = total
+
+        return summary
+
+
+    def updateSceneName(self):
+        """
+        Remember the name of the current scene, for recording events.
+        """
+        with frontendGetCurrentScene() as sceneSource:
+            if sceneSource is not None:
+                self.sceneName = obs.obs_source_get_name(sceneSource)
+
+
+    def handleFrontendEvent(self, event):
+        """
+        Called for frontend events. We only care about the ones that
+        change which scene is current.
+        """
+        if event in (obs.OBS_FRONTEND_EVENT_SCENE_CHANGED,
+                     obs.OBS_FRONTEND_EVENT_FINISHED_LOADING):
+            self.updateSceneName()
+
+
+    def connect(self):
+        """
+        Start listening for scene changes.
+        """
+        lifecycle.addFrontendCallback(self.handleFrontendEvent)
+
+
+    def disconnect(self):
+        """
+        Stop listening for scene changes.
+        """
+        lifecycle.removeFrontendCallback(self.handleFrontendEvent)
+
+
+eventHistory = EventHistory(
+    os.path.join(os.path.dirname(__file__), HISTORY_FILENAME))
+
+
+class InputRecorder():
+    """
+    Records every hotkey press (and button click, remote command and
+    settings change) to a file, with timestamps, so that whatever
+    happened during a stream can be played back exactly by
+    tools/orlyreplay.py.
+
+    Each recording starts with a line holding the settings, defaults
+    and counter values at the time, followed by one line per input.
+    Lines are written on a worker thread, like the event history.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.file = None
+        self.startTime = None
+        self.lines = collections.deque()
+        self.writePending = False
+        self.lock = threading.Lock()
+
+
+    def setEnabled(self, enabled, settings):
+        """
+        Start or stop recording.
+        """
+        if enabled and self.file is None:
+            self.start(settings)
+        elif not enabled and self.file is not None:
+            self.stop()
+
+
+    def start(self, settings):
+        """
+        Start a new recording.
+        """
+        path = os.path.join(self.directory,
+                            time.strftime(INPUT_RECORDING_FILENAME))
+        header = {'type': 'start',
+                  'time': time.time(),
+                  'defaults': loadDefaults(),
+                  'settings': json.loads(obs.obs_data_get_json(settings)),
+                  'values': {machine.counterId: machine.value
+                             for machine in stateMachines.values()}}
+        try:
+            file = open(path, 'w', encoding='utf-8')
+            file.write(json.dumps(header) + '\n')
+        except OSError as e:
+            print('ERROR: Couldn\'t start recording: %s' % e)
+            return
+
+        with self.lock:
+            self.file = file
+            self.startTime = time.monotonic()
+        print('ORLY: Recording hotkey presses to ' + path)
+
+
+    def record(self, machine, event, value=None):
+        """
+        Record an input for the given counter (or None for ones that
+        aren't specific to a counter). This is safe to call from any
+        thread.
+        """
+        if self.file is None: return
+
+        entry = {'t': round(time.monotonic() - self.startTime, 6),
+                 'counter': machine.counterId if machine else None,
+                 'event': event}
+        if value is not None:
+            entry['value'] = value
+        self.lines.append(json.dumps(entry))
+
+        # (if the workers are too busy, the line is written along with
+        # the next ones, or when the recording stops)
+        with self.lock:
+            if self.writePending: return
+            self.writePending = True
+        if not workers.submit(self.write):
+            with self.lock:
+                self.writePending = False
+
+
+    def recordSettings(self, settings):
+        """
+        Record a settings change.
+        """
+        if self.file is None: return
+        self.record(None, 'settings',
+                    json.loads(obs.obs_data_get_json(settings)))
+
+
+    def write(self):
+        """
+        Write the recorded lines to the file.
+        """
+        with self.lock:
+            self.writePending = False
+            if self.file is None: return
+            lines = []
+            while True:
+                try:
+                    lines.append(self.lines.popleft())
+                except IndexError:
+                    break
+            try:
+                self.file.write(''.join(line + '\n' for line in lines))
+                self.file.flush()
+            except OSError as e:
+                print('ERROR: Couldn\'t write the recording: %s' % e)
+
+
+    def stop(self):
+        """
+        Finish the recording.
+        """
+        self.write()
+        with self.lock:
+            if self.file is None: return
+            self.file.close()
+            self.file = None
+
+
+inputRecorder = InputRecorder(os.path.dirname(__file__))
+
+
+class AnimationScheduler():
+    """
+    Runs the animations of all counters from a single OBS timer.
+
+    Only counters with an animation playing (or an increment queued)
+    are ticked, and the timer only runs while there is at least one.
+    Most frames of an animation are holds where nothing changes, so
+    after each tick the timer is set to go off at the next frame where
+    something does, instead of every frame.
+
+    Every time the timer is set, it gets a new callback, so that a
+    callback that has been replaced (by a wake() on another thread, say)
+    can tell, and remove itself.
+
+    OBS only lets a script add and remove timers on the threads it calls
+    the script on, so wake() mustn't be called on the worker threads or
+    the remote control server's thread. Those hand things over through
+    WorkerPool.callSoon() instead, and a second, slower poll timer runs
+    while there might be something to pick up.
+    """
+    def __init__(self):
+        self.active = []
+        # The callback of the timer that's set, and its interval in ms
+        self.timer = None
+        self.timerMs = None
+        # The callback of the poll timer, if it's running
+        self.pollTimer = None
+        self.framerate = 30
+        self.lock = threading.Lock()
+
+        self.wakeups = 0
+        self.rearms = 0
+        self.framesElapsed = 0.0
+        self.lastTick = None
+
+
+    def frameMs(self):
+        """
+        Return the interval between frames, in milliseconds.
+        """
+        return int(1000 / self.framerate)
+
+
+    def makeTimer(self):
+        """
+        Return a new timer callback that ticks the scheduler.
+        """
+        def timer():
+            self.tick(timer)
+        return timer
+
+
+    def wake(self, machine=None):
+        """
+        Start ticking the given state machine, if it's not being ticked
+        already. With no state machine, just make sure there's a tick
+        soon. Only call this on a thread OBS called the script on (a
+        script function, hotkey, signal or timer).
+        """
+        frameMs = self.frameMs()
+        with self.lock:
+            if machine is not None and machine not in self.active:
+                self.active.append(machine)
+            if self.timer is not None and self.timerMs <= frameMs: return
+
+            # Not running, or sleeping through a hold: tick on the next
+            # frame instead
+            oldTimer = self.timer
+            self.timer = newTimer = self.makeTimer()
+            self.timerMs = frameMs
+            if oldTimer is None:
+                self.lastTick = time.monotonic()
+
+        if oldTimer is not None:
+            lifecycle.removeTimer(oldTimer)
+        lifecycle.addTimer(newTimer, frameMs)
+
+
+    def tick(self, timer):
+        """
+        Called by the timer, on frames where something might change.
+        """
+        with self.lock:
+            replaced = timer is not self.timer
+        if replaced:
+            lifecycle.removeCurrentTimer(timer)
+            return
+
+        start = profiler.startFrame()
+        now = time.monotonic()
+        self.wakeups += 1
+        self.framesElapsed += (now - self.lastTick) * self.framerate
+        self.lastTick = now
+
+        # (everything that changes in this frame is sent to OBS in one
+        # batch at the end)
+        with sourceWriter.transaction():
+            workers.deliverResults()
+            with self.lock:
+                machines = list(self.active)
+
+            finished = [machine for machine in machines
+                        if not machine.tick(now)]
+        remoteControl.frameFinished()
+        profiler.stopFrame(start, 1 / self.framerate)
+
+        with self.lock:
+            if timer is not self.timer: return # (wake() replaced it)
+
+            for machine in finished:
+                # If an increment was queued just now, keep going so
+                # that the next frame picks it up
+                if not machine.hasQueuedInput():
+                    self.active.remove(machine)
+
+            if self.active or workers.results:
+                ms = self.sleepMs()
+                if ms == self.timerMs: return
+                self.timer = newTimer = self.makeTimer()
+                self.timerMs = ms
+                self.rearms += 1
+            else:
+                self.timer = newTimer = None
+
+        lifecycle.removeCurrentTimer(timer)
+        if newTimer is not None:
+            lifecycle.addTimer(newTimer, ms)
+
+
+    def keepPolling(self):
+        """
+        Start the poll timer, if it isn't running. It picks up worker
+        results and remote commands while nothing is animating, and
+        stops by itself once there's nothing left to wait for (and
+        remote control is off). Only call
+        this on a thread OBS called the script on.
+        """
+        with self.lock:
+            if self.pollTimer is not None: return
+            self.pollTimer = pollTimer = self.makePollTimer()
+        lifecycle.addTimer(pollTimer, POLL_MS)
+
+
+    def makePollTimer(self):
+        """
+        Return a new timer callback that polls for worker results.
+        """
+        def timer():
+            self.poll(timer)
+        return timer
+
+
+    def poll(self, timer):
+        """
+        Called by the poll timer.
+        """
+        with self.lock:
+            replaced = timer is not self.pollTimer
+        if replaced:
+            lifecycle.removeCurrentTimer(timer)
+            return
+
+        if workers.results:
+            with sourceWriter.transaction():
+                workers.deliverResults()
+
+        if workers.busy() or remoteControl.server is not None: return
+        with self.lock:
+            if timer is self.pollTimer:
+                self.pollTimer = None
+        lifecycle.removeCurrentTimer(timer)
+
+
+    def sleepMs(self):
+        """
+        Return how long (in ms) the timer can wait before the next tick
+        that will change anything. Call with the lock held.
+        """
+        frameMs = self.frameMs()
+        if workers.results: return frameMs
+
+        deadlines = [machine.nextDeadline() for machine in self.active]
+        if None in deadlines: return frameMs
+        delay = min(deadlines) - time.monotonic()
+        return max(frameMs, math.ceil(delay * 1000))
+
+
+    def stop(self):
+        """
+        Stop ticking everything.
+        """
+        with self.lock:
+            self.active.clear()
+            timer, self.timer = self.timer, None
+            pollTimer, self.pollTimer = self.pollTimer, None
+        if timer is not None:
+            lifecycle.removeTimer(timer)
+        if pollTimer is not None:
+            lifecycle.removeTimer(pollTimer)
+
+
+    def report(self):
+        """
+        Return the timer statistics as a JSON-compatible dict.
+        """
+        return {
+            'wakeups': self.wakeups,
+            'rearms': self.rearms,
+            'framesElapsed': round(self.framesElapsed),
+        }
+
+
+    def describeStats(self):
+        """
+        Return a short summary of how often the timer went off, or None
+        if it never has.
+        """
+        if not self.wakeups: return None
+        return ('the animation timer went off %d times in %d frames of'
+                ' animation' % (self.wakeups, round(self.framesElapsed)))
+
+
+scheduler = AnimationScheduler()
+
+
+class SettingsDebouncer():
+    """
+    Applies settings changes once they've stopped coming in for a
+    moment, since the properties dialog sends one for every keystroke
+    in a number field.
+
+    Like the animation timer, the timer gets a new callback every time
+    it's set, and the lock is never held while calling OBS (see
+    Lifecycle).
+    """
+    def __init__(self):
+        self.pending = None
+        # The callback of the timer that's set, if any
+        self.timer = None
+        self.lock = threading.Lock()
+
+
+    def makeTimer(self):
+        """
+        Return a new timer callback that applies the pending settings.
+        """
+        def timer():
+            self.tick(timer)
+        return timer
+
+
+    def update(self, snapshots):
+        """
+        Schedule a dict of {state machine: settings snapshot} to be
+        applied, replacing any that haven't been applied yet.
+        """
+        with self.lock:
+            self.pending = snapshots
+            oldTimer = self.timer
+            self.timer = newTimer = self.makeTimer()
+
+        if oldTimer is not None:
+            lifecycle.removeTimer(oldTimer)
+        lifecycle.addTimer(newTimer, SETTINGS_DEBOUNCE_MS)
+
+
+    def tick(self, timer):
+        """
+        Called once the settings have stopped changing.
+        """
+        lifecycle.removeCurrentTimer(timer)
+        with self.lock:
+            if timer is not self.timer: return # (replaced or cancelled)
+            self.timer = None
+            pending, self.pending = self.pending, None
+
+        with sourceWriter.transaction():
+            for machine, snapshot in (pending or {}).items():
+                machine.applySettings(snapshot)
+
+
+    def cancel(self):
+        """
+        Throw away any pending settings changes.
+        """
+        with self.lock:
+            timer, self.timer = self.timer, None
+            self.pending = None
+        if timer is not None:
+            lifecycle.removeTimer(timer)
+
+
+settingsDebouncer = SettingsDebouncer()
+
+
+class RemoteControl():
+    """
+    Lets other programs on this computer (Stream Deck-style controllers,
+    chat bots...) control the counters, through the HTTP server in
+    orlyremote.py.
+
+    Commands arrive on the server's thread and are handed to the
+    animation timer thread through the workers' results, where they go
+    through the same handlers as the hotkeys. The server's thread can't
+    start OBS timers, so the scheduler's poll timer keeps running while
+    the server is, to pick them up. Each one is answered with how long it took from the
+    command arriving to the first frame that shows it.
+    """
+    def __init__(self):
+        self.server = None
+        # (receivedAt, future) for commands waiting for their first
+        # frame. Only used on the animation timer thread.
+        self.pending = []
+        self.latencies = collections.deque(maxlen=REMOTE_LATENCY_SAMPLES)
+
+
+    def configure(self, enabled, port):
+        """
+        Start, stop or restart the server to match the settings.
+        """
+        if self.server is not None:
+            if enabled and self.server.port == port: return
+            self.stop()
+        if not enabled: return
+
+        # (orlyremote.py is only needed for remote control, so it's
+        # only imported here)
+        try:
+            import orlyremote
+        except ImportError as e:
+            print('ERROR: Couldn\'t start remote control (orlyremote.py'
+                  ' should be next to orly.py): %s' % e)
+            return
+
+        server = orlyremote.RemoteServer(self.handleCommand, port)
+        try:
+            server.start()
+        except OSError as e:
+            print('ERROR: Couldn\'t start remote control on port %d: %s'
+                  % (port, e))
+            return
+        self.server = server
+        scheduler.keepPolling()
+
+
+    def stop(self):
+        """
+        Stop the server. Commands that are still waiting for a frame are
+        answered without a latency.
+        """
+        if self.server is None: return
+        self.server.stop()
+        self.server = None
+
+        for receivedAt, future in self.pending:
+            future.set_result(None)
+        self.pending = []
+
+
+    def handleCommand(self, command, receivedAt):
+        """
+        Called on the server thread for each command. Returns a future
+        for its latency.
+        """
+        import orlyremote # (already imported by configure())
+
+        if command.counter is None:
+            machine = next(iter(stateMachines.values()), None)
+        else:
+            machine = stateMachines.get(command.counter)
+        if machine is None:
+            raise orlyremote.CommandError(
+                'Unknown counter: %s' % command.counter, 404)
+
+        future = concurrent.futures.Future()
+        workers.callSoon(self.runCommand, machine, command, receivedAt,
+                         future)
+        return future
+
+
+    def runCommand(self, machine, command, receivedAt, future):
+        """
+        Carry out a command on the animation timer thread.
+        """
+        if not future.set_running_or_notify_cancel(): return
+
+        try:
+            if command.action == 'increment':
+                # (not through handleORLY(), since a negate hotkey
+                # press shouldn't flip the sign of a remote increment)
+                inputRecorder.record(machine, 'increment', command.amount)
+                machine.queueIncrement(command.amount)
+                # (the frame is drawn later in this tick)
+                self.pending.append((receivedAt, future))
+            elif command.action == 'negate':
+                handleNegateORLY(machine, True)
+                future.set_result(None)
+            elif command.action == 'hide':
+                handleHideAll(machine)
+                self.finish(receivedAt, future)
+            elif command.action == 'restore':
+                handleRestoreAll(machine)
+                self.finish(receivedAt, future)
+            elif command.action == 'set':
+                inputRecorder.record(machine, 'set', command.amount)
+                machine.setValue(command.amount)
+                self.finish(receivedAt, future)
+        except Exception as e:
+            future.set_exception(e)
+
+
+    def frameFinished(self):
+        """
+        Called at the end of every animation frame.
+        """
+        if not self.pending: return
+        for receivedAt, future in self.pending:
+            self.finish(receivedAt, future)
+        self.pending = []
+
+
+    def finish(self, receivedAt, future):
+        """
+        Record the latency of a command that's now on screen, and
+        answer it.
+        """
+        latency = time.monotonic() - receivedAt
+        self.latencies.append(latency)
+        future.set_result(latency)
+
+
+    def describeStats(self):
+        """
+        Return a short summary of the latencies, or None if no commands
+        have been shown yet.
+        """
+        if not self.latencies: return None
+        return ('remote commands reached the screen in %.1f ms on average'
+                ' (max %.1f ms)'
+                % (1000 * sum(self.latencies) / len(self.latencies),
+                   1000 * max(self.latencies)))
+
+
+remoteControl = RemoteControl()
+
+
 class OrlyStateMachine():
     """
-    State machine for ORLY animations.
+    State machine for the animations of one counter.
     """
+    counterId = None
+    name = None
+
     framerate = None
     negationTimeout = None
 
@@ -225,144 +3550,292 @@ class OrlyStateMachine():
     ding1SourceName = ''
     ding10SourceName = ''
     ding50SourceName = ''
+    overlaySourceName = ''
 
     owlBaseX = None
     owlBaseY = None
     owlXDistance = None
     owlYDistance = None
+    milestoneSfx = None
+    owlAppearEasing = 'linear'
+    owlDisappearEasing = 'linear'
     textColor = None
     outlineColor = None
 
-    currentAnim = None
-    negatePressedAt = 0
+    # Opacities the label and counter are shown at (starting out
+    # hidden, as they are between increments). If there's an overlay
+    # group, these are split between its filter and the counter's; see
+    # setOverlayOpacity().
+    labelOpacity = 0
+    counterOpacity = 0
+
+    colorBrackets = None
+    gammaCorrectFades = False
+
+    # DigitSprites, if the counter is shown with digit sprites instead
+    # of a textbox
+    digitSprites = None
 
-    orlyCountIfInterrupted = None
+    currentTimeline = None
+    frameIndex = 0
+    timelineValue = None
+    negatePressedAt = 0
 
-    def __init__(self, defaults):
+    # What the current timeline was compiled from, in case it needs to
+    # be extended
+    startValue = None
+    startColors = None
+    currentAmount = None
+    entryState = None
+    timelineArgs = None
+
+    queuedDelta = 0
+    queuedEvents = None
+    hasQueuedIncrements = False
+
+    # Animation clock: the time.monotonic() time of the current tick,
+    # and of frame 0 of the current timeline
+    tickTime = 0
+    timelineStart = 0
+    framesSkipped = 0
+
+    # The counter value. This is the source of truth; the textbox just
+    # displays it.
+    value = None
+
+    # The settings snapshot that was last applied, and a number that
+    # changes whenever the settings change in a way that affects
+    # compiled timelines
+    appliedSettings = None
+    timelineGeneration = 0
+
+    def __init__(self, counterId, name, defaults):
         """
-        Initialize the state machine.
+        Initialize the state machine for the counter with the given ID
+        and display name.
         """
+        self.counterId = counterId
+        self.name = name
+
         self.owlBaseX = defaults['owl-x-position']
         self.owlBaseY = defaults['owl-y-position']
         self.owlXDistance = defaults['owl-x-movement-distance']
         self.owlYDistance = defaults['owl-y-movement-distance']
-
-        self.framerate = defaults['framerate']
+        self.milestoneSfx = {int(milestone): sourceName for milestone, sourceName
+                             in defaults.get('milestone-sfx', {}).items()
+                             if int(milestone) > 0}
+        self.owlAppearEasing = defaults.get('owl-appear-easing', 'linear')
+        self.owlDisappearEasing = defaults.get('owl-disappear-easing',
+                                               'linear')
+
+        # Use the OBS video framerate unless defaults.json overrides it
+        self.framerate = defaults.get('framerate') or obsVideoFramerate()
         self.negationTimeout = defaults['negation-timeout']
 
+        if defaults.get('digit-sprites'):
+            self.digitSprites = DigitSprites(defaults['digit-sprites'],
+                                             os.path.dirname(__file__))
 
-    def iterSceneItemsByName(self, sourceName):
-        """
-        Iterator over scene items with a given source name, in the
-        scene currently displayed in the frontend
-        """
-        # This took me a while to figure out, so I'll comment it
-        # enough to be understandable.
-
-        # First, we get the source we need to find items of
-        with getSourceByName(sourceName) as s:
-            if s is None: return []
+        if 'color-brackets' in defaults:
+            # (sprites can have outlines on any platform)
+            self.colorBrackets = ColorBrackets.fromJson(
+                defaults['color-brackets'],
+                OUTLINES_SUPPORTED or self.digitSprites is not None)
+        else:
+            self.colorBrackets = ColorBrackets(COLORS)
+        self.gammaCorrectFades = defaults.get('gamma-correct-fades', False)
 
-            # Now we get the entire scene that's currently streaming
-            with frontendGetCurrentScene() as currentSceneSource:
-                if currentSceneSource is None: return []
+        self.timelineCache = {}
+        self.queueLock = threading.Lock()
+        self.queuedEvents = []
+        self.appliedSettings = {}
 
-                # (and convert it to a scene)
-                currentScene = obs.obs_scene_from_source(currentSceneSource)
-                if currentScene is None: return []
+        self.value = counterJournal.get(counterId)
 
-                # Now we iterate over all the items in that scene
-                with sceneEnumItems(currentScene) as items:
-                    for item in items:
-                        if item is None: continue
 
-                        # Now we find what source this item is using
-                        itemSource = obs.obs_sceneitem_get_source(item)
-                        # And the name of that source
-                        itemSourceName = obs.obs_source_get_name(itemSource)
-                        # And if it's what we want, we yield it!
-                        if itemSourceName == sourceName:
-                            yield item
+    def propId(self, suffix):
+        """
+        Return the property (or hotkey) ID for one of this counter's
+        settings.
+        """
+        return self.counterId + '_' + suffix
 
 
     def updateSettings(self, settings):
         """
         Update the settings with the given obs_data_t settings object.
         """
+        self.applySettings(self.readSettings(settings))
 
-        # Update the owl source name
-        newOwlName = obs.obs_data_get_string(
-            settings,
-            PROP_ID_OWL_SOURCE)
-        if self.owlSourceName != newOwlName:
-            for item in self.iterSceneItemsByName(newOwlName):
-                pos = obs.vec2()
-                obs.obs_sceneitem_get_pos(item, pos)
-                self.owlBaseY = pos.y
-                break
-        self.owlSourceName = newOwlName
-
-        # Update the label and counter source names
-        self.labelSourceName = obs.obs_data_get_string(
-            settings,
-            PROP_ID_LABEL_SOURCE)
-        newCounterSourceName = obs.obs_data_get_string(
-            settings,
-            PROP_ID_COUNTER_SOURCE)
-        if self.counterSourceName != newCounterSourceName:
-            with getSourceByName(newCounterSourceName) as source:
-                if source is not None:
-                    with getSourceSettings(source) as settings:
-                        text = obs.obs_data_get_string(settings, 'text')
-                        try:
-                            self.textColor, self.outlineColor = \
-                                colorsForNum(int(text))
-                            self.setSourceTextColorByName(newCounterSourceName,
-                                                          self.textColor,
-                                                          self.outlineColor)
-                        except ValueError: pass
-        self.counterSourceName = newCounterSourceName
-
-        # Update the ding source names
-        self.ding1SourceName = obs.obs_data_get_string(
-            settings,
-            PROP_ID_DING1_SOURCE)
-        self.ding10SourceName = obs.obs_data_get_string(
-            settings,
-            PROP_ID_DING10_SOURCE)
-        self.ding50SourceName = obs.obs_data_get_string(
-            settings,
-            PROP_ID_DING50_SOURCE)
-
-        # Update the owl Y position and movement distance
-        self.owlBaseX = obs.obs_data_get_double(
-            settings,
-            PROP_ID_OWL_X_POS)
-        self.owlBaseY = obs.obs_data_get_double(
-            settings,
-            PROP_ID_OWL_Y_POS)
-        self.owlXDistance = obs.obs_data_get_double(
-            settings,
-            PROP_ID_OWL_X_DISTANCE)
-        self.owlYDistance = obs.obs_data_get_double(
-            settings,
-            PROP_ID_OWL_Y_DISTANCE)
+
+    def readSettings(self, settings):
+        """
+        Return a snapshot of this counter's settings in the given
+        obs_data_t settings object, as a dict keyed by PROP_ID_*.
+        """
+        snapshot = {}
+        for propId in SOURCE_PROP_IDS:
+            snapshot[propId] = obs.obs_data_get_string(settings,
+                                                       self.propId(propId))
+        for propId in POSITION_PROP_IDS:
+            snapshot[propId] = obs.obs_data_get_double(settings,
+                                                       self.propId(propId))
+        for propId in EASING_PROP_IDS:
+            snapshot[propId] = obs.obs_data_get_string(settings,
+                                                       self.propId(propId))
+        return snapshot
+
+
+    @profiled('updateSettings')
+    def applySettings(self, snapshot):
+        """
+        Apply a snapshot of the settings (from readSettings()). Only the
+        things that changed since the last snapshot are updated.
+        """
+        changed = {propId for propId, value in snapshot.items()
+                   if self.appliedSettings.get(propId) != value}
+        if not changed: return
+        previous = self.appliedSettings
+        self.appliedSettings = snapshot
+
+        if not changed.isdisjoint(SOURCE_PROP_IDS):
+            self.owlSourceName = snapshot[PROP_ID_OWL_SOURCE]
+            self.labelSourceName = snapshot[PROP_ID_LABEL_SOURCE]
+            self.ding1SourceName = snapshot[PROP_ID_DING1_SOURCE]
+            self.ding10SourceName = snapshot[PROP_ID_DING10_SOURCE]
+            self.ding50SourceName = snapshot[PROP_ID_DING50_SOURCE]
+
+            if PROP_ID_OVERLAY_SOURCE in changed:
+                # Whichever source isn't faded any more has to be left
+                # fully visible (if we were fading it before; on the
+                # first settings, nothing's been faded yet)
+                if PROP_ID_OVERLAY_SOURCE not in previous:
+                    pass
+                elif self.overlaySourceName:
+                    self.setSourceOpacityByName(self.overlaySourceName, 100)
+                else:
+                    self.setSourceOpacityByName(
+                        previous[PROP_ID_LABEL_SOURCE], 100)
+                self.overlaySourceName = snapshot[PROP_ID_OVERLAY_SOURCE]
+
+            if PROP_ID_COUNTER_SOURCE in changed:
+                newCounterSourceName = snapshot[PROP_ID_COUNTER_SOURCE]
+                sourceWriter.forget(self.counterSourceName)
+                sourceWriter.forget(newCounterSourceName)
+                self.counterSourceName = newCounterSourceName
+                if self.value is None:
+                    self.value = self.readTextboxValue(newCounterSourceName,
+                                                       quiet=True)
+                self.showValue()
+
+            # Hold on to the sources (and Opacity filters) we'll be using
+            names = ([self.owlSourceName,
+                      self.labelSourceName,
+                      self.counterSourceName]
+                     + self.sfxSourceNames())
+            if self.overlaySourceName:
+                fadedNames = [self.overlaySourceName, self.counterSourceName]
+            else:
+                fadedNames = [self.labelSourceName, self.counterSourceName]
+            names += [self.overlaySourceName]
+            filters = [(self.labelSourceName, OPACITY_FILTER_NAME),
+                       (self.counterSourceName, OPACITY_FILTER_NAME),
+                       (self.overlaySourceName, OPACITY_FILTER_NAME)]
+            if self.digitSprites is not None:
+                names += self.digitSprites.sourceNames()
+                filters += self.digitSprites.filters()
+            sourceHandles.setNames(self, names, filters)
+            for sourceName in fadedNames:
+                if sourceName:
+                    sourceHandles.ensureOpacityFilter(sourceName)
+            self.showSfxSources()
+            with self.frame():
+                self.setOverlayOpacity(self.labelOpacity,
+                                       self.counterOpacity)
+
+            if self.digitSprites is not None:
+                self.digitSprites.prepare(
+                    [(rgbaToColor(255, 255, 255), None)]
+                    + self.colorBrackets.colors)
+
+        if not changed.isdisjoint(POSITION_PROP_IDS + EASING_PROP_IDS):
+            self.owlBaseX = snapshot[PROP_ID_OWL_X_POS]
+            self.owlBaseY = snapshot[PROP_ID_OWL_Y_POS]
+            self.owlXDistance = snapshot[PROP_ID_OWL_X_DISTANCE]
+            self.owlYDistance = snapshot[PROP_ID_OWL_Y_DISTANCE]
+            self.owlAppearEasing = snapshot[PROP_ID_OWL_APPEAR_EASING]
+            self.owlDisappearEasing = snapshot[PROP_ID_OWL_DISAPPEAR_EASING]
+
+            # Compiled timelines have the owl positions baked in
+            self.timelineCache.clear()
+            self.timelineGeneration += 1
+            self.recompileTimeline()
+
+        self.precompileTimelines()
+
+
+    def recompileTimeline(self):
+        """
+        Recompile the timeline that's playing (if any) with the current
+        owl position settings, and carry on from the same frame.
+        """
+        # (a cancelled increment doesn't have anything to recompile)
+        if self.currentTimeline is None or self.timelineArgs is None: return
+
+        # Position changes don't change the number of frames, so the
+        # frame index is still good
+        self.currentTimeline = self.incrementTimeline(*self.timelineArgs)
+        owlPos = self.currentTimeline.stateAt(self.frameIndex - 1)[0]
+        if owlPos is not None:
+            self.setSourcePosByName(self.owlSourceName, *owlPos)
 
 
     def setSourceOpacityByName(self, sourceName, opacity):
         """
         Sets the opacity of the given source by name, if it has the
-        appropriate filter.
+        appropriate filter. (The change is queued in sourceWriter.)
         """
-        with getSourceByName(sourceName) as source:
-            if source is None: return
+        sourceWriter.update(sourceName,
+                            OPACITY_FILTER_NAME,
+                            {'opacity': int(opacity)})
+
 
-            with sourceGetFilterByName(source, OPACITY_FILTER_NAME) as filter:
-                if filter is None: return
+    def setOverlayOpacity(self, labelOpacity=None, counterOpacity=None):
+        """
+        Set the opacities of the label and counter (either can be None
+        to leave it as it is).
 
-                with createObsData() as settings:
-                    obs.obs_data_set_int(settings, 'opacity', int(opacity))
-                    obs.obs_source_update(filter, settings)
+        With an overlay group, the group's filter fades both of them,
+        and the counter's own filter only makes up the difference, so a
+        fade of the whole overlay is a single filter update per frame.
+        """
+        if labelOpacity is not None:
+            self.labelOpacity = labelOpacity
+        if counterOpacity is not None:
+            self.counterOpacity = counterOpacity
+
+        if not self.overlaySourceName:
+            if labelOpacity is not None:
+                self.setSourceOpacityByName(self.labelSourceName,
+                                            labelOpacity)
+            if counterOpacity is not None:
+                self.setSourceOpacityByName(self.counterSourceName,
+                                            counterOpacity)
+            return
+
+        # (writes of values the filters already have are dropped by
+        # sourceWriter)
+        self.setSourceOpacityByName(self.overlaySourceName,
+                                    self.labelOpacity)
+        if self.labelOpacity > 0:
+            counterPart = min(100, round(self.counterOpacity * 100
+                                         / self.labelOpacity))
+            self.setSourceOpacityByName(self.counterSourceName, counterPart)
+        else:
+            # Nothing's visible; just keep the counter hidden if it
+            # should be
+            self.setSourceOpacityByName(self.counterSourceName,
+                                        self.counterOpacity)
 
 
     def setSourceTextColorByName(self, sourceName, color, outline=None):
@@ -370,349 +3843,861 @@ class OrlyStateMachine():
         Sets the color of the given text source by name. The color
         should be an int, in OBS color format. The outline color can
         either be None (meaning no outline) or an int in OBS color
-        format.
-        """
-        with getSourceByName(sourceName) as source:
-            if source is None: return
-
-            with createObsData() as settings:
-                if obs.obs_source_get_id(source) == 'text_ft2_source':
-                    obs.obs_data_set_int(settings, 'color1', color)
-                    obs.obs_data_set_int(settings, 'color2', color)
-
-                    # FreeType2 currently doesn't support setting
-                    # outline colors. We *could* turn the outline on,
-                    # but that's probably not what whoever specified an
-                    # outline wanted. So we just won't.
-                
-                elif obs.obs_source_get_id(source) == 'text_gdiplus':
-                    colorRGB = rgbaToColor(*colorToRgba(color)[:3])
-                    colorA = int(colorToRgba(color)[3] * 100/255)
-                    obs.obs_data_set_int(settings, 'color', colorRGB)
-                    obs.obs_data_set_int(settings, 'opacity', colorA)
-
-                    obs.obs_data_set_bool(settings,
-                                          'outline',
-                                          outline is not None)
-                    if outline is not None:
-                        outlineRGB = rgbaToColor(*colorToRgba(outline)[:3])
-                        outlineA = int(colorToRgba(outline)[3] * 100/255)
-                        obs.obs_data_set_int(settings,
-                                             'outline_color',
-                                             outlineRGB)
-                        obs.obs_data_set_int(settings,
-                                             'outline_opacity',
-                                             outlineA)
-
-                obs.obs_source_update(source, settings)
+        format. (The change is queued in sourceWriter.)
+        """
+        source = sourceHandles.get(sourceName)
+        if source is None: return
+        sourceId = obs.obs_source_get_id(source)
+
+        values = {}
+        if sourceId == 'text_ft2_source':
+            values['color1'] = color
+            values['color2'] = color
+
+            # FreeType2 currently doesn't support setting
+            # outline colors. We *could* turn the outline on,
+            # but that's probably not what whoever specified an
+            # outline wanted. So we just won't.
+
+        elif sourceId == 'text_gdiplus':
+            values['color'] = rgbaToColor(*colorToRgba(color)[:3])
+            values['opacity'] = int(colorToRgba(color)[3] * 100/255)
+
+            values['outline'] = outline is not None
+            if outline is not None:
+                values['outline_color'] = \
+                    rgbaToColor(*colorToRgba(outline)[:3])
+                values['outline_opacity'] = \
+                    int(colorToRgba(outline)[3] * 100/255)
+
+        sourceWriter.update(sourceName, None, values)
 
 
     def setSourcePosByName(self, sourceName, x=None, y=None):
         """
         Set the position of the given source by name. If either
-        coordinate is None, that coordinate will not be modified.
+        coordinate is None, that coordinate will not be modified. (The
+        change is queued in sourceWriter.)
         """
         if x == y == None: return
+        sourceWriter.setPos(sourceName, x, y)
+
+
+    def frame(self):
+        """
+        Context manager for one frame's worth of changes to the
+        sources: everything queued inside it is sent to OBS together
+        when it ends (or when the outermost frame ends, if they're
+        nested).
+        """
+        return sourceWriter.transaction()
 
-        for item in self.iterSceneItemsByName(sourceName):
-            pos = obs.vec2()
-            obs.obs_sceneitem_get_pos(item, pos)
-            if x is not None:
-                pos.x = x
-            if y is not None:
-                pos.y = y
-            obs.obs_sceneitem_set_pos(item, pos)
+
+    def sfxMilestones(self):
+        """
+        Return a dict of {N: source name} for the sound effects played
+        when the counter passes a multiple of N.
+        """
+        milestones = dict(self.milestoneSfx)
+        milestones[10] = self.ding10SourceName
+        return milestones
+
+
+    def sfxSourceNames(self):
+        """
+        Return a list of the names of all of the sound effect sources.
+        """
+        return ([self.ding1SourceName, self.ding50SourceName]
+                + list(self.sfxMilestones().values()))
+
+
+    def showSfxSources(self):
+        """
+        Make sure the sound effect scene items are visible (so that
+        they can be played by restarting them), without playing them.
+        """
+        sourceNames = self.sfxSourceNames()
+        with self.frame():
+            for sourceName in sourceNames:
+                # (they might have been hidden by hand since we last
+                # showed them, so what we wrote before doesn't count)
+                sourceWriter.forgetItems(sourceName)
+                sourceWriter.setVisible(sourceName, True)
+        soundEffects.stop(sourceNames)
 
 
     def prepareForSfx(self):
         """
         Stop all playing sound effects, so that one can be played soon.
         """
-        for sourceName in [self.ding1SourceName,
-                        self.ding10SourceName,
-                        self.ding50SourceName]:
-            for item in self.iterSceneItemsByName(sourceName):
-                obs.obs_sceneitem_set_visible(item, False)
+        soundEffects.stop(self.sfxSourceNames())
 
 
     def playSFX(self, sourceName):
         """
         Play the sound effect with the given source name.
         """
-        for item in self.iterSceneItemsByName(sourceName):
-            obs.obs_sceneitem_set_visible(item, True)
+        soundEffects.play(sourceName)
+
+
+    def setSourceTextByName(self, sourceName, text):
+        """
+        Sets the text of the given text source by name. (The change is
+        queued in sourceWriter.)
+        """
+        sourceWriter.update(sourceName, None, {'text': text})
+
+
+    def setCounterText(self, text):
+        """
+        Show the given text on the counter, whichever way it's shown.
+        """
+        if self.digitSprites is None:
+            self.setSourceTextByName(self.counterSourceName, text)
+        else:
+            self.digitSprites.setText(text)
+
+
+    def setCounterColors(self, color, outline=None):
+        """
+        Show the counter in the given colors, whichever way it's shown.
+        """
+        if self.digitSprites is None:
+            self.setSourceTextColorByName(self.counterSourceName,
+                                          color,
+                                          outline)
+        else:
+            self.digitSprites.setColors((color, outline))
 
 
-    def tick(self):
+    def tick(self, now):
         """
-        Play the next animation frame.
+        Play the animation frame that should be showing at the
+        time.monotonic() time `now`, after picking up any increments
+        that were queued since the last one. If we've fallen behind,
+        the frames in between are skipped (but their changes are still
+        applied).
         Return True if there's still more animation to play.
         """
-        if self.currentAnim is not None:
-            try:
-                next(self.currentAnim)
-                return True
-            except StopIteration:
-                return False
-        return False
+        self.tickTime = now
+
+        queued = self.takeQueuedIncrements()
+        if queued is not None:
+            delta, events = queued
+            self.retarget(delta)
+            self.recordHistory(delta, events)
+
+        if self.currentTimeline is None: return False
+
+        if self.frameIndex >= len(self.currentTimeline):
+            self.currentTimeline = None
+            self.precompileTimelines()
+            return False
+
+        # Which frame should be showing by now?
+        targetIndex = int((now - self.timelineStart) * self.framerate)
+        targetIndex = min(targetIndex, len(self.currentTimeline) - 1)
+        if targetIndex < self.frameIndex:
+            # The timer fired early; the current frame is still fine
+            return True
+
+        if targetIndex == self.frameIndex:
+            self.applyKeyframe(self.currentTimeline[self.frameIndex])
+        else:
+            # (hold frames don't count, since there's nothing to skip)
+            self.framesSkipped += self.currentTimeline.countKeyframes(
+                self.frameIndex, targetIndex)
+            self.applyKeyframe(
+                self.currentTimeline.span(self.frameIndex, targetIndex + 1))
+        self.frameIndex = targetIndex + 1
+        return True
+
+
+    def nextDeadline(self):
+        """
+        Return the time.monotonic() time of the next frame where
+        something changes (which might be in the past), or None if
+        nothing's playing.
+        """
+        if self.hasQueuedInput(): return self.tickTime
+        if self.currentTimeline is None: return None
+        index = self.currentTimeline.nextKeyframe(self.frameIndex)
+        return self.timelineStart + index / self.framerate
+
+
+    def queueIncrement(self, amount, negated=False):
+        """
+        Queue an increment of the counter, to be picked up on the next
+        frame. Increments queued between two frames are merged. This is
+        safe to call from any thread.
+        """
+        with self.queueLock:
+            self.queuedDelta += amount
+            self.queuedEvents.append((time.time(), amount, negated))
+            self.hasQueuedIncrements = True
+        scheduler.wake(self)
+
+
+    def hasQueuedInput(self):
+        """
+        Return True if there are queued increments that haven't been
+        picked up yet.
+        """
+        return self.hasQueuedIncrements
+
+
+    def takeQueuedIncrements(self):
+        """
+        Return the total of all queued increments and a list of them
+        as (time, amount, negated) tuples (or None if there aren't
+        any), and clear the queue.
+        """
+        if not self.hasQueuedIncrements: return None
+
+        with self.queueLock:
+            delta = self.queuedDelta
+            events = self.queuedEvents
+            self.queuedDelta = 0
+            self.queuedEvents = []
+            self.hasQueuedIncrements = False
+        return delta, events
+
+
+    def recordHistory(self, delta, events):
+        """
+        Add increments taken from the queue (after they've been applied)
+        to the event history.
+        """
+        if self.value is None: return # the textbox didn't have a number
+
+        value = self.value - delta
+        for timestamp, amount, negated in events:
+            value += amount
+            eventHistory.record(self.counterId, timestamp, amount, negated,
+                                value)
+
 
+    def retarget(self, delta):
+        """
+        Add `delta` to the counter, extending the animation that's
+        already playing (if any) instead of restarting it.
+        """
+        if delta == 0: return # presses that cancelled each other out
+
+        if self.currentTimeline is None:
+            self.increment(delta)
+
+        elif (self.frameIndex < self.currentTimeline.markers['appearEnd']
+                and self.currentAmount + delta == 0):
+            # The increment that's appearing was taken back, so there's
+            # nothing to show any more
+            self.cancelIncrement()
+
+        elif self.frameIndex < self.currentTimeline.markers['appearEnd']:
+            # The overlay is still appearing, so just fold this into
+            # the increment that's being shown
+            self.startIncrement(self.startValue,
+                                self.currentAmount + delta,
+                                self.entryState,
+                                keepFrame=True)
+
+        else:
+            # Show a new increment from where the overlay is right now
+            self.startIncrement(
+                self.timelineValue,
+                delta,
+                self.currentTimeline.stateAt(self.frameIndex - 1))
+
+
+    def applyKeyframe(self, keyframe):
+        """
+        Apply one row of a compiled timeline to the sources.
+        """
+        if keyframe is None: return # hold frame
+
+        if keyframe.owlPos is not None:
+            self.setSourcePosByName(self.owlSourceName, *keyframe.owlPos)
+        if (keyframe.labelOpacity is not None
+                or keyframe.counterOpacity is not None):
+            self.setOverlayOpacity(keyframe.labelOpacity,
+                                   keyframe.counterOpacity)
+        if keyframe.counterText is not None:
+            self.setCounterText(
+                keyframe.counterText.format(value=self.timelineValue))
+        if keyframe.counterColors is not None:
+            self.setCounterColors(*keyframe.counterColors)
+        if keyframe.fadeColors is not None:
+            self.digitSprites.setColors(keyframe.fadeColors, fade=True)
+        if keyframe.fadeOpacity is not None:
+            self.digitSprites.setFadeOpacity(keyframe.fadeOpacity)
+        if keyframe.committedColors is not None:
+            self.textColor, self.outlineColor = keyframe.committedColors
+        if keyframe.sfx is not None:
+            self.playSFX(self.sfxSourceName(keyframe.sfx))
+
+
+    def sfxSourceName(self, sfx):
+        """
+        Return the source name for a sound effect named in a timeline
+        ('ding1', 'ding50', or 'ding<N>' for the one for multiples of
+        N).
+        """
+        if sfx == 'ding1':
+            return self.ding1SourceName
+        elif sfx == 'ding50':
+            return self.ding50SourceName
+        return self.sfxMilestones().get(int(sfx[4:]), self.ding1SourceName)
 
-    def appearAnimation(self):
+
+    def transitionSteps(self, divisor):
         """
-        The animation in which the scene items appear.
+        Return how many frames a transition lasting 1/`divisor` of a
+        second takes: at least 2 (its first and last frames), even at
+        very low framerates.
         """
-        self.hideAll()
+        return max(self.framerate // divisor, 2)
+
 
-        for pct in fractionsOfOne(self.framerate // 6):
+    def compileAppear(self, builder, setup):
+        """
+        Add the animation in which the scene items appear to a
+        timeline. `setup` is a dict of Keyframe fields that set up the
+        counter before it appears.
+        """
+        builder.mark('setup')
+        motion = easingTable(self.owlAppearEasing, self.transitionSteps(6))
+        for i, pct in enumerate(motion):
             x = self.owlBaseX + self.owlXDistance * (1 - pct)
             y = self.owlBaseY + self.owlYDistance * (1 - pct)
-            self.setSourcePosByName(self.owlSourceName, x, y)
-            yield
+            if i == 0:
+                # Start by hiding everything
+                builder.frame(owlPos=(x, y),
+                              labelOpacity=0,
+                              counterOpacity=0,
+                              **setup)
+            else:
+                builder.frame(owlPos=(x, y))
 
-        for i in range(self.framerate // 7):
-            yield
+        builder.hold(self.framerate // 7)
 
-        for pct in fractionsOfOne(self.framerate // 6):
-            self.setSourceOpacityByName(self.labelSourceName, pct * 100)
-            yield
+        for pct in fractionsOfOne(self.transitionSteps(6)):
+            builder.frame(labelOpacity=int(pct * 100))
 
-        for i in range(int(self.framerate / 2.5)):
-            yield
+        builder.hold(int(self.framerate / 2.5))
 
-        for pct in fractionsOfOne(self.framerate // 6):
-            self.setSourceOpacityByName(self.counterSourceName, pct * 100)
-            yield
+        for pct in fractionsOfOne(self.transitionSteps(6)):
+            builder.frame(counterOpacity=int(pct * 100))
 
 
-    def disappearAnimation(self):
+    def compileReappear(self, builder, entryState, setup):
         """
-        The animation in which the scene items disappear.
+        Like compileAppear(), but starting from an overlay that's
+        already (perhaps partly) visible, in the (owl position, label
+        opacity, counter opacity) state `entryState`. The owl and label
+        return to where they belong, and the counter fades out, is set
+        up and fades back in.
         """
-        for pct in fractionsOfOne(self.framerate // 5):
-            x = self.owlBaseX + self.owlXDistance * pct
-            y = self.owlBaseY + self.owlYDistance * pct
-            self.setSourcePosByName(self.owlSourceName, x, y)
-            pct = 1 - pct
-            self.setSourceOpacityByName(self.labelSourceName, pct * 100)
-            self.setSourceOpacityByName(self.counterSourceName, pct * 100)
-            yield
+        (x0, y0), label0, counter0 = entryState
+        motion = easingTable(self.owlAppearEasing, self.transitionSteps(6))
+        for i, pct in enumerate(fractionsOfOne(self.transitionSteps(6))):
+            if i == 0: continue # that's where we are already
+            x = x0 + (self.owlBaseX - x0) * motion[i]
+            y = y0 + (self.owlBaseY - y0) * motion[i]
+            builder.frame(owlPos=(x, y),
+                          labelOpacity=int(label0 + (100 - label0) * pct),
+                          counterOpacity=int(counter0 * (1 - pct)))
+
+        builder.mark('setup')
+        for i, pct in enumerate(fractionsOfOne(self.transitionSteps(6))):
+            if i == 0:
+                builder.frame(counterOpacity=0, **setup)
+            else:
+                builder.frame(counterOpacity=int(pct * 100))
 
 
-    def increment(self, amount=1):
+    def compileDisappear(self, builder):
         """
-        Begin the animation of incrementing the counter.
+        Add the animation in which the scene items disappear to a
+        timeline.
+        """
+        motion = easingTable(self.owlDisappearEasing, self.transitionSteps(5))
+        for i, pct in enumerate(fractionsOfOne(self.transitionSteps(5))):
+            x = self.owlBaseX + self.owlXDistance * motion[i]
+            y = self.owlBaseY + self.owlYDistance * motion[i]
+            opacity = int((1 - pct) * 100)
+            builder.frame(owlPos=(x, y),
+                          labelOpacity=opacity,
+                          counterOpacity=opacity)
+
+
+    def compileCancel(self, entryState, colors):
+        """
+        Compile the timeline for calling off an increment while the
+        overlay is appearing: the overlay goes away again from the (owl
+        position, label opacity, counter opacity) state `entryState`,
+        and the counter is put back to its old value in the (fill,
+        outline) pair `colors`.
         """
-        self.prepareForSfx()
+        builder = TimelineBuilder()
+        # (anything pressed from here on starts a new increment)
+        builder.mark('setup')
+        builder.mark('appearEnd')
+
+        x1 = self.owlBaseX + self.owlXDistance
+        y1 = self.owlBaseY + self.owlYDistance
+        owlPos, label0, counter0 = entryState
+        x0, y0 = owlPos if owlPos is not None else (x1, y1)
+        motion = easingTable(self.owlDisappearEasing, self.transitionSteps(5))
+        for i, pct in enumerate(fractionsOfOne(self.transitionSteps(5))):
+            if i == 0: continue # that's where we are already
+            builder.frame(owlPos=(x0 + (x1 - x0) * motion[i],
+                                  y0 + (y1 - y0) * motion[i]),
+                          labelOpacity=int(label0 * (1 - pct)),
+                          counterOpacity=int(counter0 * (1 - pct)))
+
+        reset = {'counterText': '{value}'}
+        if colors[0] is not None:
+            reset['counterColors'] = colors
+            reset['committedColors'] = colors
+        builder.frame(**reset)
+        builder.mark('disappearStart')
+        return builder.build()
+
+
+    def compileColorFade(self, builder, oldColors, newColors):
+        """
+        Add a fade of the counter from one (fill, outline) color pair
+        to another to a timeline.
+        """
+        if self.digitSprites is not None:
+            self.compileSpriteColorFade(builder, newColors)
+            return
 
-        with getSourceByName(self.counterSourceName) as counterSource:
-            if counterSource is None: return
+        for colors in colorFadeTable(oldColors,
+                                     newColors,
+                                     self.transitionSteps(6),
+                                     self.gammaCorrectFades):
+            builder.frame(counterColors=colors)
 
-            if self.orlyCountIfInterrupted is None:
-                with getSourceSettings(counterSource) as counterSettings:
-                    if counterSettings is None: return
-                    currentText = obs.obs_data_get_string(counterSettings,
-                                                          'text')
 
-                # Don't crash if the textbox doesn't contain a number
-                try:
-                    currentValue = int(currentText)
-                except ValueError:
-                    print('ERROR: The number textbox contains "%s"!'
-                          % currentText)
-                    return
-            else:
-                currentValue = self.orlyCountIfInterrupted
-
-            isMultipleOf10 = False
-            for i in range(amount):
-                isMultipleOf10 |= (currentValue + i + 1) % 10 == 0
-            newValue = currentValue + amount
-            self.orlyCountIfInterrupted = newValue
-
-            if amount != 1:
-                if amount >= 0:
-                    text = '+' + str(amount)
-                elif amount < 1:
-                    text = str(amount)
-                color = None
-                outline = None
+    def compileSpriteColorFade(self, builder, newColors):
+        """
+        compileColorFade() for digit sprite mode: the fade row is shown
+        in the new colors and faded in over the counter, and then the
+        counter switches to the new colors underneath it. Without a fade
+        row, the counter just switches halfway through.
+        """
+        steps = self.transitionSteps(6)
+        if not self.digitSprites.hasFadeLayer:
+            builder.hold(steps // 2)
+            builder.frame(counterColors=newColors)
+            builder.hold(steps - steps // 2 - 1)
+            return
+
+        for i, pct in enumerate(fractionsOfOne(steps)):
+            if i == 0:
+                builder.frame(fadeColors=newColors, fadeOpacity=0)
             else:
-                text = str(newValue)
-                color, outline = colorsForNum(newValue)
+                builder.frame(fadeOpacity=int(pct * 100))
+        # (a frame apart, in case the new image takes a moment to load)
+        builder.frame(counterColors=newColors)
+        builder.frame(fadeOpacity=0)
+
 
-            with createObsData() as counterSettings:
-                obs.obs_data_set_string(counterSettings, 'text', text)
-                obs.obs_source_update(counterSource, counterSettings)
+    def compileIncrement(self, amount, startColors, newColors, milestone,
+                         entryState=None):
+        """
+        Compile the timeline for incrementing the counter by `amount`,
+        where the counter's colors are currently considered to be the
+        (fill, outline) pair `startColors` and the new value belongs in
+        `newColors`. `milestone` is the largest N from sfxMilestones()
+        that the counter passes a multiple of, or None. If entryState
+        isn't None, the overlay is already visible; see
+        compileReappear().
+        """
+        builder = TimelineBuilder()
 
+        # Set up the counter: show either the amount being added (in
+        # white) or the new value
         if amount != 1:
-            self.setSourceTextColorByName(self.counterSourceName,
-                                          rgbaToColor(255, 255, 255))
-        elif color == self.textColor or self.textColor is None:
-            self.setSourceTextColorByName(self.counterSourceName,
-                                          color,
-                                          outline)
-            self.textColor = color
-            self.outlineColor = outline
-
-        def anim():
-            """
-            Generator function for the ORLY increment animation
-            """
-            nonlocal color, outline, text
-            yield from self.appearAnimation()
-
-            if amount != 1:
-                for i in range(int(self.framerate * 1.15)):
-                    yield
-
-                for pct in fractionsOfOne(self.framerate // 6):
-                    self.setSourceOpacityByName(self.counterSourceName,
-                                                100 - pct * 100)
-                    yield
-
-                yield
-
-                text = str(newValue)
-                color, outline = colorsForNum(newValue)
-
-                with getSourceByName(self.counterSourceName) as counterSource:
-                    with createObsData() as counterSettings:
-                        obs.obs_data_set_string(counterSettings, 'text', text)
-                        obs.obs_source_update(counterSource, counterSettings)
-
-                # If we're increasing (i.e. we may flip to a new color),
-                # set it to the previous color. If we're decreasing,
-                # just set it to the color it should actually be.
-                if amount > 0 and self.textColor is not None:
-                    self.setSourceTextColorByName(self.counterSourceName,
-                                                  self.textColor,
-                                                  self.outlineColor)
-                else:
-                    self.setSourceTextColorByName(self.counterSourceName,
-                                                  color,
-                                                  outline)
-                    self.textColor = color
-                    self.outlineColor = outline
-
-                for pct in fractionsOfOne(self.framerate // 6):
-                    self.setSourceOpacityByName(self.counterSourceName,
-                                                pct * 100)
-                    yield
-
-            if self.textColor == color or amount < 0:
-                if amount > 0:
-                    if isMultipleOf10:
-                        self.playSFX(self.ding10SourceName)
-                    else:
-                        self.playSFX(self.ding1SourceName)
-
-                for i in range(int(self.framerate * 1.15)):
-                    yield
+            if amount >= 0:
+                text = '+' + str(amount)
+            elif amount < 1:
+                text = str(amount)
+            setup = {'counterText': text,
+                     'counterColors': (rgbaToColor(255, 255, 255), None)}
+            oldColors = startColors
+        elif newColors[0] == startColors[0] or startColors[0] is None:
+            setup = {'counterText': '{value}',
+                     'counterColors': newColors,
+                     'committedColors': newColors}
+            oldColors = newColors
+        else:
+            setup = {'counterText': '{value}',
+                     'counterColors': startColors}
+            oldColors = startColors
+
+        if self.digitSprites is not None and self.digitSprites.hasFadeLayer:
+            # In case a color fade was interrupted
+            setup['fadeOpacity'] = 0
+
+        if entryState is None:
+            self.compileAppear(builder, setup)
+        else:
+            self.compileReappear(builder, entryState, setup)
+        builder.mark('appearEnd')
+
+        if amount != 1:
+            builder.hold(int(self.framerate * 1.15))
+
+            for pct in fractionsOfOne(self.transitionSteps(6)):
+                builder.frame(counterOpacity=int(100 - pct * 100))
 
+            builder.hold(1)
+
+            # If we're increasing (i.e. we may flip to a new color),
+            # set it to the previous color. If we're decreasing,
+            # just set it to the color it should actually be.
+            if amount > 0 and oldColors[0] is not None:
+                swapColors = oldColors
             else:
-                self.playSFX(self.ding50SourceName)
-
-                for i in range(int(self.framerate * 0.4)):
-                    yield
-
-                # Blend the old and new colors
-                r1a, g1a, b1a, _ = colorToRgba(self.textColor)
-                r2a, g2a, b2a, _ = colorToRgba(color)
-                fadeOutline = (self.outlineColor is not None
-                               or outline is not None)
-                if fadeOutline:
-                    soC = self.outlineColor
-                    if self.outlineColor is None:
-                        soC = rgbaToColor(0, 0, 0, 0)
-                    outlineC = outline
-                    if outline is None:
-                        outlineC = rgbaToColor(0, 0, 0, 0)
-                    r1b, g1b, b1b, a1b = colorToRgba(soC)
-                    r2b, g2b, b2b, a2b = colorToRgba(outlineC)
-                for pct in fractionsOfOne(self.framerate // 6):
-                    r3a = int(r1a + (r2a - r1a) * pct)
-                    g3a = int(g1a + (g2a - g1a) * pct)
-                    b3a = int(b1a + (b2a - b1a) * pct)
-                    fadeColor = rgbaToColor(r3a, g3a, b3a)
-                    if fadeOutline:
-                        r3b = int(r1b + (r2b - r1b) * pct)
-                        g3b = int(g1b + (g2b - g1b) * pct)
-                        b3b = int(b1b + (b2b - b1b) * pct)
-                        a3b = int(a1b + (a2b - a1b) * pct)
-                        if a3b <= 1:
-                            fadeOutlineColor = None
-                        else:
-                            fadeOutlineColor = rgbaToColor(r3b, g3b, b3b, a3b)
-                    else:
-                        fadeOutlineColor = None
-                    self.setSourceTextColorByName(self.counterSourceName,
-                                                  fadeColor,
-                                                  fadeOutlineColor)
-                    yield
-
-                self.textColor = color
-                self.outlineColor = outline
-
-                for i in range(int(self.framerate * 2.15)):
-                    yield
-
-            yield from self.disappearAnimation()
-
-            self.orlyCountIfInterrupted = None
-
-        self.currentAnim = anim()
+                swapColors = oldColors = newColors
+            for i, pct in enumerate(fractionsOfOne(self.transitionSteps(6))):
+                if i == 0:
+                    builder.frame(counterOpacity=0,
+                                  counterText='{value}',
+                                  counterColors=swapColors,
+                                  committedColors=swapColors)
+                else:
+                    builder.frame(counterOpacity=int(pct * 100))
 
+        if oldColors[0] == newColors[0] or amount < 0:
+            holdFrames = int(self.framerate * 1.15)
+            if amount > 0:
+                if milestone is None:
+                    builder.frame(sfx='ding1')
+                else:
+                    builder.frame(sfx='ding%d' % milestone)
+                holdFrames -= 1
 
-    def hideAll(self):
+            builder.hold(holdFrames)
+
+        else:
+            builder.frame(sfx='ding50')
+
+            builder.hold(int(self.framerate * 0.4) - 1)
+
+            self.compileColorFade(builder, oldColors, newColors)
+
+            builder.frame(committedColors=newColors)
+            builder.hold(int(self.framerate * 2.15) - 1)
+
+        builder.mark('disappearStart')
+        self.compileDisappear(builder)
+
+        return builder.build()
+
+
+    def timelineArgsFor(self, startValue, amount, startColors,
+                        entryState=None):
         """
-        Hide all sources.
+        Return the compileIncrement() arguments for adding `amount` to
+        `startValue`, when the counter's colors are considered to be
+        `startColors`.
+        """
+        # (the counter passes a multiple of n if there's one more of
+        # them below the new value than below the old one)
+        milestone = None
+        if amount > 0:
+            for n in self.sfxMilestones():
+                if ((startValue + amount) // n > startValue // n
+                        and (milestone or 0) < n):
+                    milestone = n
+
+        return (amount,
+                startColors,
+                self.colorBrackets.colorsFor(startValue + amount),
+                milestone,
+                entryState)
+
+
+    def precompileTimelines(self):
         """
-        # Set the ORLY owl position
-        self.setSourcePosByName(self.owlSourceName,
-                                self.owlBaseX + self.owlXDistance,
-                                self.owlBaseY + self.owlYDistance)
+        Compile the timelines for the likely next increments on a worker
+        thread, so that they're already cached when a hotkey is pressed.
+        """
+        if self.value is None: return
 
-        # Set the label and counter opacities
-        self.setSourceOpacityByName(self.labelSourceName, 0)
-        self.setSourceOpacityByName(self.counterSourceName, 0)
+        startColors = (self.textColor, self.outlineColor)
+        argsList = []
+        for amount in PRECOMPILED_AMOUNTS:
+            args = self.timelineArgsFor(self.value, amount, startColors)
+            if args not in self.timelineCache:
+                argsList.append(args)
+        if not argsList: return
 
+        generation = self.timelineGeneration
+        workers.submit(
+            lambda: [(args, self.compileIncrement(*args))
+                     for args in argsList],
+            callback=lambda timelines: self.cacheTimelines(generation,
+                                                           timelines))
 
-    def restoreAll(self):
+
+    def cacheTimelines(self, generation, timelines):
         """
-        Restore (un-hide) all sources.
+        Add timelines compiled by precompileTimelines() to the cache,
+        unless the settings have changed since they were compiled.
+        """
+        if generation != self.timelineGeneration: return
+        for args, timeline in timelines:
+            if len(self.timelineCache) >= TIMELINE_CACHE_SIZE: return
+            self.timelineCache.setdefault(args, timeline)
+
+
+    def incrementTimeline(self, *args):
+        """
+        Return the (possibly cached) timeline for incrementing the
+        counter. See compileIncrement() for the arguments.
+        """
+        timeline = self.timelineCache.get(args)
+        if timeline is None:
+            # Re-entry states make for lots of possible keys, so don't
+            # let the cache grow forever
+            if len(self.timelineCache) >= TIMELINE_CACHE_SIZE:
+                self.timelineCache.clear()
+            timeline = self.compileIncrement(*args)
+            self.timelineCache[args] = timeline
+        return timeline
+
+
+    def readTextboxValue(self, sourceName, quiet=False):
+        """
+        Return the number in the given textbox, or None if it doesn't
+        contain one (in which case an error is printed, unless quiet is
+        True).
+        """
+        source = sourceHandles.get(sourceName)
+        if source is None: return None
+
+        with getSourceSettings(source) as settings:
+            if settings is None: return None
+            text = obs.obs_data_get_string(settings, 'text')
+
+        # Don't crash if the textbox doesn't contain a number
+        try:
+            return int(text)
+        except ValueError:
+            if not quiet:
+                print('ERROR: The number textbox contains "%s"!' % text)
+            return None
+
+
+    def showValue(self):
+        """
+        Write the counter value to the textbox, in the color for that
+        value.
+        """
+        if self.value is None: return
+
+        self.textColor, self.outlineColor = \
+            self.colorBrackets.colorsFor(self.value)
+        with self.frame():
+            self.setCounterText(str(self.value))
+            self.setCounterColors(self.textColor, self.outlineColor)
+
+
+    def useTextboxValue(self):
+        """
+        Replace the counter value with the number in the textbox, for
+        when the user wants to set it by hand.
+        """
+        value = self.readTextboxValue(self.counterSourceName)
+        if value is None: return
+        self.setValue(value)
+
+
+    def setValue(self, value):
+        """
+        Replace the counter value, and show it. If an increment is
+        playing, it's called off: the overlay goes away from wherever
+        it is, with the new value on the counter.
+        """
+        if self.currentTimeline is not None:
+            entryState = self.currentTimeline.stateAt(self.frameIndex - 1)
+            colors = self.colorBrackets.colorsFor(value)
+
+            self.currentAmount = 0
+            self.startValue = value
+            self.timelineValue = value
+            self.timelineArgs = None
+            self.currentTimeline = self.compileCancel(entryState, colors)
+            self.frameIndex = 0
+            self.timelineStart = time.monotonic()
+            scheduler.wake(self)
+
+        self.value = value
+        counterJournal.record(self.counterId, value)
+        self.showValue()
+        self.precompileTimelines()
+
+
+    @profiled('increment')
+    def increment(self, amount=1):
+        """
+        Begin the animation of incrementing the counter.
+        """
+        if self.value is None and self.digitSprites is not None:
+            # There's no textbox to start from
+            self.value = 0
+        if self.value is None:
+            # We've never seen this counter before, so start from
+            # whatever's in the textbox
+            self.value = self.readTextboxValue(self.counterSourceName)
+            if self.value is None: return
+
+        self.startIncrement(self.value, amount)
+
+
+    def startIncrement(self, startValue, amount, entryState=None,
+                       keepFrame=False):
+        """
+        Start playing the timeline for adding `amount` to `startValue`.
+        If keepFrame is True, the new timeline replaces the one that's
+        playing without starting it over; this only works if both
+        timelines are identical up to the current frame, apart from how
+        the counter is set up.
+        """
+        if keepFrame:
+            self.textColor, self.outlineColor = self.startColors
+        else:
+            self.prepareForSfx()
+            self.startColors = (self.textColor, self.outlineColor)
+
+        newValue = startValue + amount
+
+        self.startValue = startValue
+        self.currentAmount = amount
+        self.entryState = entryState
+        self.value = newValue
+        self.timelineValue = newValue
+        counterJournal.record(self.counterId, newValue)
+        self.timelineArgs = self.timelineArgsFor(startValue, amount,
+                                                 self.startColors, entryState)
+        self.currentTimeline = self.incrementTimeline(*self.timelineArgs)
+
+        if not keepFrame:
+            self.frameIndex = 0
+            self.timelineStart = self.tickTime
+        elif self.frameIndex > self.currentTimeline.markers['setup']:
+            # We're past the point where the counter was set up, so
+            # set it up again for the new amount
+            setup = self.currentTimeline[self.currentTimeline.markers['setup']]
+            self.applyKeyframe(setup._replace(owlPos=None,
+                                              labelOpacity=None,
+                                              counterOpacity=None))
+
+
+    def cancelIncrement(self):
+        """
+        Call off the increment that's appearing (because it was taken
+        back before it was shown), putting the counter back to the
+        value it had before it.
+        """
+        entryState = self.currentTimeline.stateAt(self.frameIndex - 1)
+        self.textColor, self.outlineColor = self.startColors
+
+        self.currentAmount = 0
+        self.value = self.startValue
+        self.timelineValue = self.startValue
+        counterJournal.record(self.counterId, self.startValue)
+        self.timelineArgs = None
+        self.currentTimeline = self.compileCancel(entryState,
+                                                  self.startColors)
+        self.frameIndex = 0
+        self.timelineStart = self.tickTime
+
+
+    def hideAll(self):
+        """
+        Hide all sources.
         """
+        # This is used to set things up, so don't trust that the
+        # sources are still the way we left them
+        sourceWriter.forget()
+        with self.frame():
+            if self.digitSprites is not None:
+                self.digitSprites.forget()
+                self.digitSprites.setFadeOpacity(0)
 
-        # Restore the ORLY owl position
-        self.setSourcePosByName(self.owlSourceName,
-                                self.owlBaseX,
-                                self.owlBaseY)
+            # Set the ORLY owl position
+            self.setSourcePosByName(self.owlSourceName,
+                                    self.owlBaseX + self.owlXDistance,
+                                    self.owlBaseY + self.owlYDistance)
 
-        # Restore the label opacity
-        self.setSourceOpacityByName(self.labelSourceName, 100)
+            # Set the label and counter opacities
+            self.setOverlayOpacity(0, 0)
 
-        # Restore the counter color and opacity
-        white = rgbaToColor(255, 255, 255)
-        self.setSourceTextColorByName(self.counterSourceName, white)
-        self.setSourceOpacityByName(self.counterSourceName, 100)
+            # (the sound effects are always visible, though)
+            self.showSfxSources()
 
 
-def createStateMachine():
+    def restoreAll(self):
+        """
+        Restore (un-hide) all sources.
+        """
+        # This is used to set things up, so don't trust that the
+        # sources are still the way we left them
+        sourceWriter.forget()
+        with self.frame():
+            if self.digitSprites is not None:
+                self.digitSprites.forget()
+                self.digitSprites.setFadeOpacity(0)
+
+            # Restore the ORLY owl position
+            self.setSourcePosByName(self.owlSourceName,
+                                    self.owlBaseX,
+                                    self.owlBaseY)
+
+            # Restore the label and counter opacities, and the counter
+            # color
+            self.setOverlayOpacity(100, 100)
+            white = rgbaToColor(255, 255, 255)
+            self.setCounterColors(white)
+
+
+def loadDefaults():
     """
-    Create the state machine that will handle all animations, if it's
-    not already created.
+    Load defaults.json.
     """
-    global orlyStateMachine
-    if orlyStateMachine is not None: return
-
     # OBS exposes script_path() for us, but guess what? It crashes
     # sometimes! (in particular, if you repeatedly reload the script)
     # So we'll get the path the manual way.
     defaultsPath = os.path.join(os.path.dirname(__file__), 'defaults.json')
     with open(defaultsPath, 'r', encoding='utf-8') as f:
-        defaults = json.load(f)
+        return json.load(f)
 
-    orlyStateMachine = OrlyStateMachine(defaults)
 
+def createStateMachines():
+    """
+    Create the state machines for all of the counters, if they're not
+    already created.
+    """
+    if stateMachines: return
+
+    defaults = loadDefaults()
+    counterJournal.open()
+
+    # Each counter can override any of the top-level defaults
+    for counter in defaults.get('counters') or DEFAULT_COUNTERS:
+        counterDefaults = dict(defaults)
+        counterDefaults.update(counter)
+        stateMachines[counter['id']] = OrlyStateMachine(counter['id'],
+                                                        counter['name'],
+                                                        counterDefaults)
+
+    scheduler.framerate = max(machine.framerate
+                              for machine in stateMachines.values())
 
 
 def script_description():
@@ -731,34 +4716,117 @@ def script_load(settings):
     This is run automatically when the script is loaded. It sets stuff
     up.
     """
-    createStateMachine()
-    orlyStateMachine.updateSettings(settings)
-
-    # Register hotkeys
-    for i in range(5):
-        obs.obs_hotkey_register_frontend(
-            'orly_counter_inc_' + str(i + 1),
-            'ORLY +' + str(i + 1),
-            lambda pressed, q=i: handleORLY(pressed, q + 1))
-    obs.obs_hotkey_register_frontend(
-        'orly_counter_negate',
-        'Negate next ORLY',
-        handleNegateORLY)
+    # (this has to come first, to see everything that's acquired)
+    refTracker.setEnabled(
+        obs.obs_data_get_bool(settings, PROP_ID_TRACK_REFERENCES))
+
+    sceneItemIndex.connect()
+    sourceHandles.connect()
+    sourceCatalog.connect()
+    eventHistory.connect()
+    workers.start()
+    createStateMachines()
+    eventHistory.start()
+    sourceCatalog.currentSceneOnly = obs.obs_data_get_bool(
+        settings, PROP_ID_CURRENT_SCENE_ONLY)
+    profiler.setEnabled(obs.obs_data_get_bool(settings, PROP_ID_PROFILE))
+    remoteControl.configure(
+        obs.obs_data_get_bool(settings, PROP_ID_REMOTE),
+        obs.obs_data_get_int(settings, PROP_ID_REMOTE_PORT))
+
+    for machine in stateMachines.values():
+        machine.updateSettings(settings)
+    inputRecorder.setEnabled(
+        obs.obs_data_get_bool(settings, PROP_ID_RECORD_INPUT), settings)
+
+    for machine in stateMachines.values():
+        # Register hotkeys
+        for i in range(5):
+            lifecycle.registerHotkey(
+                machine.propId('counter_inc_' + str(i + 1)),
+                machine.name + ' +' + str(i + 1),
+                lambda pressed, m=machine, q=i: handleORLY(m, pressed, q + 1),
+                settings)
+        lifecycle.registerHotkey(
+            machine.propId('counter_negate'),
+            'Negate next ' + machine.name,
+            lambda pressed, m=machine: handleNegateORLY(m, pressed),
+            settings)
+
+
+def script_save(settings):
+    """
+    Run when OBS saves the script settings. Hotkey bindings aren't saved
+    automatically for scripts, so we save them ourselves.
+    """
+    lifecycle.saveHotkeys(settings)
 
 
 def script_update(settings):
     """
     Run whenever the script settings are changed by the user.
     """
-    createStateMachine()
-    orlyStateMachine.updateSettings(settings)
+    createStateMachines()
+    settingsDebouncer.update({machine: machine.readSettings(settings)
+                              for machine in stateMachines.values()})
+    sourceCatalog.currentSceneOnly = obs.obs_data_get_bool(
+        settings, PROP_ID_CURRENT_SCENE_ONLY)
+
+    profiler.setEnabled(obs.obs_data_get_bool(settings, PROP_ID_PROFILE))
+    refTracker.setEnabled(
+        obs.obs_data_get_bool(settings, PROP_ID_TRACK_REFERENCES))
+    remoteControl.configure(
+        obs.obs_data_get_bool(settings, PROP_ID_REMOTE),
+        obs.obs_data_get_int(settings, PROP_ID_REMOTE_PORT))
+    inputRecorder.recordSettings(settings)
+    inputRecorder.setEnabled(
+        obs.obs_data_get_bool(settings, PROP_ID_RECORD_INPUT), settings)
 
 
 def script_unload():
     """
     Run when the script is about to be unloaded.
     """
-    obs.obs_hotkey_unregister(handleORLY)
+    settingsDebouncer.cancel()
+    sceneItemIndex.disconnect()
+    sourceHandles.disconnect()
+    sourceCatalog.disconnect()
+    eventHistory.disconnect()
+
+    # (remote commands go through the workers' results, which the
+    # scheduler picks up, so stop them in this order)
+    remoteControl.stop()
+    workers.stop()
+    inputRecorder.stop()
+    scheduler.stop()
+    eventHistory.close()
+    counterJournal.close()
+
+    leftovers = lifecycle.releaseAll()
+    if leftovers:
+        print('ORLY: Removed %d leftover callbacks' % leftovers)
+
+    print('ORLY: ' + sourceWriter.describeStats())
+    print('ORLY: %d animation frames were skipped to keep up'
+          % sum(machine.framesSkipped for machine in stateMachines.values()))
+    schedulerStats = scheduler.describeStats()
+    if schedulerStats is not None:
+        print('ORLY: ' + schedulerStats)
+    sfxStats = soundEffects.describeStats()
+    if sfxStats is not None:
+        print('ORLY: ' + sfxStats)
+    remoteStats = remoteControl.describeStats()
+    if remoteStats is not None:
+        print('ORLY: ' + remoteStats)
+
+    if refTracker.enabled:
+        outstanding = refTracker.report()
+        if outstanding:
+            print('ORLY: OBS references that were never released:')
+            for count, kind, site in outstanding:
+                print('    %d %s from %s' % (count, kind, site))
+        else:
+            print('ORLY: All OBS references were released')
 
 
 def script_properties():
@@ -767,183 +4835,336 @@ def script_properties():
     Code for letting the user choose a video source is from
     https://github.com/burkdan/OBS-Google-Events/blob/master/google_calendar_event.py
     """
+    createStateMachines()
+
     # Create the properties object
     props = obs.obs_properties_create()
 
+    # With more than one counter, each one gets its own group
+    if len(stateMachines) == 1:
+        for machine in stateMachines.values():
+            addCounterProperties(props, machine)
+    else:
+        for machine in stateMachines.values():
+            counterProps = obs.obs_properties_create()
+            addCounterProperties(counterProps, machine)
+            obs.obs_properties_add_group(
+                props,
+                machine.propId(PROP_ID_GROUP),
+                PROP_NAME_GROUP % machine.name,
+                obs.OBS_GROUP_NORMAL,
+                counterProps)
+
+    currentSceneOnlyProp = obs.obs_properties_add_bool(
+        props,
+        PROP_ID_CURRENT_SCENE_ONLY,
+        PROP_NAME_CURRENT_SCENE_ONLY)
+    obs.obs_property_set_modified_callback(currentSceneOnlyProp,
+                                           handleCurrentSceneOnly)
+    fillSourceLists(props)
+
+    obs.obs_properties_add_button(props,
+                                  PROP_ID_STATS_BUTTON,
+                                  PROP_NAME_STATS_BUTTON,
+                                  handleSessionStats)
+    obs.obs_properties_add_bool(props, PROP_ID_PROFILE, PROP_NAME_PROFILE)
+    obs.obs_properties_add_button(props,
+                                  PROP_ID_PROFILE_BUTTON,
+                                  PROP_NAME_PROFILE_BUTTON,
+                                  handleProfileReport)
+    obs.obs_properties_add_bool(props, PROP_ID_REMOTE, PROP_NAME_REMOTE)
+    obs.obs_properties_add_int(props,
+                               PROP_ID_REMOTE_PORT,
+                               PROP_NAME_REMOTE_PORT,
+                               1024, 65535, 1)
+    obs.obs_properties_add_bool(props,
+                                PROP_ID_RECORD_INPUT,
+                                PROP_NAME_RECORD_INPUT)
+    obs.obs_properties_add_bool(props,
+                                PROP_ID_TRACK_REFERENCES,
+                                PROP_NAME_TRACK_REFERENCES)
+
+    return props
+
+
+def addCounterProperties(props, machine):
+    """
+    Add the properties for one counter to an obs_properties_t. (The
+    source lists are filled in by fillSourceLists().)
+    """
     # Make properties for the sources that will be used for the
     # animations
-    sourceOwlProp = obs.obs_properties_add_list(
+    obs.obs_properties_add_list(
         props, 
-        PROP_ID_OWL_SOURCE,
+        machine.propId(PROP_ID_OWL_SOURCE),
         PROP_NAME_OWL_SOURCE,
         obs.OBS_COMBO_TYPE_EDITABLE,
         obs.OBS_COMBO_FORMAT_STRING)
-    sourceLabelProp = obs.obs_properties_add_list(
+    obs.obs_properties_add_list(
         props, 
-        PROP_ID_LABEL_SOURCE,
+        machine.propId(PROP_ID_LABEL_SOURCE),
         PROP_NAME_LABEL_SOURCE,
         obs.OBS_COMBO_TYPE_EDITABLE,
         obs.OBS_COMBO_FORMAT_STRING)
-    sourceNumProp = obs.obs_properties_add_list(
+    obs.obs_properties_add_list(
         props, 
-        PROP_ID_COUNTER_SOURCE,
+        machine.propId(PROP_ID_COUNTER_SOURCE),
         PROP_NAME_COUNTER_SOURCE,
         obs.OBS_COMBO_TYPE_EDITABLE,
         obs.OBS_COMBO_FORMAT_STRING)
     # ...and sound effects
-    sourceDing1Prop = obs.obs_properties_add_list(
+    obs.obs_properties_add_list(
         props, 
-        PROP_ID_DING1_SOURCE,
+        machine.propId(PROP_ID_DING1_SOURCE),
         PROP_NAME_DING1_SOURCE,
         obs.OBS_COMBO_TYPE_EDITABLE,
         obs.OBS_COMBO_FORMAT_STRING)
-    sourceDing10Prop = obs.obs_properties_add_list(
+    obs.obs_properties_add_list(
         props, 
-        PROP_ID_DING10_SOURCE,
+        machine.propId(PROP_ID_DING10_SOURCE),
         PROP_NAME_DING10_SOURCE,
         obs.OBS_COMBO_TYPE_EDITABLE,
         obs.OBS_COMBO_FORMAT_STRING)
-    sourceDing50Prop = obs.obs_properties_add_list(
+    obs.obs_properties_add_list(
         props, 
-        PROP_ID_DING50_SOURCE,
+        machine.propId(PROP_ID_DING50_SOURCE),
         PROP_NAME_DING50_SOURCE,
         obs.OBS_COMBO_TYPE_EDITABLE,
         obs.OBS_COMBO_FORMAT_STRING)
-
-    # Add source names to the source property boxes
-    with enumSources() as sources:
-        for source in sources:
-            sourceId = obs.obs_source_get_id(source)
-
-            if sourceId in ['text_gdiplus', 'text_ft2_source']:
-                name = obs.obs_source_get_name(source)
-
-                obs.obs_property_list_add_string(sourceLabelProp,
-                                                 name, name)
-                obs.obs_property_list_add_string(sourceNumProp,
-                                                 name, name)
-
-            elif sourceId == 'image_source':
-                name = obs.obs_source_get_name(source)
-
-                obs.obs_property_list_add_string(sourceOwlProp, name, name)
-
-            elif sourceId == 'ffmpeg_source':
-                name = obs.obs_source_get_name(source)
-
-                obs.obs_property_list_add_string(sourceDing1Prop, name, name)
-                obs.obs_property_list_add_string(sourceDing10Prop, name, name)
-                obs.obs_property_list_add_string(sourceDing50Prop, name, name)
+    # ...and, optionally, the group to fade the label and counter with
+    obs.obs_properties_add_list(
+        props,
+        machine.propId(PROP_ID_OVERLAY_SOURCE),
+        PROP_NAME_OVERLAY_SOURCE,
+        obs.OBS_COMBO_TYPE_EDITABLE,
+        obs.OBS_COMBO_FORMAT_STRING)
 
     # Make properties for the owl position
     obs.obs_properties_add_float(
         props,
-        PROP_ID_OWL_X_POS,
+        machine.propId(PROP_ID_OWL_X_POS),
         PROP_NAME_OWL_X_POS,
         -9999, 9999, 1) # min, max, step
     obs.obs_properties_add_float(
         props,
-        PROP_ID_OWL_Y_POS,
+        machine.propId(PROP_ID_OWL_Y_POS),
         PROP_NAME_OWL_Y_POS,
         -9999, 9999, 1) # min, max, step
     obs.obs_properties_add_float(
         props,
-        PROP_ID_OWL_X_DISTANCE,
+        machine.propId(PROP_ID_OWL_X_DISTANCE),
         PROP_NAME_OWL_X_DISTANCE,
         -9999, 9999, 1) # min, max, step
     obs.obs_properties_add_float(
         props,
-        PROP_ID_OWL_Y_DISTANCE,
+        machine.propId(PROP_ID_OWL_Y_DISTANCE),
         PROP_NAME_OWL_Y_DISTANCE,
         -9999, 9999, 1) # min, max, step
 
+    # ...and how it moves
+    for propId, propName in [
+            (PROP_ID_OWL_APPEAR_EASING, PROP_NAME_OWL_APPEAR_EASING),
+            (PROP_ID_OWL_DISAPPEAR_EASING, PROP_NAME_OWL_DISAPPEAR_EASING)]:
+        easingProp = obs.obs_properties_add_list(
+            props,
+            machine.propId(propId),
+            propName,
+            obs.OBS_COMBO_TYPE_LIST,
+            obs.OBS_COMBO_FORMAT_STRING)
+        for name in EASING_CURVES:
+            obs.obs_property_list_add_string(easingProp, name, name)
+
     # Create button "properties" to allow quick setup
     obs.obs_properties_add_button(
         props,
-        PROP_ID_HIDE_BUTTON,
+        machine.propId(PROP_ID_HIDE_BUTTON),
         PROP_NAME_HIDE_BUTTON,
-        handleHideAll)
+        lambda props, prop, m=machine: handleHideAll(m, props, prop))
     obs.obs_properties_add_button(
         props,
-        PROP_ID_RESTORE_BUTTON,
+        machine.propId(PROP_ID_RESTORE_BUTTON),
         PROP_NAME_RESTORE_BUTTON,
-        handleRestoreAll)
-
-    return props
+        lambda props, prop, m=machine: handleRestoreAll(m, props, prop))
+    obs.obs_properties_add_button(
+        props,
+        machine.propId(PROP_ID_READ_TEXTBOX_BUTTON),
+        PROP_NAME_READ_TEXTBOX_BUTTON,
+        lambda props, prop, m=machine: handleReadTextbox(m, props, prop))
 
 
-def script_defaults(settings):
+def fillSourceLists(props):
     """
-    Set default script setting values.
+    Fill (or refill) the source property boxes of every counter with
+    the names of the sources from the catalog.
     """
-    createStateMachine()
-    obs.obs_data_set_double(settings,
-        PROP_ID_OWL_X_POS,
-        orlyStateMachine.owlBaseX)
-    obs.obs_data_set_double(settings,
-        PROP_ID_OWL_Y_POS,
-        orlyStateMachine.owlBaseY)
-    obs.obs_data_set_double(settings,
-        PROP_ID_OWL_X_DISTANCE,
-        orlyStateMachine.owlXDistance)
-    obs.obs_data_set_double(settings,
-        PROP_ID_OWL_Y_DISTANCE,
-        orlyStateMachine.owlYDistance)
+    namesByKind = {}
+    for machine in stateMachines.values():
+        for propId, kind in SOURCE_PROP_KINDS:
+            prop = obs.obs_properties_get(props, machine.propId(propId))
+            if prop is None: continue
 
+            # In digit sprite mode, the counter is a group of images
+            if (propId == PROP_ID_COUNTER_SOURCE
+                    and machine.digitSprites is not None):
+                kind = 'group'
 
-def tick():
-    """
-    Called once per frame during the ORLY animation.
-    """
-    global existingTimer
-    if not orlyStateMachine.tick():
-        obs.remove_current_callback()
-        existingTimer = False
+            if kind not in namesByKind:
+                namesByKind[kind] = sourceCatalog.sourceNames(kind)
+            obs.obs_property_list_clear(prop)
+            for name in namesByKind[kind]:
+                obs.obs_property_list_add_string(prop, name, name)
 
 
-def handleNegateORLY(pressed):
+def script_defaults(settings):
+    """
+    Set default script setting values.
+    """
+    createStateMachines()
+    for machine in stateMachines.values():
+        obs.obs_data_set_double(settings,
+            machine.propId(PROP_ID_OWL_X_POS),
+            machine.owlBaseX)
+        obs.obs_data_set_double(settings,
+            machine.propId(PROP_ID_OWL_Y_POS),
+            machine.owlBaseY)
+        obs.obs_data_set_double(settings,
+            machine.propId(PROP_ID_OWL_X_DISTANCE),
+            machine.owlXDistance)
+        obs.obs_data_set_double(settings,
+            machine.propId(PROP_ID_OWL_Y_DISTANCE),
+            machine.owlYDistance)
+        obs.obs_data_set_default_string(settings,
+            machine.propId(PROP_ID_OWL_APPEAR_EASING),
+            machine.owlAppearEasing)
+        obs.obs_data_set_default_string(settings,
+            machine.propId(PROP_ID_OWL_DISAPPEAR_EASING),
+            machine.owlDisappearEasing)
+    obs.obs_data_set_default_int(settings,
+                                 PROP_ID_REMOTE_PORT,
+                                 REMOTE_DEFAULT_PORT)
+
+
+def handleNegateORLY(machine, pressed):
     """
     Called when the user presses or releases the "Negate next ORLY"
-    hotkey.
+    hotkey for a counter.
     """
     if not pressed: return
 
-    orlyStateMachine.negatePressedAt = time.time()
+    inputRecorder.record(machine, 'negate')
+    machine.negatePressedAt = time.time()
 
 
-existingTimer = False
-def handleORLY(pressed, amount):
+def handleORLY(machine, pressed, amount):
     """
-    Called when the user presses or releases a hotkey to increment the
-    counter.
+    Called when the user presses or releases a hotkey to increment a
+    counter. The increment is queued, and merged with any others that
+    arrive before the next frame; if an animation is already playing,
+    it's extended instead of starting over.
     """
     if not pressed: return
 
-    global existingTimer
-    if existingTimer:
-        obs.timer_remove(tick)
-
-    timeElapsed = time.time() - orlyStateMachine.negatePressedAt
-    if timeElapsed <= orlyStateMachine.negationTimeout:
+    inputRecorder.record(machine, 'press', amount)
+    timeElapsed = time.time() - machine.negatePressedAt
+    if timeElapsed <= machine.negationTimeout:
         amount = -amount
-        orlyStateMachine.negatePressedAt = 0
-    orlyStateMachine.increment(amount)
-
-    obs.timer_add(tick, int(1000 / orlyStateMachine.framerate))
-    existingTimer = True
+        machine.negatePressedAt = 0
+        machine.queueIncrement(amount, negated=True)
+    else:
+        machine.queueIncrement(amount)
 
 
-def handleHideAll(props=None, prop=None, *args, **kwargs):
+def handleHideAll(machine, props=None, prop=None, *args, **kwargs):
     """
     Handler for the "hide all" button. All functionality is delegated
     to the state machine.
     """
-    orlyStateMachine.hideAll()
+    inputRecorder.record(machine, 'hide')
+    machine.hideAll()
 
 
-def handleRestoreAll(props=None, prop=None, *args, **kwargs):
+def handleRestoreAll(machine, props=None, prop=None, *args, **kwargs):
     """
     Handler for the "restore all" button. All functionality is delegated
     to the state machine.
     """
-    orlyStateMachine.restoreAll()
+    inputRecorder.record(machine, 'restore')
+    machine.restoreAll()
+
+
+def handleReadTextbox(machine, props=None, prop=None, *args, **kwargs):
+    """
+    Handler for the "use number in textbox" button. All functionality is
+    delegated to the state machine.
+    """
+    machine.useTextboxValue()
+    inputRecorder.record(machine, 'set', machine.value)
+
+
+def handleSessionStats(props=None, prop=None, *args, **kwargs):
+    """
+    Handler for the "show session stats" button. Prints a summary of
+    this session's counter changes to the script log. (Changes from the
+    last few seconds may not have been written to the history yet.)
+    """
+    try:
+        summary = eventHistory.sessionSummary()
+    except sqlite3.Error as e:
+        print('ERROR: Couldn\'t read the ORLY history: %s' % e)
+        return
+
+    if not summary:
+        print('ORLY: No changes have been recorded this session yet')
+    for counterId, stats in summary.items():
+        machine = stateMachines.get(counterId)
+        name = machine.name if machine is not None else counterId
+        print('ORLY: %s: %+d in %d changes (%.1f per hour)'
+              % (name, stats['total'], stats['changes'], stats['perHour']))
+        for hour, total in stats['byHour'].items():
+            print('ORLY:   hour %d: %+d' % (hour + 1, total))
+
+
+def handleProfileReport(props=None, prop=None, *args, **kwargs):
+    """
+    Handler for the "show profiling results" button. Prints a summary to
+    the script log, and dumps the full results to a JSON file.
+    """
+    report = profiler.report(1 / scheduler.framerate)
+    report['sfxLatency'] = soundEffects.report()
+    report['timer'] = scheduler.report()
+
+    path = os.path.join(os.path.dirname(__file__), PROFILE_FILENAME)
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4)
+    except OSError as e:
+        print('ERROR: Couldn\'t write the profiling results: %s' % e)
+
+    tick = report['tick']
+    print('ORLY: %d frames profiled; tick p50 %.3f ms, p99 %.3f ms, '
+          'max %.3f ms; %d over the %.1f ms frame interval'
+          % (report['frames'], tick['p50Ms'], tick['p99Ms'], tick['maxMs'],
+             tick['overruns'], report['frameIntervalMs']))
+    for name, calls in report['calls'].items():
+        print('ORLY:   %s: %d calls (up to %d per frame), mean %.3f ms, '
+              'max %.3f ms'
+              % (name, calls['count'], calls['perFrameMax'],
+                 calls['meanMs'], calls['maxMs']))
+    schedulerStats = scheduler.describeStats()
+    if schedulerStats is not None:
+        print('ORLY: ' + schedulerStats)
+    sfxStats = soundEffects.describeStats()
+    if sfxStats is not None:
+        print('ORLY: ' + sfxStats)
+    print('ORLY: Full results written to ' + path)
+
+
+def handleCurrentSceneOnly(props, prop, settings):
+    """
+    Called when the "only list sources in the current scene" checkbox is
+    changed. Refills the source property boxes.
+    """
+    sourceCatalog.currentSceneOnly = obs.obs_data_get_bool(
+        settings, PROP_ID_CURRENT_SCENE_ONLY)
+    fillSourceLists(props)
+    return True
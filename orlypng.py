@@ -0,0 +1,135 @@
+# ORLY?! Counter plugin for OBS Studio -- PNG reading and writing
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Just enough of PNG for orly.py to color the digit atlas (see
+# SpriteAtlasCache there), without needing anything that doesn't come
+# with Python. It's slow, so orly.py only uses it on worker threads.
+
+import struct
+import zlib
+
+
+def readPng(path):
+    """
+    Read an 8-bit, non-interlaced PNG file. Return (width, height,
+    pixels), where pixels is a bytearray of RGBA rows.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:8] != b'\x89PNG\r\n\x1a\n':
+        raise ValueError('%s isn\'t a PNG file' % path)
+
+    pos = 8
+    header = None
+    compressed = []
+    while pos < len(data):
+        length, chunkType = struct.unpack('>I4s', data[pos:pos + 8])
+        chunk = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if chunkType == b'IHDR':
+            header = struct.unpack('>IIBBBBB', chunk)
+        elif chunkType == b'IDAT':
+            compressed.append(chunk)
+        elif chunkType == b'IEND':
+            break
+
+    width, height, depth, colorType, _, _, interlace = header
+    channels = {0: 1, 2: 3, 4: 2, 6: 4}.get(colorType)
+    if depth != 8 or channels is None or interlace:
+        raise ValueError('%s has to be an 8-bit RGBA, RGB or grayscale PNG'
+                         ' without interlacing' % path)
+
+    raw = zlib.decompress(b''.join(compressed))
+    stride = width * channels
+    rows = []
+    previous = bytearray(stride)
+    for y in range(height):
+        start = y * (stride + 1)
+        filterType = raw[start]
+        row = bytearray(raw[start + 1:start + 1 + stride])
+        unfilterPngRow(row, previous, filterType, channels)
+        rows.append(row)
+        previous = row
+
+    # Convert to RGBA
+    pixels = bytearray(width * height * 4)
+    for y, row in enumerate(rows):
+        out = memoryview(pixels)[y * width * 4:(y + 1) * width * 4]
+        if channels == 4:
+            out[:] = row
+        elif channels == 3:
+            out[0::4], out[1::4], out[2::4] = row[0::3], row[1::3], row[2::3]
+            out[3::4] = b'\xff' * width
+        elif channels == 2:
+            out[0::4] = out[1::4] = out[2::4] = row[0::2]
+            out[3::4] = row[1::2]
+        else:
+            out[0::4] = out[1::4] = out[2::4] = row
+            out[3::4] = b'\xff' * width
+    return width, height, pixels
+
+
+def unfilterPngRow(row, previous, filterType, channels):
+    """
+    Undo the PNG filter of one row, in place.
+    """
+    if filterType == 0:
+        return
+    elif filterType == 1:
+        for i in range(channels, len(row)):
+            row[i] = (row[i] + row[i - channels]) & 0xFF
+    elif filterType == 2:
+        for i in range(len(row)):
+            row[i] = (row[i] + previous[i]) & 0xFF
+    elif filterType == 3:
+        for i in range(len(row)):
+            left = row[i - channels] if i >= channels else 0
+            row[i] = (row[i] + ((left + previous[i]) >> 1)) & 0xFF
+    elif filterType == 4:
+        for i in range(len(row)):
+            a = row[i - channels] if i >= channels else 0
+            b = previous[i]
+            c = previous[i - channels] if i >= channels else 0
+            p = a + b - c
+            pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+            if pa <= pb and pa <= pc:
+                predictor = a
+            elif pb <= pc:
+                predictor = b
+            else:
+                predictor = c
+            row[i] = (row[i] + predictor) & 0xFF
+    else:
+        raise ValueError('Unknown PNG filter type %d' % filterType)
+
+
+def writePng(path, width, height, pixels):
+    """
+    Write RGBA pixels (as returned by readPng()) to a PNG file.
+    """
+    stride = width * 4
+    raw = b''.join(b'\x00' + bytes(pixels[y * stride:(y + 1) * stride])
+                   for y in range(height))
+
+    def chunk(chunkType, data):
+        return (struct.pack('>I', len(data)) + chunkType + data
+                + struct.pack('>I', zlib.crc32(chunkType + data)))
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n'
+                + chunk(b'IHDR', struct.pack('>IIBBBBB',
+                                             width, height, 8, 6, 0, 0, 0))
+                + chunk(b'IDAT', zlib.compress(raw, 9))
+                + chunk(b'IEND', b''))
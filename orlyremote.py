@@ -0,0 +1,363 @@
+# ORLY?! Counter plugin for OBS Studio -- remote control server
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# This doesn't import obspython, so that it can be run and tested
+# without OBS. orly.py uses it if remote control is turned on; it can
+# also be run by itself to send a command:
+#
+#     python orlyremote.py +1
+#     python orlyremote.py negate
+#     python orlyremote.py set 123 --counter deaths
+
+import asyncio
+import collections
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+DEFAULT_PORT = 4460
+REQUEST_TIMEOUT = 5 # seconds to wait for a client to send its request
+REPLY_TIMEOUT = 1 # seconds to wait for the first frame before replying
+STOP_TIMEOUT = 2
+MAX_REQUEST_SIZE = 8192
+# Largest amount that can be added at once, and largest value that can
+# be set
+MAX_AMOUNT = 9999
+MAX_VALUE = 999999999
+
+# action -> whether it takes a number
+ACTIONS = {
+    'increment': True,
+    'negate': False,
+    'hide': False,
+    'restore': False,
+    'set': True,
+}
+
+HTTP_REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    403: 'Forbidden',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+
+# `counter` is None for the first counter; `amount` is None for actions
+# that don't take a number
+Command = collections.namedtuple('Command', 'action amount counter')
+
+
+class CommandError(Exception):
+    """
+    A command that can't be carried out. `status` is the HTTP status
+    code to reply with.
+    """
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def parseCommand(target):
+    """
+    Parse an HTTP request target into a Command. The accepted forms
+    are:
+
+        /+N, /-N or /increment/N
+        /negate
+        /hide
+        /restore
+        /set/N
+
+    each optionally followed by ?counter=<counter id>.
+    """
+    url = urllib.parse.urlsplit(target)
+    query = urllib.parse.parse_qs(url.query)
+    counter = query.get('counter', [None])[-1]
+
+    parts = [urllib.parse.unquote(part)
+             for part in url.path.split('/') if part]
+    if len(parts) == 1 and parts[0][:1] in '+-' and len(parts[0]) > 1:
+        parts = ['increment', parts[0]]
+    if not parts or parts[0] not in ACTIONS:
+        raise CommandError('Unknown command: %s' % url.path, 404)
+
+    action = parts[0]
+    if not ACTIONS[action]:
+        if len(parts) != 1:
+            raise CommandError('"%s" doesn\'t take a number' % action)
+        return Command(action, None, counter)
+
+    if len(parts) != 2:
+        raise CommandError('"%s" needs a number' % action)
+    try:
+        amount = int(parts[1])
+    except ValueError:
+        raise CommandError('Not a number: %s' % parts[1])
+    if action == 'increment' and amount == 0:
+        raise CommandError('Can\'t add 0')
+    limit = MAX_AMOUNT if action == 'increment' else MAX_VALUE
+    if abs(amount) > limit:
+        raise CommandError('Too large: %s (the limit is %d)'
+                           % (parts[1], limit))
+    return Command(action, amount, counter)
+
+
+def parseHeaders(head):
+    """
+    Return the request line and a dict of {lowercase name: value} for
+    the headers of an HTTP request head.
+    """
+    lines = head.decode('latin-1').split('\r\n')
+    headers = {}
+    for line in lines[1:]:
+        name, colon, value = line.partition(':')
+        if colon:
+            headers[name.strip().lower()] = value.strip()
+    return lines[0], headers
+
+
+def checkRequestSource(headers, port):
+    """
+    Raise CommandError unless a request looks like it came straight
+    from a program on this computer.
+
+    Web browsers send an Origin header with every POST request, so
+    refusing those stops web pages (including browser sources in OBS)
+    from sending commands on their own. Checking the Host header stops
+    pages that get a name of theirs to resolve to 127.0.0.1.
+    """
+    if 'origin' in headers or 'sec-fetch-site' in headers:
+        raise CommandError('Requests from web pages aren\'t accepted', 403)
+
+    host = headers.get('host')
+    if host is not None and host not in ('127.0.0.1:%d' % port,
+                                         'localhost:%d' % port):
+        raise CommandError('Unexpected host: %s' % host, 403)
+
+
+class RemoteServer():
+    """
+    A small HTTP server on localhost, running an asyncio event loop on
+    its own thread, that turns requests into Commands.
+
+    For each command, handler(command, receivedAt) is called on the
+    server thread, with receivedAt as a time.monotonic() time. It has to
+    return quickly, with a concurrent.futures.Future that's given a
+    result once the command has taken effect: the latency (in seconds)
+    until the first frame showing it, or None if it doesn't show
+    anything. Raising CommandError rejects the command.
+    """
+    def __init__(self, handler, port=DEFAULT_PORT, host='127.0.0.1'):
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.loop = None
+        self.thread = None
+        self.server = None
+
+
+    def start(self):
+        """
+        Start the server thread, and wait until it's listening. Raises
+        OSError if the port can't be used.
+        """
+        if self.thread is not None: return
+
+        ready = threading.Event()
+        failure = []
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.run,
+                                       args=(ready, failure),
+                                       name='ORLY remote control',
+                                       daemon=True)
+        self.thread.start()
+        ready.wait()
+
+        if failure:
+            self.thread.join(STOP_TIMEOUT)
+            self.thread = self.loop = None
+            raise failure[0]
+
+
+    def stop(self):
+        """
+        Stop the server and wait for its thread to finish.
+        """
+        if self.thread is None: return
+        thread, self.thread = self.thread, None
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        thread.join(STOP_TIMEOUT)
+
+
+    @property
+    def running(self):
+        return self.thread is not None
+
+
+    def run(self, ready, failure):
+        """
+        Body of the server thread.
+        """
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self.handleConnection,
+                                     self.host, self.port))
+        except OSError as e:
+            failure.append(e)
+            ready.set()
+            self.loop.close()
+            return
+
+        # (in case port 0 was used to pick any free one)
+        self.port = self.server.sockets[0].getsockname()[1]
+        ready.set()
+
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            self.loop.run_until_complete(self.server.wait_closed())
+            for task in asyncio.all_tasks(self.loop):
+                task.cancel()
+            self.loop.run_until_complete(asyncio.sleep(0))
+            self.loop.close()
+
+
+    async def handleConnection(self, reader, writer):
+        """
+        Serve one HTTP request.
+        """
+        try:
+            status, reply = await self.handleRequest(reader)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError,
+                asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+
+        body = json.dumps(reply).encode('utf-8')
+        writer.write(('HTTP/1.1 %d %s\r\n'
+                      'Content-Type: application/json\r\n'
+                      'Content-Length: %d\r\n'
+                      'Connection: close\r\n'
+                      '\r\n' % (status, HTTP_REASONS[status], len(body))
+                      ).encode('latin-1') + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+
+    async def handleRequest(self, reader):
+        """
+        Read a request and carry out its command. Return the HTTP status
+        code and the (JSON-able) reply.
+        """
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'),
+                                      REQUEST_TIMEOUT)
+        receivedAt = time.monotonic()
+        if len(head) > MAX_REQUEST_SIZE:
+            return 400, {'ok': False, 'error': 'Request too large'}
+
+        requestLine, headers = parseHeaders(head)
+        try:
+            method, target, version = requestLine.split(' ')
+        except ValueError:
+            return 400, {'ok': False, 'error': 'Bad request line'}
+
+        # (not GET, since any web page can make a browser send one)
+        if method != 'POST':
+            return 405, {'ok': False, 'error': 'Use POST'}
+
+        try:
+            checkRequestSource(headers, self.port)
+            command = parseCommand(target)
+            done = self.handler(command, receivedAt)
+        except CommandError as e:
+            return e.status, {'ok': False, 'error': str(e)}
+
+        try:
+            latency = await asyncio.wait_for(asyncio.wrap_future(done),
+                                             REPLY_TIMEOUT)
+        except asyncio.TimeoutError:
+            # It's still queued; it'll happen when OBS gets to it
+            return 200, {'ok': True, 'latency_ms': None}
+        except CommandError as e:
+            return e.status, {'ok': False, 'error': str(e)}
+        except Exception as e:
+            return 500, {'ok': False, 'error': repr(e)}
+
+        if latency is not None:
+            latency = round(latency * 1000, 2)
+        return 200, {'ok': True, 'latency_ms': latency}
+
+
+def sendCommand(command, port=DEFAULT_PORT, host='127.0.0.1'):
+    """
+    Send a command (a request target such as '/+1') to a running
+    server, and return its reply.
+    """
+    url = 'http://%s:%d%s' % (host, port, command)
+    request = urllib.request.Request(url, method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=REPLY_TIMEOUT + 1) as f:
+            return json.load(f)
+    except urllib.error.HTTPError as e:
+        with e:
+            return json.load(e)
+
+
+def main(args):
+    """
+    Send the command given on the command line.
+    """
+    port = DEFAULT_PORT
+    counter = None
+    words = []
+    args = list(args)
+    while args:
+        arg = args.pop(0)
+        if arg == '--port':
+            port = int(args.pop(0))
+        elif arg == '--counter':
+            counter = args.pop(0)
+        else:
+            words.append(arg)
+
+    if not words:
+        print('Usage: orlyremote.py (+N | -N | negate | hide | restore |'
+              ' set N) [--counter ID] [--port PORT]')
+        return 2
+
+    target = '/' + '/'.join(urllib.parse.quote(word) for word in words)
+    if counter is not None:
+        target += '?' + urllib.parse.urlencode({'counter': counter})
+
+    reply = sendCommand(target, port)
+    print(json.dumps(reply))
+    return 0 if reply.get('ok') else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
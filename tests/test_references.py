@@ -0,0 +1,251 @@
+# ORLY?! Counter plugin for OBS Studio -- reference tracking tests
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Checks, against the stand-in obspython module in tools/fakeobs, that
+# the script releases every OBS reference it acquires (even when
+# something goes wrong while it's holding one), and that leaks are
+# reported when the script is unloaded:
+#
+#     python -m unittest discover tests
+
+import contextlib
+import io
+import os.path
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, 'tools', 'fakeobs'))
+sys.path.insert(0, REPO_DIR)
+
+import obspython as obs
+import orly
+
+
+class Failure(Exception):
+    pass
+
+
+class ReferenceTestCase(unittest.TestCase):
+    """
+    Sets up a scene with the usual sources, with reference tracking
+    turned on.
+    """
+    def setUp(self):
+        obs.reset()
+        self.scene = obs.addScene('Scene')
+        self.owl = obs.addSource('Owl', 'image_source')
+        self.label = obs.addSource('Label', 'text_gdiplus')
+        self.counter = obs.addSource('Counter', 'text_gdiplus',
+                                     {'text': '12'})
+        for source in (self.owl, self.label, self.counter):
+            obs.addFilter(source, orly.OPACITY_FILTER_NAME, 'mask_filter')
+            obs.addItem(self.scene, source)
+
+        orly.refTracker.setEnabled(False)
+        orly.refTracker.setEnabled(True)
+
+
+    def tearDown(self):
+        orly.refTracker.setEnabled(False)
+
+
+    def assertAllReleased(self):
+        """
+        Check that nothing is holding a reference, as far as both the
+        tracker and the stand-in OBS can tell.
+        """
+        self.assertEqual(orly.refTracker.report(), [])
+        self.assertEqual(obs.outstandingReferences(), [])
+
+
+class WrapperTests(ReferenceTestCase):
+    """
+    Each context manager releases its reference when the code using it
+    raises an exception.
+    """
+    def checkReleasedOnError(self, makeWrapper):
+        with self.assertRaises(Failure):
+            with makeWrapper() as obj:
+                self.assertIsNotNone(obj)
+                self.assertNotEqual(orly.refTracker.report(), [])
+                raise Failure
+        self.assertAllReleased()
+
+
+    def testGetSourceByName(self):
+        self.checkReleasedOnError(lambda: orly.getSourceByName('Owl'))
+
+
+    def testSourceGetFilterByName(self):
+        self.checkReleasedOnError(lambda: orly.sourceGetFilterByName(
+            self.owl, orly.OPACITY_FILTER_NAME))
+
+
+    def testFrontendGetCurrentScene(self):
+        self.checkReleasedOnError(orly.frontendGetCurrentScene)
+
+
+    def testFrontendGetScenes(self):
+        self.checkReleasedOnError(orly.frontendGetScenes)
+
+
+    def testGetSourceSettings(self):
+        self.checkReleasedOnError(
+            lambda: orly.getSourceSettings(self.counter))
+
+
+    def testCreateObsData(self):
+        self.checkReleasedOnError(orly.createObsData)
+
+
+    def testEnumSources(self):
+        self.checkReleasedOnError(orly.enumSources)
+
+
+    def testSceneEnumItems(self):
+        self.checkReleasedOnError(
+            lambda: orly.sceneEnumItems(self.scene.scene))
+
+
+    def testMissingSource(self):
+        with orly.getSourceByName('Nothing') as source:
+            self.assertIsNone(source)
+        self.assertAllReleased()
+
+
+class SceneItemIndexTests(ReferenceTestCase):
+    """
+    The scene item index finds items in groups, keeps up with changes
+    to them, and gives back its references when invalidated.
+    """
+    def setUp(self):
+        super().setUp()
+        self.group = obs.addGroup('Digits')
+        obs.addItem(self.scene, self.group)
+        obs.addItem(self.group, obs.addSource('Digit 1', 'image_source'))
+
+
+    def itemNames(self, sourceName):
+        items = orly.sceneItemIndex.itemsForSource(sourceName)
+        try:
+            return [obs.obs_source_get_name(obs.obs_sceneitem_get_source(
+                item)) for item in items]
+        finally:
+            orly.sceneItemIndex.releaseItems(items)
+
+
+    def testGroupItems(self):
+        self.assertEqual(self.itemNames('Digit 1'), ['Digit 1'])
+
+        obs.addItem(self.group, obs.addSource('Digit 2', 'image_source'))
+        self.assertEqual(self.itemNames('Digit 2'), ['Digit 2'])
+
+        orly.sceneItemIndex.invalidate()
+        self.assertAllReleased()
+
+
+    def testItemRemovedWhileHeld(self):
+        items = orly.sceneItemIndex.itemsForSource('Digit 1')
+        obs.removeItem(items[0])
+        self.assertEqual(self.itemNames('Digit 1'), [])
+
+        # (the reader's own reference keeps it alive until it's done)
+        self.assertEqual([(obj.source.name, count) for obj, count
+                          in obs.outstandingReferences()
+                          if isinstance(obj, obs.SceneItem)
+                          and obj.source.name == 'Digit 1'],
+                         [('Digit 1', 1)])
+        orly.sceneItemIndex.releaseItems(items)
+        orly.sceneItemIndex.invalidate()
+        self.assertAllReleased()
+
+
+    def testGroupInTwoScenes(self):
+        obs.addItem(obs.addScene('Other Scene'), self.group)
+        self.assertEqual(self.itemNames('Digit 1'), ['Digit 1'])
+        orly.sceneItemIndex.invalidate()
+        self.assertAllReleased()
+
+
+class UnloadTests(ReferenceTestCase):
+    """
+    Loading and unloading the whole script.
+    """
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        orly.counterJournal.path = os.path.join(self.directory.name,
+                                                'journal')
+        orly.eventHistory.path = os.path.join(self.directory.name,
+                                              'history')
+
+        self.settings = obs.obs_data_create()
+        orly.script_defaults(self.settings)
+        self.settings.update({'orly_owl': 'Owl',
+                              'orly_label': 'Label',
+                              'orly_counter': 'Counter',
+                              orly.PROP_ID_TRACK_REFERENCES: True})
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+        super().tearDown()
+
+
+    def loadAndUnload(self, whileLoaded=None):
+        """
+        Load the script, play an increment, call whileLoaded() (if
+        given) and unload the script. Return what it printed.
+        """
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            orly.script_load(self.settings)
+            orly.script_update(self.settings)
+            obs.pressHotkey('orly_counter_inc_1')
+            for i in range(10):
+                obs.runTimers()
+            if whileLoaded is not None:
+                whileLoaded()
+            orly.script_unload()
+
+        # (the settings belong to OBS, which releases them itself)
+        obs.obs_data_release(self.settings)
+        return output.getvalue()
+
+
+    def testNoLeaks(self):
+        output = self.loadAndUnload()
+        self.assertNotIn('never released', output)
+        self.assertAllReleased()
+
+
+    def testLeakReported(self):
+        def leak():
+            source = obs.obs_get_source_by_name('Owl')
+            orly.refTracker.acquired('source', source)
+
+        output = self.loadAndUnload(leak)
+        self.assertIn('OBS references that were never released', output)
+        self.assertIn('1 source from test_references.py', output)
+        self.assertIn('(leak)', output)
+        self.assertEqual([(obj.name, count) for obj, count
+                          in obs.outstandingReferences()],
+                         [('Owl', 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
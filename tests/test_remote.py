@@ -0,0 +1,190 @@
+# ORLY?! Counter plugin for OBS Studio -- remote control tests
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Checks the remote control server in orlyremote.py with a local client,
+# without OBS: the commands it understands, and the requests it turns
+# away.
+#
+#     python -m unittest discover tests
+
+import concurrent.futures
+import http.client
+import json
+import os.path
+import sys
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import orlyremote
+from orlyremote import Command, CommandError
+
+
+class ParseCommandTests(unittest.TestCase):
+    """
+    Request targets are turned into the right Commands, and bad ones
+    are rejected.
+    """
+    def testIncrement(self):
+        self.assertEqual(orlyremote.parseCommand('/+3'),
+                         Command('increment', 3, None))
+        self.assertEqual(orlyremote.parseCommand('/-2'),
+                         Command('increment', -2, None))
+        self.assertEqual(orlyremote.parseCommand('/increment/5'),
+                         Command('increment', 5, None))
+
+
+    def testOtherActions(self):
+        self.assertEqual(orlyremote.parseCommand('/negate'),
+                         Command('negate', None, None))
+        self.assertEqual(orlyremote.parseCommand('/hide'),
+                         Command('hide', None, None))
+        self.assertEqual(orlyremote.parseCommand('/restore'),
+                         Command('restore', None, None))
+        self.assertEqual(orlyremote.parseCommand('/set/42?counter=deaths'),
+                         Command('set', 42, 'deaths'))
+
+
+    def checkRejected(self, target, status=400):
+        with self.assertRaises(CommandError) as context:
+            orlyremote.parseCommand(target)
+        self.assertEqual(context.exception.status, status)
+
+
+    def testRejected(self):
+        self.checkRejected('/', 404)
+        self.checkRejected('/jump', 404)
+        self.checkRejected('/negate/1')
+        self.checkRejected('/set')
+        self.checkRejected('/set/x')
+        self.checkRejected('/+0')
+
+
+    def testLimits(self):
+        limit = orlyremote.MAX_AMOUNT
+        self.assertEqual(orlyremote.parseCommand('/+%d' % limit).amount,
+                         limit)
+        self.assertEqual(orlyremote.parseCommand('/-%d' % limit).amount,
+                         -limit)
+        self.checkRejected('/+%d' % (limit + 1))
+        self.checkRejected('/-%d' % (limit + 1))
+        self.checkRejected('/+1000000000')
+
+        limit = orlyremote.MAX_VALUE
+        self.assertEqual(orlyremote.parseCommand('/set/%d' % limit).amount,
+                         limit)
+        self.checkRejected('/set/%d' % (limit + 1))
+
+
+class ServerTests(unittest.TestCase):
+    """
+    Requests to a running server, with a handler that carries out every
+    command straight away.
+    """
+    def setUp(self):
+        self.commands = []
+        self.server = orlyremote.RemoteServer(self.handle, port=0)
+        self.server.start()
+
+
+    def tearDown(self):
+        self.server.stop()
+
+
+    def handle(self, command, receivedAt):
+        self.commands.append(command)
+        done = concurrent.futures.Future()
+        done.set_result(0.001)
+        return done
+
+
+    def request(self, target, method='POST', headers=None):
+        """
+        Send a request, and return its status and (decoded) reply.
+        """
+        connection = http.client.HTTPConnection('127.0.0.1',
+                                                self.server.port, timeout=5)
+        try:
+            connection.request(method, target, headers=headers or {})
+            response = connection.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            connection.close()
+
+
+    def testCommand(self):
+        status, reply = self.request('/+2?counter=deaths')
+        self.assertEqual(status, 200)
+        self.assertEqual(reply, {'ok': True, 'latency_ms': 1.0})
+        self.assertEqual(self.commands, [Command('increment', 2, 'deaths')])
+
+
+    def testSendCommand(self):
+        reply = orlyremote.sendCommand('/set/7', self.server.port)
+        self.assertTrue(reply['ok'])
+        self.assertEqual(self.commands, [Command('set', 7, None)])
+
+
+    def testPostOnly(self):
+        status, reply = self.request('/+1', method='GET')
+        self.assertEqual(status, 405)
+        self.assertFalse(reply['ok'])
+        self.assertEqual(self.commands, [])
+
+
+    def testWebPagesRefused(self):
+        for headers in ({'Origin': 'https://example.com'},
+                        {'Origin': 'null'},
+                        {'Sec-Fetch-Site': 'cross-site'}):
+            status, reply = self.request('/+1', headers=headers)
+            self.assertEqual(status, 403, headers)
+        self.assertEqual(self.commands, [])
+
+
+    def testHost(self):
+        for host in ('localhost:%d' % self.server.port,
+                     '127.0.0.1:%d' % self.server.port):
+            status, reply = self.request('/+1', headers={'Host': host})
+            self.assertEqual(status, 200, host)
+
+        for host in ('evil.example:%d' % self.server.port,
+                     'localhost:%d' % (self.server.port + 1)):
+            status, reply = self.request('/+1', headers={'Host': host})
+            self.assertEqual(status, 403, host)
+        self.assertEqual(len(self.commands), 2)
+
+
+    def testTooLarge(self):
+        status, reply = self.request('/+%d' % (orlyremote.MAX_AMOUNT + 1))
+        self.assertEqual(status, 400)
+        status, reply = self.request('/set/%d' % (orlyremote.MAX_VALUE + 1))
+        self.assertEqual(status, 400)
+        self.assertEqual(self.commands, [])
+
+
+    def testHandlerError(self):
+        def reject(command, receivedAt):
+            raise CommandError('Unknown counter: nope', 404)
+        self.server.handler = reject
+
+        status, reply = self.request('/+1?counter=nope')
+        self.assertEqual(status, 404)
+        self.assertEqual(reply, {'ok': False,
+                                 'error': 'Unknown counter: nope'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+# ORLY?! Counter plugin for OBS Studio -- digit sprite tests
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Checks how the digit atlas is colored (with orlypng.py) and how the
+# digit slots are cropped to it, against the stand-in obspython module
+# in tools/fakeobs:
+#
+#     python -m unittest discover tests
+
+import os.path
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, 'tools', 'fakeobs'))
+sys.path.insert(0, REPO_DIR)
+
+import obspython as obs
+import orly
+import orlypng
+
+ATLAS_PATH = os.path.join(REPO_DIR, orly.DIGIT_ATLAS_FILENAME)
+RED = orly.rgbaToColor(255, 0, 0)
+BLUE = orly.rgbaToColor(0, 0, 255)
+
+
+def makePixels(*rgbas):
+    """
+    Return a row of RGBA pixels.
+    """
+    return bytearray(value for rgba in rgbas for value in rgba)
+
+
+class PngTests(unittest.TestCase):
+    """
+    Images come back from a PNG file the way they went in.
+    """
+    def testRoundTrip(self):
+        pixels = makePixels((255, 255, 255, 255), (0, 0, 0, 255),
+                            (12, 34, 56, 78), (0, 0, 0, 0),
+                            (1, 2, 3, 4), (250, 128, 0, 255))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'test.png')
+            orlypng.writePng(path, 3, 2, pixels)
+            self.assertEqual(orlypng.readPng(path), (3, 2, pixels))
+
+
+    def testAtlas(self):
+        width, height, pixels = orlypng.readPng(ATLAS_PATH)
+        self.assertEqual(width % len(orly.DIGIT_ATLAS_GLYPHS), 0)
+        self.assertEqual(len(pixels), width * height * 4)
+
+
+    def testNotPng(self):
+        with self.assertRaises(ValueError):
+            orlypng.readPng(os.path.join(REPO_DIR, 'ding-01.wav'))
+
+
+class TintTests(unittest.TestCase):
+    """
+    White becomes the fill color and black the outline color, with the
+    shades in between blended.
+    """
+    def setUp(self):
+        self.pixels = makePixels((255, 255, 255, 255), (0, 0, 0, 255),
+                                 (128, 128, 128, 255), (255, 255, 255, 0))
+
+
+    def testFillAndOutline(self):
+        self.assertEqual(orly.tintAtlas(self.pixels, RED, BLUE),
+                         makePixels((255, 0, 0, 255), (0, 0, 255, 255),
+                                    (128, 0, 127, 255), (255, 0, 0, 0)))
+
+
+    def testFillOnly(self):
+        self.assertEqual(orly.tintAtlas(self.pixels, RED),
+                         makePixels((255, 0, 0, 255), (255, 0, 0, 255),
+                                    (255, 0, 0, 255), (255, 0, 0, 0)))
+
+
+    def testTranslucentFill(self):
+        fill = orly.rgbaToColor(255, 0, 0, 128)
+        self.assertEqual(orly.tintAtlas(self.pixels, fill, BLUE)[3::4],
+                         bytes([128, 128, 128, 0]))
+
+
+class SpriteAtlasCacheTests(unittest.TestCase):
+    """
+    Colored copies are only handed out once they've been made.
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = orly.SpriteAtlasCache(self.directory.name)
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def testMake(self):
+        self.assertIsNone(self.cache.size(ATLAS_PATH))
+        self.assertIsNone(self.cache.path(ATLAS_PATH, RED, BLUE))
+
+        path = self.cache.make(ATLAS_PATH, RED, BLUE)
+        self.assertEqual(self.cache.path(ATLAS_PATH, RED, BLUE), path)
+        self.assertIsNone(self.cache.path(ATLAS_PATH, RED))
+        self.assertEqual(self.cache.size(ATLAS_PATH),
+                         orlypng.readPng(ATLAS_PATH)[:2])
+
+        width, height, pixels = orlypng.readPng(path)
+        original = orlypng.readPng(ATLAS_PATH)[2]
+        self.assertEqual(pixels, orly.tintAtlas(original, RED, BLUE))
+
+
+    def testMadeOnce(self):
+        path = self.cache.make(ATLAS_PATH, RED)
+        mtime = os.path.getmtime(path)
+        os.utime(path, (mtime - 100, mtime - 100))
+        self.assertEqual(orly.SpriteAtlasCache(self.directory.name)
+                         .make(ATLAS_PATH, RED), path)
+        self.assertEqual(os.path.getmtime(path), mtime - 100)
+
+
+class CropTests(unittest.TestCase):
+    """
+    Each slot is cropped to its glyph in the atlas, and nothing is
+    cropped until the atlas has been read.
+    """
+    def setUp(self):
+        obs.reset()
+        self.scene = obs.addScene('Scene')
+        for name in ('Digit 1', 'Digit 2', 'Digit 3'):
+            obs.addItem(self.scene, obs.addSource(name, 'image_source'))
+        orly.sceneItemIndex.invalidate()
+        orly.sourceWriter.forget()
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.savedAtlases = orly.spriteAtlases
+        orly.spriteAtlases = orly.SpriteAtlasCache(self.directory.name)
+        self.sprites = orly.DigitSprites(
+            {'slots': ['Digit 1', 'Digit 2', 'Digit 3']}, REPO_DIR)
+        self.cellWidth = (orlypng.readPng(ATLAS_PATH)[0]
+                          // len(orly.DIGIT_ATLAS_GLYPHS))
+
+
+    def tearDown(self):
+        orly.spriteAtlases = self.savedAtlases
+        orly.sceneItemIndex.invalidate()
+        orly.sourceWriter.forget()
+        self.directory.cleanup()
+
+
+    def show(self, text):
+        obs.writes.clear()
+        with orly.sourceWriter.transaction():
+            self.sprites.setText(text)
+        return sorted(write for write in obs.writes
+                      if write[0] in ('crop', 'visible'))
+
+
+    def crop(self, slotName, glyph):
+        width = self.cellWidth * len(orly.DIGIT_ATLAS_GLYPHS)
+        return ('crop', slotName, glyph * self.cellWidth,
+                width - (glyph + 1) * self.cellWidth, 0, 0)
+
+
+    def testCrops(self):
+        orly.spriteAtlases.make(ATLAS_PATH, RED)
+        self.assertEqual(self.show('+7'),
+                         [self.crop('Digit 1', 10),
+                          self.crop('Digit 2', 7),
+                          ('visible', 'Digit 1', True),
+                          ('visible', 'Digit 2', True),
+                          ('visible', 'Digit 3', False)])
+
+        # (only the slots that changed are written)
+        self.assertEqual(self.show('+70'),
+                         [self.crop('Digit 3', 0),
+                          ('visible', 'Digit 3', True)])
+
+
+    def testNotReadYet(self):
+        self.assertEqual(self.show('12'),
+                         [('visible', 'Digit 3', False)])
+        self.assertEqual(self.sprites.glyphs, {'Digit 3': None})
+
+        orly.spriteAtlases.make(ATLAS_PATH, RED)
+        obs.writes.clear()
+        self.sprites.refresh()
+        self.assertEqual(sorted(obs.writes),
+                         [self.crop('Digit 1', 1),
+                          self.crop('Digit 2', 2),
+                          ('visible', 'Digit 1', True),
+                          ('visible', 'Digit 2', True)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# ORLY?! Counter plugin for OBS Studio -- animation timeline tests
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Checks that the animation timelines can be compiled at any framerate
+# OBS might be set to, against the stand-in obspython module in
+# tools/fakeobs:
+#
+#     python -m unittest discover tests
+
+import os.path
+import sys
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, 'tools', 'fakeobs'))
+sys.path.insert(0, REPO_DIR)
+
+import orly
+
+
+class FractionsTests(unittest.TestCase):
+    """
+    The step tables start at 0 and end at 1, however few steps there
+    are.
+    """
+    def testFractionsOfOne(self):
+        self.assertEqual(list(orly.fractionsOfOne(5)),
+                         [0, 0.25, 0.5, 0.75, 1])
+        self.assertEqual(list(orly.fractionsOfOne(2)), [0, 1])
+        self.assertEqual(list(orly.fractionsOfOne(1)), [1])
+        self.assertEqual(list(orly.fractionsOfOne(0)), [])
+
+
+    def testEasingTable(self):
+        for curve in orly.EASING_CURVES:
+            self.assertEqual(orly.easingTable(curve, 2), (0, 1), curve)
+            self.assertEqual(orly.easingTable(curve, 1), (1,), curve)
+            self.assertEqual(orly.easingTable(curve, 0), (), curve)
+
+
+class FramerateTests(unittest.TestCase):
+    """
+    Every kind of increment compiles, and ends with the overlay hidden,
+    at low framerates too.
+    """
+    def checkFramerate(self, framerate):
+        defaults = dict(orly.loadDefaults(), framerate=framerate)
+        machine = orly.OrlyStateMachine('orly', 'ORLY', defaults)
+        self.assertGreaterEqual(machine.transitionSteps(6), 2)
+
+        # (49 + 1 changes color; the others don't)
+        for startValue, amount in ((10, 1), (10, 5), (10, -3), (49, 1)):
+            startColors = machine.colorBrackets.colorsFor(startValue)
+            timeline = machine.compileIncrement(
+                *machine.timelineArgsFor(startValue, amount, startColors))
+            self.assertEqual(timeline.stateAt(len(timeline) - 1)[1:],
+                             (0, 0), (framerate, startValue, amount))
+
+            entryState = timeline.stateAt(timeline.markers['appearEnd'])
+            machine.compileReappear(orly.TimelineBuilder(), entryState, {})
+            machine.compileCancel(entryState, startColors)
+
+
+    def testFramerates(self):
+        for framerate in (1, 2, 5, 6, 11, 12, 30, 60):
+            self.checkFramerate(framerate)
+
+
+if __name__ == '__main__':
+    unittest.main()
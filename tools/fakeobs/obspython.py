@@ -0,0 +1,651 @@
+# ORLY?! Counter plugin for OBS Studio -- stand-in obspython module
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Just enough of OBS's obspython module to run orly.py without OBS, for
+# tools/orlyreplay.py and the tests in tests/. Sources, scenes, filters,
+# timers, hotkeys and signals are simulated in plain Python objects, and
+# every change the script makes to a source is appended to `writes`.
+#
+# It's only meant to behave like OBS as far as orly.py can tell. In
+# particular, callbacks are removed by identity, like the real thing.
+
+import collections
+import json
+
+
+# Every change the script made, as tuples:
+#   ('pos', source name, x, y)
+#   ('visible', source name, visible)
+#   ('crop', source name, left, right, top, bottom)
+#   ('settings', source name, {changed settings})
+#   ('restart', source name) / ('stop', source name) for media
+# Filters are named 'source name:filter name'.
+writes = []
+
+# Number of calls to each native function, for benchmarking
+calls = collections.Counter()
+
+# References the script holds: id(object) -> [object, count]. Every
+# function that returns a new reference in OBS adds one here, and every
+# release removes one, so anything left over has leaked.
+references = {}
+
+timers = [] # [callback, interval in ms]
+hotkeys = {} # id -> (name, description, callback)
+frontendCallbacks = []
+sources = {}
+currentScene = [None]
+currentTimer = [None]
+
+OBS_COMBO_TYPE_EDITABLE = 1
+OBS_COMBO_TYPE_LIST = 2
+OBS_COMBO_FORMAT_STRING = 3
+OBS_GROUP_NORMAL = 1
+OBS_FRONTEND_EVENT_SCENE_CHANGED = 8
+OBS_FRONTEND_EVENT_SCENE_LIST_CHANGED = 9
+OBS_FRONTEND_EVENT_EXIT = 17
+OBS_FRONTEND_EVENT_SCENE_COLLECTION_CHANGED = 19
+OBS_FRONTEND_EVENT_SCENE_COLLECTION_CLEANUP = 21
+OBS_FRONTEND_EVENT_FINISHED_LOADING = 26
+LOG_WARNING = 200
+LOG_INFO = 300
+
+
+def reset():
+    """
+    Forget everything, to start a new simulation.
+    """
+    writes.clear()
+    calls.clear()
+    timers.clear()
+    hotkeys.clear()
+    frontendCallbacks.clear()
+    sources.clear()
+    references.clear()
+    globalSignals.connections.clear()
+    currentScene[0] = None
+
+
+########################################################################
+# Simulated objects
+
+class SignalHandler():
+    def __init__(self):
+        self.connections = collections.defaultdict(list)
+
+
+    def emit(self, signal, calldata):
+        for callback in list(self.connections[signal]):
+            callback(calldata)
+
+
+class Source():
+    def __init__(self, name, id, settings=None, parent=None):
+        self.name = name
+        self.id = id
+        self.settings = dict(settings or {})
+        self.filters = []
+        self.signals = SignalHandler()
+        self.parent = parent
+
+        # (scenes and groups have a scene of their own)
+        self.scene = Scene(self) if id in ('scene', 'group') else None
+
+
+    @property
+    def traceName(self):
+        if self.parent is None: return self.name
+        return self.parent.name + ':' + self.name
+
+
+class Scene():
+    def __init__(self, source):
+        self.source = source
+        self.items = []
+        self.nextId = 1
+
+
+class SceneItem():
+    def __init__(self, scene, source):
+        self.scene = scene
+        self.source = source
+        self.pos = vec2()
+        self.visible = True
+        self.id = scene.nextId
+        scene.nextId += 1
+
+
+class vec2():
+    def __init__(self):
+        self.x = 0.0
+        self.y = 0.0
+
+
+class obs_sceneitem_crop():
+    def __init__(self):
+        self.left = self.right = self.top = self.bottom = 0
+
+
+class obs_video_info():
+    def __init__(self):
+        self.fps_num = 30
+        self.fps_den = 1
+
+
+class Data(dict):
+    pass
+
+
+globalSignals = SignalHandler()
+
+
+def acquire(obj):
+    """
+    Count a new reference to an object, and return it.
+    """
+    if obj is not None:
+        references.setdefault(id(obj), [obj, 0])[1] += 1
+    return obj
+
+
+def release(obj):
+    """
+    Count a reference to an object as released.
+    """
+    if obj is None: return
+    entry = references.get(id(obj))
+    if entry is None:
+        raise AssertionError('released a reference that was never'
+                             ' acquired: %r' % obj)
+    entry[1] -= 1
+    if entry[1] == 0:
+        del references[id(obj)]
+
+
+def outstandingReferences():
+    """
+    Return a list of (object, count) for the references that haven't
+    been released.
+    """
+    return [(obj, count) for obj, count in references.values()]
+
+
+########################################################################
+# Setting up a simulation
+
+def addSource(name, id, settings=None):
+    """
+    Create a source.
+    """
+    source = Source(name, id, settings)
+    sources[name] = source
+    globalSignals.emit('source_create', {'source': source})
+    return source
+
+
+def addFilter(source, name, id, settings=None):
+    """
+    Add a filter to a source.
+    """
+    filter = Source(name, id, settings, source)
+    source.filters.append(filter)
+    source.signals.emit('filter_add', {'source': source, 'filter': filter})
+    return filter
+
+
+def addScene(name):
+    """
+    Create a scene, and make it the current one if there isn't one.
+    """
+    source = addSource(name, 'scene')
+    if currentScene[0] is None:
+        currentScene[0] = source
+    return source
+
+
+def addGroup(name):
+    """
+    Create a group. Like in OBS, a group has a scene of its own (items
+    are added to it with addItem()), but it isn't a scene as far as
+    obs_scene_from_source() is concerned.
+    """
+    return addSource(name, 'group')
+
+
+def addItem(sceneSource, source):
+    """
+    Add a source to a scene or group.
+    """
+    item = SceneItem(sceneSource.scene, source)
+    sceneSource.scene.items.append(item)
+    sceneSource.signals.emit('item_add', {'scene': sceneSource.scene,
+                                          'item': item})
+    return item
+
+
+def removeItem(item):
+    """
+    Remove an item from its scene or group.
+    """
+    item.scene.items.remove(item)
+    item.scene.source.signals.emit('item_remove', {'scene': item.scene,
+                                                   'item': item})
+
+
+def runTimers():
+    """
+    Call each timer callback once, as if its interval had passed.
+    """
+    for timer in list(timers):
+        if timer not in timers: continue
+        currentTimer[0] = timer[0]
+        timer[0]()
+    currentTimer[0] = None
+
+
+def pressHotkey(name):
+    """
+    Press and release the hotkey with the given name.
+    """
+    for hotkeyName, description, callback in list(hotkeys.values()):
+        if hotkeyName == name:
+            callback(True)
+            callback(False)
+            return
+    raise KeyError(name)
+
+
+########################################################################
+# The obspython API
+
+def obs_get_signal_handler():
+    return globalSignals
+
+
+def obs_source_get_signal_handler(source):
+    return source.signals
+
+
+def signal_handler_connect(handler, signal, callback):
+    handler.connections[signal].append(callback)
+
+
+def signal_handler_disconnect(handler, signal, callback):
+    connections = handler.connections[signal]
+    for i, connected in enumerate(connections):
+        if connected is callback:
+            del connections[i]
+            return
+
+
+def calldata_source(calldata, name):
+    return calldata.get(name)
+
+
+def calldata_sceneitem(calldata, name):
+    return calldata.get(name)
+
+
+def calldata_string(calldata, name):
+    return calldata.get(name)
+
+
+def obs_get_source_by_name(name):
+    calls['obs_get_source_by_name'] += 1
+    return acquire(sources.get(name))
+
+
+def obs_source_addref(source):
+    acquire(source)
+
+
+def obs_source_release(source):
+    release(source)
+
+
+def obs_source_get_name(source):
+    return source.name
+
+
+def obs_source_get_id(source):
+    return source.id
+
+
+def obs_source_get_filter_by_name(source, name):
+    calls['obs_source_get_filter_by_name'] += 1
+    for filter in source.filters:
+        if filter.name == name:
+            return acquire(filter)
+    return None
+
+
+def obs_source_get_settings(source):
+    data = Data()
+    data.update(source.settings)
+    return acquire(data)
+
+
+def obs_source_update(source, data):
+    calls['obs_source_update'] += 1
+    source.settings.update(data)
+    writes.append(('settings', source.traceName, dict(data)))
+
+
+def obs_source_media_restart(source):
+    calls['obs_source_media_restart'] += 1
+    writes.append(('restart', source.name))
+    source.signals.emit('media_started', {'source': source})
+
+
+def obs_source_media_stop(source):
+    calls['obs_source_media_stop'] += 1
+    writes.append(('stop', source.name))
+
+
+def obs_source_create_private(id, name, settings):
+    return acquire(Source(name, id, settings))
+
+
+def obs_source_filter_add(source, filter):
+    filter.parent = source
+    source.filters.append(filter)
+    source.signals.emit('filter_add', {'source': source, 'filter': filter})
+
+
+def obs_enum_sources():
+    calls['obs_enum_sources'] += 1
+    return [acquire(source) for source in sources.values()
+            if source.id != 'scene']
+
+
+def source_list_release(sourceList):
+    for source in sourceList:
+        release(source)
+
+
+def obs_scene_from_source(source):
+    if source.id != 'scene': return None
+    return source.scene
+
+
+def obs_group_from_source(source):
+    if source.id != 'group': return None
+    return source.scene
+
+
+def obs_scene_get_source(scene):
+    return scene.source
+
+
+def obs_scene_enum_items(scene):
+    calls['obs_scene_enum_items'] += 1
+    return [acquire(item) for item in scene.items]
+
+
+def obs_sceneitem_is_group(item):
+    return item.source.id == 'group'
+
+
+def obs_sceneitem_group_get_scene(item):
+    return obs_group_from_source(item.source)
+
+
+def obs_sceneitem_group_enum_items(item):
+    calls['obs_sceneitem_group_enum_items'] += 1
+    return [acquire(child) for child in item.source.scene.items]
+
+
+def sceneitem_list_release(items):
+    for item in items:
+        release(item)
+
+
+def obs_sceneitem_addref(item):
+    acquire(item)
+
+
+def obs_sceneitem_release(item):
+    release(item)
+
+
+def obs_sceneitem_get_source(item):
+    return item.source
+
+
+def obs_sceneitem_get_scene(item):
+    return item.scene
+
+
+def obs_sceneitem_get_id(item):
+    return item.id
+
+
+def obs_sceneitem_get_pos(item, pos):
+    calls['obs_sceneitem_get_pos'] += 1
+    pos.x, pos.y = item.pos.x, item.pos.y
+
+
+def obs_sceneitem_set_pos(item, pos):
+    calls['obs_sceneitem_set_pos'] += 1
+    item.pos.x, item.pos.y = pos.x, pos.y
+    writes.append(('pos', item.source.name, pos.x, pos.y))
+
+
+def obs_sceneitem_visible(item):
+    return item.visible
+
+
+def obs_sceneitem_set_visible(item, visible):
+    calls['obs_sceneitem_set_visible'] += 1
+    item.visible = visible
+    writes.append(('visible', item.source.name, visible))
+
+
+def obs_sceneitem_set_crop(item, crop):
+    calls['obs_sceneitem_set_crop'] += 1
+    writes.append(('crop', item.source.name,
+                   crop.left, crop.right, crop.top, crop.bottom))
+
+
+def obs_sceneitem_defer_update_begin(item):
+    calls['obs_sceneitem_defer_update_begin'] += 1
+
+
+def obs_sceneitem_defer_update_end(item):
+    calls['obs_sceneitem_defer_update_end'] += 1
+
+
+def obs_frontend_get_current_scene():
+    return acquire(currentScene[0])
+
+
+def obs_frontend_get_scenes():
+    return [acquire(source) for source in sources.values()
+            if source.id == 'scene']
+
+
+def obs_frontend_add_event_callback(callback):
+    frontendCallbacks.append(callback)
+
+
+def obs_frontend_remove_event_callback(callback):
+    for i, added in enumerate(frontendCallbacks):
+        if added is callback:
+            del frontendCallbacks[i]
+            return
+
+
+def obs_get_video_info(ovi):
+    return True
+
+
+def obs_data_create():
+    return acquire(Data())
+
+
+def obs_data_create_from_json(text):
+    data = Data()
+    data.update(json.loads(text))
+    return acquire(data)
+
+
+def obs_data_get_json(data):
+    return json.dumps(data)
+
+
+def obs_data_release(data):
+    release(data)
+
+
+def obs_data_set_int(data, name, value):
+    data[name] = int(value)
+
+
+def obs_data_set_double(data, name, value):
+    data[name] = float(value)
+
+
+def obs_data_set_bool(data, name, value):
+    data[name] = bool(value)
+
+
+def obs_data_set_string(data, name, value):
+    data[name] = value
+
+
+def obs_data_set_array(data, name, array):
+    data[name] = array
+
+
+def obs_data_set_default_int(data, name, value):
+    data.setdefault(name, int(value))
+
+
+def obs_data_set_default_string(data, name, value):
+    data.setdefault(name, value)
+
+
+def obs_data_get_int(data, name):
+    return int(data.get(name, 0))
+
+
+def obs_data_get_double(data, name):
+    return float(data.get(name, 0.0))
+
+
+def obs_data_get_bool(data, name):
+    return bool(data.get(name, False))
+
+
+def obs_data_get_string(data, name):
+    return data.get(name, '')
+
+
+def obs_data_get_array(data, name):
+    return data.get(name)
+
+
+def obs_data_array_release(array):
+    pass
+
+
+def timer_add(callback, interval):
+    calls['timer_add'] += 1
+    timers.append([callback, interval])
+
+
+def timer_remove(callback):
+    calls['timer_remove'] += 1
+    for timer in timers:
+        if timer[0] is callback:
+            timers.remove(timer)
+            return
+
+
+def remove_current_callback():
+    if currentTimer[0] is not None:
+        timer_remove(currentTimer[0])
+
+
+def obs_hotkey_register_frontend(name, description, callback):
+    hotkeyId = len(hotkeys) + 1
+    while hotkeyId in hotkeys:
+        hotkeyId += 1
+    hotkeys[hotkeyId] = (name, description, callback)
+    return hotkeyId
+
+
+def obs_hotkey_unregister(callback):
+    for hotkeyId, (name, description, registered) in list(hotkeys.items()):
+        if registered is callback:
+            del hotkeys[hotkeyId]
+
+
+def obs_hotkey_save(hotkeyId):
+    return []
+
+
+def obs_hotkey_load(hotkeyId, array):
+    pass
+
+
+def obs_properties_create():
+    return {}
+
+
+def addProperty(props, name):
+    props[name] = property = {'name': name, 'items': []}
+    return property
+
+
+def obs_properties_add_list(props, name, description, type, format):
+    return addProperty(props, name)
+
+
+def obs_properties_add_float(props, name, description, *args):
+    return addProperty(props, name)
+
+
+def obs_properties_add_int(props, name, description, *args):
+    return addProperty(props, name)
+
+
+def obs_properties_add_bool(props, name, description):
+    return addProperty(props, name)
+
+
+def obs_properties_add_button(props, name, description, callback):
+    return addProperty(props, name)
+
+
+def obs_properties_add_group(props, name, description, type, group):
+    props.update(group)
+    return addProperty(props, name)
+
+
+def obs_properties_get(props, name):
+    return props.get(name)
+
+
+def obs_property_list_add_string(property, name, value):
+    property['items'].append(value)
+
+
+def obs_property_list_clear(property):
+    property['items'].clear()
+
+
+def obs_property_set_modified_callback(property, callback):
+    pass
@@ -0,0 +1,326 @@
+# ORLY?! Counter plugin for OBS Studio -- input replayer
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Plays back a recording made with "Record hotkey presses" against the
+# stand-in obspython module in tools/fakeobs, without OBS, and writes a
+# trace of every change the script makes to the sources, frame by
+# frame:
+#
+#     python tools/orlyreplay.py orly-input-20240101-200000.jsonl -o trace.jsonl
+#
+# Time is simulated, so the replay runs as fast as it can but always
+# produces the same trace for the same recording; two traces can be
+# compared with diff. --bench prints how fast it went.
+
+import argparse
+import contextlib
+import json
+import os.path
+import sys
+import tempfile
+import time
+import types
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TOOLS_DIR, 'fakeobs'))
+sys.path.insert(0, os.path.dirname(TOOLS_DIR))
+
+import obspython as obs
+import orly
+
+# Source kinds (as in orly.SOURCE_PROP_KINDS) -> source types to create
+SOURCE_TYPES = {
+    'text': 'text_gdiplus',
+    'image': 'image_source',
+    'media': 'ffmpeg_source',
+    'group': 'group',
+}
+
+# Settings that would start things the replay shouldn't do
+DISABLED_SETTINGS = [
+    orly.PROP_ID_RECORD_INPUT,
+    orly.PROP_ID_REMOTE,
+    orly.PROP_ID_PROFILE,
+]
+
+
+class VirtualClock():
+    """
+    Stands in for the time module in orly.py, so that the replay runs on
+    simulated time.
+    """
+    def __init__(self, start):
+        self.now = start
+
+
+    def module(self):
+        """
+        Return an object that can replace orly.time.
+        """
+        return types.SimpleNamespace(time=lambda: self.now,
+                                     monotonic=lambda: self.now,
+                                     perf_counter=time.perf_counter,
+                                     strftime=time.strftime,
+                                     sleep=lambda seconds: None)
+
+
+def readRecording(path):
+    """
+    Read a recording. Return its header and a list of inputs, in order.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    if not lines or lines[0].get('type') != 'start':
+        raise ValueError('%s isn\'t a recording' % path)
+
+    # (lines are written on worker threads, so they might be slightly out
+    # of order)
+    inputs = sorted(lines[1:], key=lambda entry: entry['t'])
+    return lines[0], inputs
+
+
+def makeSettings(values):
+    """
+    Return an obs_data_t with the given settings, with the ones that
+    would start things the replay shouldn't do turned off.
+    """
+    settings = obs.obs_data_create()
+    settings.update(values)
+    for name in DISABLED_SETTINGS:
+        settings[name] = False
+    return settings
+
+
+def setUpScene(header):
+    """
+    Create a scene with the sources the recorded settings refer to.
+    """
+    scene = obs.addScene('Scene')
+    for counter in header['defaults'].get('counters') or orly.DEFAULT_COUNTERS:
+        sprites = counter.get('digit-sprites',
+                              header['defaults'].get('digit-sprites'))
+
+        for propId, kind in orly.SOURCE_PROP_KINDS:
+            name = header['settings'].get(counter['id'] + '_' + propId)
+            if not name or name in obs.sources: continue
+
+            if kind == 'group' or (sprites
+                                   and propId == orly.PROP_ID_COUNTER_SOURCE):
+                source = obs.addGroup(name)
+            else:
+                source = obs.addSource(name, SOURCE_TYPES[kind])
+            if kind == 'text':
+                obs.addFilter(source, orly.OPACITY_FILTER_NAME,
+                              'mask_filter')
+            obs.addItem(scene, source)
+
+        counterName = header['settings'].get(
+            counter['id'] + '_' + orly.PROP_ID_COUNTER_SOURCE)
+
+        # The digit slots go in the counter group, and the fade slots in
+        # the fade group, as the readme says to set them up
+        if sprites:
+            slotGroup = obs.sources.get(counterName) or scene
+            name = sprites.get('fade-group')
+            if name and name not in obs.sources:
+                fadeGroup = obs.addGroup(name)
+                obs.addFilter(fadeGroup, orly.OPACITY_FILTER_NAME,
+                              'mask_filter')
+                obs.addItem(scene, fadeGroup)
+            fadeGroup = obs.sources.get(name) or scene
+
+            for group, names in ((slotGroup, sprites.get('slots', [])),
+                                 (fadeGroup, sprites.get('fade-slots', []))):
+                for name in names:
+                    if name not in obs.sources:
+                        obs.addItem(group,
+                                    obs.addSource(name, 'image_source'))
+
+        # Start from the recorded value
+        value = header['values'].get(counter['id'])
+        if value is not None and counterName:
+            obs.sources[counterName].settings['text'] = str(value)
+
+
+class Replayer():
+    """
+    Plays back the inputs of a recording, and collects the trace.
+    """
+    def __init__(self, header, inputs, output):
+        self.header = header
+        self.inputs = inputs
+        self.output = output
+        # (starting from when the recording started, since the script
+        # doesn't expect times near zero)
+        self.start = header['time']
+        self.clock = VirtualClock(self.start)
+        self.wakeups = 0
+        self.directory = None
+
+
+    def run(self):
+        """
+        Play back the whole recording.
+        """
+        orly.time = self.clock.module()
+        orly.loadDefaults = lambda: self.header['defaults']
+        # (everything happens in order on this thread)
+        orly.WORKER_THREADS = 0
+
+        obs.reset()
+        setUpScene(self.header)
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.directory = directory
+            orly.counterJournal.path = os.path.join(directory, 'journal')
+            orly.eventHistory.path = os.path.join(directory, 'history')
+            orly.spriteAtlases.directory = os.path.join(directory, 'sprites')
+
+            self.settings = makeSettings(self.header['settings'])
+            orly.script_defaults(self.settings)
+            orly.script_load(self.settings)
+            orly.script_update(self.settings)
+            self.emit(None)
+
+            for entry in self.inputs:
+                self.runTimersUntil(self.start + entry['t'])
+                self.clock.now = self.start + entry['t']
+                self.play(entry)
+                self.emit(entry)
+
+            # Let the last animation finish
+            self.runTimersUntil(float('inf'))
+            orly.script_unload()
+            self.emit(None)
+
+
+    def play(self, entry):
+        """
+        Play back one input.
+        """
+        if entry['event'] == 'settings':
+            self.settings = makeSettings(entry['value'])
+            orly.script_update(self.settings)
+            return
+
+        machine = orly.stateMachines.get(entry['counter'])
+        if machine is None: return
+
+        if entry['event'] == 'press':
+            orly.handleORLY(machine, True, entry['value'])
+        elif entry['event'] == 'increment':
+            machine.queueIncrement(entry['value'])
+        elif entry['event'] == 'negate':
+            orly.handleNegateORLY(machine, True)
+        elif entry['event'] == 'hide':
+            orly.handleHideAll(machine)
+        elif entry['event'] == 'restore':
+            orly.handleRestoreAll(machine)
+        elif entry['event'] == 'set':
+            machine.setValue(entry['value'])
+
+
+    def runTimersUntil(self, until):
+        """
+        Fire timers, in order, until the given time (or until there
+        aren't any).
+        """
+        while obs.timers:
+            timer, due = min(((timer, self.dueTime(timer))
+                              for timer in obs.timers),
+                             key=lambda timerAndDue: timerAndDue[1])
+            if due > until: return
+
+            self.clock.now = due
+            timer[2] = due + timer[1] / 1000
+            obs.currentTimer[0] = timer[0]
+            timer[0]()
+            obs.currentTimer[0] = None
+
+            self.wakeups += 1
+            self.emit(None)
+
+
+    def dueTime(self, timer):
+        """
+        Return when a timer will next fire.
+        """
+        # (kept in the timer's own entry, since the ID of a removed
+        # timer's entry can be reused for a new one)
+        if len(timer) < 3:
+            timer.append(self.clock.now + timer[1] / 1000)
+        return timer[2]
+
+
+    def emit(self, entry):
+        """
+        Write a line to the trace for whatever was written since the
+        last one.
+        """
+        if entry is None and not obs.writes: return
+        line = {'t': round((self.clock.now - self.start) * 1000, 3)}
+        if entry is not None:
+            line['input'] = entry
+        line['writes'] = list(obs.writes)
+        obs.writes.clear()
+        if self.output is not None:
+            # (the temporary directory is different every time)
+            self.output.write(json.dumps(line).replace(
+                json.dumps(self.directory)[1:-1], '<temp>') + '\n')
+
+
+def main(args):
+    parser = argparse.ArgumentParser(
+        description='Play back a recording of ORLY hotkey presses without'
+                    ' OBS, and write a frame-by-frame trace.')
+    parser.add_argument('recording')
+    parser.add_argument('-o', '--output',
+                        help='where to write the trace (default: stdout)')
+    parser.add_argument('--bench', action='store_true',
+                        help='print how fast the replay was, and don\'t'
+                             ' write a trace unless -o is given')
+    args = parser.parse_args(args)
+
+    header, inputs = readRecording(args.recording)
+
+    if args.output is not None:
+        output = open(args.output, 'w', encoding='utf-8')
+    elif args.bench:
+        output = None
+    else:
+        output = sys.stdout
+
+    replayer = Replayer(header, inputs, output)
+    start = time.perf_counter()
+    try:
+        # (keep the script's messages out of the trace)
+        with contextlib.redirect_stdout(sys.stderr):
+            replayer.run()
+    finally:
+        if output not in (None, sys.stdout):
+            output.close()
+    elapsed = time.perf_counter() - start
+
+    if args.bench:
+        print('%d inputs and %d timer wakeups in %.2f s (%d inputs/s,'
+              ' %d wakeups/s)'
+              % (len(inputs), replayer.wakeups, elapsed,
+                 len(inputs) / elapsed, replayer.wakeups / elapsed),
+              file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))